@@ -0,0 +1,27 @@
+import os
+import sys
+
+# rag-fastapi-structured/app 모듈 경로 추가
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(ROOT, "rag-fastapi-structured", "app"))
+
+from utils.catalog_loader import load_catalog
+
+SAMPLE_CSV = os.path.join(ROOT, "rag-basic", "data", "sample_metadata.csv")
+
+
+def test_sample_metadata():
+    # 따옴표 없이 쉼표가 들어간 data_type(decimal(10,2)) 행이 잘리지 않고 복구되는지 확인
+    texts, metadatas, ids = load_catalog(SAMPLE_CSV, "metadata")
+    print("적재된 컬럼 수:", len(ids))
+
+    assert len(ids) == len(set(ids)) == 9
+    index = ids.index("customer_orders.total_amount")
+    assert metadatas[index]["data_type"] == "decimal(10,2)", metadatas[index]
+    assert "Total order amount in USD" in texts[index], texts[index]
+    assert "99.99" in texts[index], texts[index]
+
+
+if __name__ == "__main__":
+    test_sample_metadata()
+    print("✅ sample_metadata.csv 적재 확인 완료")
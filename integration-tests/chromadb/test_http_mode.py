@@ -0,0 +1,66 @@
+import sys
+import time
+import shutil
+import tempfile
+import subprocess
+from multiprocessing import Pool
+
+import chromadb
+
+# 로컬 Chroma 서버를 띄워 CHROMA_MODE=http 환경을 재현
+# (클러스터의 Chroma 서비스 대신 사용하는 테스트용 서버)
+HOST = "localhost"
+PORT = 8091
+WORKERS = 4
+DOCS_PER_WORKER = 50
+
+
+def insert_documents(worker_id):
+    # 각 프로세스는 uvicorn 워커처럼 자신의 HttpClient를 사용
+    client = chromadb.HttpClient(host=HOST, port=PORT)
+    collection = client.get_or_create_collection(name="http_mode_test")
+    collection.add(
+        ids=[f"w{worker_id}_{i}" for i in range(DOCS_PER_WORKER)],
+        embeddings=[[float(worker_id), float(i), 1.0] for i in range(DOCS_PER_WORKER)],
+        documents=[f"worker {worker_id} document {i}" for i in range(DOCS_PER_WORKER)],
+        metadatas=[{"source": f"worker_{worker_id}"} for _ in range(DOCS_PER_WORKER)]
+    )
+    return worker_id
+
+
+if __name__ == "__main__":
+    data_dir = tempfile.mkdtemp(prefix="chroma-http-test-")
+    server = subprocess.Popen(
+        [shutil.which("chroma") or "chroma", "run", "--path", data_dir, "--host", HOST, "--port", str(PORT)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+
+    try:
+        # 서버 기동 대기
+        for _ in range(60):
+            try:
+                client = chromadb.HttpClient(host=HOST, port=PORT)
+                client.heartbeat()
+                break
+            except Exception:
+                time.sleep(0.5)
+        else:
+            sys.exit("Chroma 서버가 시작되지 않았습니다.")
+
+        # 여러 프로세스가 동시에 같은 콜렉션에 쓰기
+        with Pool(WORKERS) as pool:
+            pool.map(insert_documents, range(WORKERS))
+
+        collection = client.get_collection("http_mode_test")
+        count = collection.count()
+        print("저장된 문서 수:", count)
+        assert count == WORKERS * DOCS_PER_WORKER
+
+        results = collection.query(query_embeddings=[[1.0, 3.0, 1.0]], n_results=1)
+        print("검색 결과:", results["ids"][0])
+        assert results["ids"][0] == ["w1_3"]
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(data_dir, ignore_errors=True)
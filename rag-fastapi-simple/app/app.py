@@ -1,27 +1,64 @@
-from fastapi import FastAPI, HTTPException
+import os
+import json
+import codecs
+import asyncio
+import contextlib
+from fastapi import FastAPI, HTTPException, Depends, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse
 from pydantic import BaseModel
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Any
 from pathlib import Path
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import TextLoader
 from langchain_community.vectorstores import Chroma
 from chromadb.config import Settings
 import chromadb
-from vector_store import store_documents_in_chroma
-from query_runner import run_rag_query
-from embeddings import NomicEmbeddings
+from vector_store import (
+    store_documents_in_chroma, add_chunks_to_chroma, get_chroma_client, StreamingTextChunker, CHROMA_MODE,
+    DEDUP_THRESHOLD, DEDUP_NUM_PERM, DEDUP_SHINGLE_SIZE, dedup_stats
+)
+from near_dedup import NearDuplicateFilter
+from query_runner import run_rag_query, reasoning_stats
+from embeddings import get_shared_embeddings, get_embedding_cache, get_batched_embeddings, EMBEDDING_SERVER_SOCKET
+from profiling import (
+    ProfilingMiddleware, admin_guard, list_profiles, profile_path, tracemalloc_start, tracemalloc_stop,
+    tracemalloc_top, process_rss_mb, mapped_rss_mb, directory_size_mb, model_parameter_mb
+)
+from ingest_jobs import IngestJob, IngestJobManager, JobQueueFull
+from multipart_stream import UploadError, iter_multipart_file
+import time
 
 # ChromaDB 설정 및 클라이언트 초기화
 PERSIST_DIR = "./data"  # vector_store.py와 동일한 경로 사용
 DOCUMENT_DIR = "./document"  # 문서 저장 경로
 
-chroma_client = chromadb.Client(Settings(
-    is_persistent=True,
-    persist_directory=PERSIST_DIR
-))
+chroma_client = get_chroma_client()  # CHROMA_MODE=http 이면 Chroma 서버에 접속
+
+# 관리자 API/요청 프로파일링 (ADMIN_TOKEN이 비어있으면 비활성화)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+HF_CACHE_DIR = os.getenv("HF_HOME", os.path.expanduser("~/.cache/huggingface"))
+
+# 업로드 문서 적재 작업 (제한된 워커 스레드에서 임베딩/저장)
+INGEST_MAX_UPLOAD_MB = int(os.getenv("INGEST_MAX_UPLOAD_MB", "512"))
+INGEST_SPOOL_DIR = os.getenv("INGEST_SPOOL_DIR", "./upload_spool")
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "512"))  # 업로드 적재 시 한 번에 임베딩/저장할 청크 수
+ingest_jobs = IngestJobManager(
+    workers=int(os.getenv("INGEST_WORKERS", "2")),
+    max_pending=int(os.getenv("INGEST_MAX_PENDING", "16"))
+)
+
+class UploadTooLarge(Exception):
+    def __init__(self, limit_mb: int):
+        super().__init__(f"Upload exceeds {limit_mb} MB limit")
+        self.limit_mb = limit_mb
 
 app = FastAPI()
 
+# X-Profile: 1 헤더(또는 ?profile=1)와 X-Admin-Token이 있는 요청만 프로파일링
+app.add_middleware(ProfilingMiddleware, token=ADMIN_TOKEN, profile_dir=PROFILE_DIR)
+
 @app.on_event("startup")
 async def startup_event():
     # document 폴더가 없다면 생성
@@ -65,6 +102,13 @@ class QueryRequest(BaseModel):
     collection_name: str
     query: str
 
+class SearchRequest(BaseModel):
+    collection_name: str
+    query: str
+    top_k: int = 3
+    score_threshold: Optional[float] = None  # 이 거리보다 먼 결과는 제외
+    where: Optional[Dict[str, Any]] = None  # 메타데이터 필터 (예: {"source": "companyinfo"})
+
 class CollectionContent(BaseModel):
     collection_name: str
     
@@ -128,6 +172,112 @@ async def load_document(request: LoadDocumentRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/load/upload", status_code=202, tags=["1. Load"])
+async def upload_document(request: Request, collection_name: str = ""):
+    """
+    텍스트 파일을 multipart/form-data로 업로드하여 백그라운드에서 벡터 DB에 저장합니다.
+    업로드 본문은 받는 대로 청크로 분할하여 JSONL 임시 파일에 기록되며(메모리에 전체를 올리지 않음), 수신이 끝나면 작업 ID를 반환합니다.
+    청크 분할과 임시 파일 쓰기는 조각마다 스레드에서 실행하여 수신 중에도 이벤트 루프가 다른 요청을 처리하도록 합니다.
+    진행 상황은 /load/jobs/{job_id} 에서 조회합니다.
+
+    Raises:
+        HTTPException:
+            - 400: 잘못된 업로드 형식 또는 지원하지 않는 파일
+            - 413: INGEST_MAX_UPLOAD_MB 초과
+            - 429: 진행 중인 작업이 너무 많음
+    """
+    try:
+        job = ingest_jobs.create(collection_name or None)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+    os.makedirs(INGEST_SPOOL_DIR, exist_ok=True)
+    spool_path = os.path.join(INGEST_SPOOL_DIR, f"{job.job_id}.jsonl")
+    chunker = StreamingTextChunker()
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    job.chunks_total = 0
+
+    def spool_chunks(spool, splits):
+        for text in splits:
+            spool.write(json.dumps({"text": text}, ensure_ascii=False) + "\n")
+        job.chunks_total += len(splits)
+
+    def write_piece(spool, data: bytes):
+        spool_chunks(spool, chunker.feed(decoder.decode(data)))
+
+    def finish_spool(spool):
+        spool_chunks(spool, chunker.feed(decoder.decode(b"", final=True)))
+        spool_chunks(spool, chunker.close())
+
+    try:
+        with open(spool_path, "w", encoding="utf-8") as spool:
+            async for file_name, data in iter_multipart_file(request):
+                if job.file_name is None:
+                    file_name = os.path.basename(file_name)
+                    if not file_name.endswith('.txt'):
+                        raise UploadError(f"Unsupported file type: '{file_name}' (expected .txt)")
+                    job.file_name = file_name
+                    job.collection_name = job.collection_name or Path(file_name).stem
+                job.bytes_received += len(data)
+                if job.bytes_received > INGEST_MAX_UPLOAD_MB * 2**20:
+                    raise UploadTooLarge(INGEST_MAX_UPLOAD_MB)
+                await asyncio.to_thread(write_piece, spool, data)
+            if job.file_name is None:
+                raise UploadError("Uploaded file is empty")
+            await asyncio.to_thread(finish_spool, spool)
+        if not job.chunks_total:
+            raise UploadError(f"File '{job.file_name}' is empty")
+    except (Exception, asyncio.CancelledError) as e:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(spool_path)
+        ingest_jobs.fail(job, str(e) or type(e).__name__)
+        if isinstance(e, UploadTooLarge):
+            raise HTTPException(status_code=413, detail=str(e))
+        if isinstance(e, (UploadError, UnicodeDecodeError)):
+            raise HTTPException(status_code=400, detail=str(e))
+        raise
+
+    print(f"\n📥 '{job.file_name}' 수신 완료 ({job.bytes_received / 2**20:.1f} MB, {job.chunks_total} 청크) -> 작업 {job.job_id}")
+    ingest_jobs.submit(job, lambda job: _run_ingest_job(job, spool_path))
+    return job.to_dict()
+
+def _run_ingest_job(job: IngestJob, spool_path: str):
+    """
+    임시 저장한 청크를 INGEST_BATCH_SIZE 개씩 읽어 벡터 DB에 저장하고 배치마다 진행률을 갱신합니다. (워커 스레드에서 실행)
+    업로드 전체에 하나의 유사 중복 필터를 사용하여 배치 간 유사 중복도 제거합니다.
+    """
+    dedup = NearDuplicateFilter(DEDUP_THRESHOLD, DEDUP_NUM_PERM, DEDUP_SHINGLE_SIZE) if DEDUP_THRESHOLD else None
+    try:
+        with open(spool_path, "r", encoding="utf-8") as f:
+            batch = []
+            for line in f:
+                batch.append(json.loads(line)["text"])
+                if len(batch) >= INGEST_BATCH_SIZE:
+                    add_chunks_to_chroma(batch, job.collection_name, dedup)
+                    job.advance(len(batch))
+                    batch = []
+            add_chunks_to_chroma(batch, job.collection_name, dedup)
+            job.advance(len(batch))
+    finally:
+        os.remove(spool_path)
+    if dedup is not None:
+        dedup_stats.record(dedup, f"from {job.file_name}")
+        return {"dedup": dedup.report()}
+    return None
+
+@app.get("/load/jobs", tags=["1. Load"])
+async def list_ingest_jobs():
+    """업로드 적재 작업 목록을 최신순으로 반환합니다."""
+    return [job.to_dict() for job in ingest_jobs.list()]
+
+@app.get("/load/jobs/{job_id}", tags=["1. Load"])
+async def get_ingest_job(job_id: str):
+    """업로드 적재 작업의 상태를 반환합니다."""
+    job = ingest_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Ingest job '{job_id}' not found")
+    return job.to_dict()
+
 @app.get("/collections/", tags=["2. Collections"])
 async def list_collections():
     """
@@ -195,11 +345,11 @@ async def get_collection_contents(collection_name: str):
             collection = chroma_client.get_collection(name=collection_name)
         except ValueError:
             # 콜렉션이 없는 경우 langchain의 Chroma로 시도
-            embeddings = NomicEmbeddings()
+            embeddings = get_shared_embeddings()
             vector_db = Chroma(
                 collection_name=collection_name,
                 embedding_function=embeddings,
-                persist_directory=PERSIST_DIR
+                client=chroma_client
             )
             collection = chroma_client.get_collection(name=collection_name)
         
@@ -228,11 +378,11 @@ async def get_collection_contents(collection_name: str):
 async def process_query(request: QueryRequest):
     try:
         # ChromaDB에서 콜렉션 가져오기
-        embeddings = NomicEmbeddings()
+        embeddings = get_shared_embeddings()
         vector_db = Chroma(
             collection_name=request.collection_name,
             embedding_function=embeddings,
-            persist_directory=PERSIST_DIR
+            client=chroma_client
         )
         
         print(f"\n🔎 쿼리 시작: {request.collection_name} 콜렉션")
@@ -245,6 +395,64 @@ async def process_query(request: QueryRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/search/", tags=["3. Query"])
+async def search(request: SearchRequest):
+    """
+    LLM 생성 없이 쿼리와 관련된 청크를 거리와 메타데이터와 함께 반환합니다.
+    
+    Returns:
+        dict: {
+            "collection_name": str,
+            "results": List[dict] - id, content, distance(작을수록 유사), metadata,
+            "took_ms": float - 검색 소요 시간
+        }
+    """
+    try:
+        # 콜렉션 조회, 질의 임베딩, 벡터 검색은 블로킹 호출이므로 스레드에서 실행 (스트리밍 질의 등 다른 요청을 막지 않음)
+        return await run_in_threadpool(_search, request)
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _search(request: SearchRequest) -> Dict[str, Any]:
+    """search 의 검색 본문 (스레드에서 실행)"""
+    collection_names = chroma_client.list_collections()
+    if request.collection_name not in collection_names:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Collection '{request.collection_name}' not found"
+        )
+    
+    start = time.perf_counter()
+    collection = chroma_client.get_collection(name=request.collection_name)
+    n_results = min(request.top_k, collection.count())
+    
+    results = []
+    if n_results > 0:
+        query_embedding = get_shared_embeddings().embed_query(request.query)
+        found = collection.query(
+            query_embeddings=[query_embedding],
+            n_results=n_results,
+            where=request.where or None,
+            include=["documents", "metadatas", "distances"]
+        )
+        for id, doc, meta, distance in zip(
+            found['ids'][0], found['documents'][0], found['metadatas'][0], found['distances'][0]
+        ):
+            if request.score_threshold is not None and distance > request.score_threshold:
+                continue
+            results.append({
+                "id": id,
+                "content": doc,
+                "distance": distance,
+                "metadata": meta if meta else {}
+            })
+    
+    took_ms = round((time.perf_counter() - start) * 1000, 2)
+    print(f"\n🔍 검색 완료: {request.collection_name} 콜렉션, {len(results)}개 ({took_ms}ms)")
+    return {"collection_name": request.collection_name, "results": results, "took_ms": took_ms}
+
 @app.delete("/collections", response_model=Dict[str, List[str]], tags=["2. Collections"])
 async def delete_all_collections():
     """
@@ -314,6 +522,74 @@ async def load_all_documents():
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/metrics/", tags=["4. Metrics"])
+async def get_metrics():
+    """think 토큰 사용량, 예산으로 절약한 토큰 수(추정), 임베딩 캐시 적중률, 업로드 작업 현황,
+    유사 중복 청크 제거로 줄어든 인덱스 비율, 적재 임베딩 배치 현황을 반환합니다."""
+    cache = get_embedding_cache()
+    return {
+        "reasoning": reasoning_stats.stats(),
+        "embedding_cache": cache.stats() if cache else None,
+        "ingest_jobs": ingest_jobs.stats(),
+        "dedup": dedup_stats.stats(),
+        "embedding_server": _embedding_server_stats(),
+        # 아직 적재하지 않았으면 통계 조회를 위해 모델을 로드하지 않음
+        "embedding_batching": get_batched_embeddings().stats() if get_batched_embeddings.cache_info().currsize else None
+    }
+
+def _embedding_server_stats():
+    """공유 임베딩 워커 사용 시 워커의 배치 처리 현황을 조회합니다."""
+    if not EMBEDDING_SERVER_SOCKET:
+        return None
+    try:
+        return get_shared_embeddings().stats()
+    except Exception as e:
+        return {"error": str(e)}
+
+@app.get("/admin/profiles/", dependencies=[Depends(admin_guard(ADMIN_TOKEN))], tags=["5. Admin"])
+async def get_profiles():
+    """저장된 요청 프로파일 목록을 반환합니다."""
+    return list_profiles(PROFILE_DIR)
+
+@app.get("/admin/profiles/{profile_id}", dependencies=[Depends(admin_guard(ADMIN_TOKEN))], tags=["5. Admin"])
+async def download_profile(profile_id: str):
+    """프로파일 파일(pyinstrument HTML 또는 cProfile .prof)을 반환합니다."""
+    path = profile_path(PROFILE_DIR, profile_id)
+    media_type = "text/html" if path.endswith(".html") else "application/octet-stream"
+    return FileResponse(path, media_type=media_type, filename=profile_id)
+
+@app.post("/admin/tracemalloc/start", dependencies=[Depends(admin_guard(ADMIN_TOKEN))], tags=["5. Admin"])
+async def start_tracemalloc(frames: int = 1):
+    """메모리 할당 추적을 시작합니다."""
+    return tracemalloc_start(frames)
+
+@app.post("/admin/tracemalloc/stop", dependencies=[Depends(admin_guard(ADMIN_TOKEN))], tags=["5. Admin"])
+async def stop_tracemalloc():
+    """메모리 할당 추적을 중지합니다."""
+    return tracemalloc_stop()
+
+@app.get("/admin/memory/", dependencies=[Depends(admin_guard(ADMIN_TOKEN))], tags=["5. Admin"])
+async def get_memory(top: int = 20, key_type: str = "lineno"):
+    """프로세스 RSS, 임베딩 모델/Chroma 세그먼트 메모리, tracemalloc 상위 할당 위치를 반환합니다."""
+    persistent = CHROMA_MODE.lower() == "persistent"
+    mapped = mapped_rss_mb({"chroma": PERSIST_DIR if persistent else "", "hf_models": HF_CACHE_DIR})
+    # 공유 임베딩 모델이 아직 로드되지 않았으면 로드하지 않음
+    loaded = get_shared_embeddings.cache_info().currsize > 0
+    return {
+        "rss_mb": process_rss_mb(),
+        "embedding_model": {
+            "parameters_mb": model_parameter_mb(get_shared_embeddings()) if loaded else None,
+            "mapped_rss_mb": mapped.get("hf_models"),
+            "server_socket": EMBEDDING_SERVER_SOCKET or None
+        },
+        "chroma": {
+            "mode": CHROMA_MODE,
+            "mapped_rss_mb": mapped.get("chroma"),
+            "on_disk_mb": directory_size_mb(PERSIST_DIR) if persistent else None
+        },
+        "tracemalloc": tracemalloc_top(top, key_type)
+    }
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="127.0.0.1", port=8000)
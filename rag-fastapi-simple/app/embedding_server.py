@@ -0,0 +1,214 @@
+"""
+호스트 공유 임베딩 워커 (Unix 도메인 소켓)
+
+rag-fastapi-structured/app/utils/embedding_server.py 와 동일한 내용을 유지합니다.
+uvicorn 워커 N개가 각자 임베딩 모델을 로드하면 메모리가 N배로 늘고 CPU 스레드가 서로 경쟁하므로,
+모델을 가진 워커 프로세스 하나가 소켓으로 요청을 받고 API 워커는 얇은 클라이언트를 사용합니다.
+- 여러 연결에서 동시에 들어온 요청을 max_batch 개(또는 max_wait_ms)까지 모아 한 번에 임베딩
+- 모델 호출은 한 번에 하나씩만 실행 (스레드 경쟁 없음)
+- 벡터는 JSON 대신 float32 바이트로 전달
+
+프레임 형식 (길이는 4바이트 big-endian):
+    요청: [길이][JSON {"texts": [...]} 또는 {"op": "stats"}]
+    응답: [길이][JSON {"count": n, "dim": d} 또는 {"error": "..."}][n * d * 4 바이트 float32 little-endian]
+"""
+import os
+import json
+import time
+import socket
+import struct
+import asyncio
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+_LENGTH = struct.Struct(">I")
+
+
+class EmbeddingServer:
+    def __init__(self, model, socket_path: str, max_batch: int = 64, max_wait_ms: float = 5.0):
+        self.model = model
+        self.socket_path = socket_path
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.requests = 0
+        self.texts = 0
+        self.batches = 0
+        self.started_at = time.time()
+        self._queue: Optional[asyncio.Queue] = None
+
+    async def serve_forever(self):
+        # 이전 실행에서 남은 소켓 파일 정리
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        os.makedirs(os.path.dirname(os.path.abspath(self.socket_path)), exist_ok=True)
+
+        self._queue = asyncio.Queue()
+        batcher = asyncio.ensure_future(self._batch_loop())
+        server = await asyncio.start_unix_server(self._handle, path=self.socket_path)
+        os.chmod(self.socket_path, 0o660)
+        print(f"🧮 Embedding server listening on {self.socket_path} "
+              f"(max_batch={self.max_batch}, max_wait={self.max_wait * 1000:.0f}ms)")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """연결 하나에서 요청을 순서대로 처리합니다. (클라이언트는 연결을 재사용)"""
+        try:
+            while True:
+                (length,) = _LENGTH.unpack(await reader.readexactly(_LENGTH.size))
+                request = json.loads(await reader.readexactly(length))
+
+                if request.get("op") == "stats":
+                    self._write(writer, self.stats())
+                else:
+                    texts = request.get("texts") or []
+                    future = asyncio.get_running_loop().create_future()
+                    await self._queue.put((texts, future))
+                    try:
+                        vectors = await future
+                        self._write(writer, {"count": vectors.shape[0], "dim": vectors.shape[1]},
+                                    vectors.astype("<f4").tobytes())
+                    except Exception as e:
+                        self._write(writer, {"error": str(e)})
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _write(writer: asyncio.StreamWriter, header: Dict[str, Any], body: bytes = b""):
+        encoded = json.dumps(header).encode("utf-8")
+        writer.write(_LENGTH.pack(len(encoded)) + encoded + body)
+
+    async def _batch_loop(self):
+        """대기 중인 요청을 모아 한 번의 모델 호출로 임베딩하고 요청별로 나누어 돌려줍니다."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            total = len(batch[0][0])
+            deadline = loop.time() + self.max_wait
+            while total < self.max_batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                total += len(item[0])
+
+            texts = [text for request_texts, _ in batch for text in request_texts]
+            try:
+                vectors = await asyncio.to_thread(self._encode, texts)
+            except Exception as e:
+                print(f"Error in embedding server: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.requests += len(batch)
+            self.texts += len(texts)
+            self.batches += 1
+            offset = 0
+            for request_texts, future in batch:
+                if not future.done():
+                    future.set_result(vectors[offset:offset + len(request_texts)])
+                offset += len(request_texts)
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.asarray(self.model.embed_documents(texts), dtype=np.float32)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pid": os.getpid(),
+            "uptime_s": round(time.time() - self.started_at, 1),
+            "requests": self.requests,
+            "texts": self.texts,
+            "batches": self.batches,
+            "avg_batch_size": round(self.texts / self.batches, 1) if self.batches else 0.0
+        }
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    buffer = bytearray()
+    while len(buffer) < size:
+        piece = sock.recv(size - len(buffer))
+        if not piece:
+            raise ConnectionError("Embedding server closed the connection")
+        buffer.extend(piece)
+    return bytes(buffer)
+
+
+class EmbeddingClient(Embeddings):
+    """
+    임베딩 워커에 요청하는 얇은 클라이언트 (HuggingFaceEmbeddings와 같은 embed_documents/embed_query 제공)
+    스레드마다 연결 하나를 유지하며, 연결이 끊기면 한 번 다시 연결하여 재시도합니다.
+    질의 임베딩도 embed_documents로 계산합니다. (사용 중인 sentence-transformers 모델은 두 결과가 같음)
+    """
+
+    def __init__(self, socket_path: str, timeout: float = 60.0, connect_timeout: float = 10.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self._local = threading.local()
+
+    def _connect(self) -> socket.socket:
+        # 워커 프로세스가 아직 모델을 로드 중일 수 있으므로 connect_timeout 동안 재시도
+        deadline = time.monotonic() + self.connect_timeout
+        while True:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self.socket_path)
+                sock.settimeout(self.timeout)
+                return sock
+            except OSError as e:
+                sock.close()
+                if time.monotonic() >= deadline:
+                    raise ConnectionError(f"Embedding server not reachable at {self.socket_path}: {e}")
+                time.sleep(0.2)
+
+    def _request(self, payload: Dict[str, Any]) -> Tuple[Dict[str, Any], bytes]:
+        encoded = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        for attempt in range(2):
+            sock = getattr(self._local, "sock", None) or self._connect()
+            self._local.sock = sock
+            try:
+                sock.sendall(_LENGTH.pack(len(encoded)) + encoded)
+                (length,) = _LENGTH.unpack(_recv_exact(sock, _LENGTH.size))
+                header = json.loads(_recv_exact(sock, length))
+                body = _recv_exact(sock, header.get("count", 0) * header.get("dim", 0) * 4)
+                break
+            except OSError:
+                sock.close()
+                self._local.sock = None
+                if attempt:
+                    raise
+        if "error" in header:
+            raise RuntimeError(f"Embedding server error: {header['error']}")
+        return header, body
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        header, body = self._request({"texts": list(texts)})
+        return np.frombuffer(body, dtype="<f4").reshape(header["count"], header["dim"]).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    def stats(self) -> Dict[str, Any]:
+        header, _ = self._request({"op": "stats"})
+        return header
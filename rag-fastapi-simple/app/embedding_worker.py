@@ -0,0 +1,25 @@
+"""
+공유 임베딩 워커 실행
+
+여러 uvicorn 워커가 EMBEDDING_SERVER_SOCKET 으로 접속하여 하나의 모델을 함께 사용합니다.
+
+사용법:
+    EMBEDDING_SERVER_SOCKET=./run/embedding.sock python embedding_worker.py
+    EMBEDDING_SERVER_SOCKET=./run/embedding.sock uvicorn app:app --workers 4
+"""
+import os
+import asyncio
+from embeddings import NomicEmbeddings, EMBEDDING_SERVER_SOCKET
+from embedding_server import EmbeddingServer
+
+if __name__ == "__main__":
+    server = EmbeddingServer(
+        NomicEmbeddings(),  # 클라이언트가 아닌 실제 모델 로드
+        EMBEDDING_SERVER_SOCKET or "./run/embedding.sock",
+        max_batch=int(os.getenv("EMBEDDING_SERVER_MAX_BATCH", "64")),
+        max_wait_ms=float(os.getenv("EMBEDDING_SERVER_MAX_WAIT_MS", "5"))
+    )
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
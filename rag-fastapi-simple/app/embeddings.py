@@ -1,9 +1,55 @@
+import os
+from functools import lru_cache
 from langchain_huggingface import HuggingFaceEmbeddings
+from embedding_cache import CachedEmbeddings, EmbeddingCache
+from embedding_server import EmbeddingClient
+from batched_embeddings import TokenBudgetEmbeddings, configure_threads
+
+EMBEDDING_MODEL_NAME = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+
+# 공유 임베딩 워커 소켓 경로 (설정 시 모델을 로드하지 않고 embedding_worker.py 프로세스에 요청)
+EMBEDDING_SERVER_SOCKET = os.getenv("EMBEDDING_SERVER_SOCKET", "")
+
+# 문서 적재 시 (모델, 청크 해시) 기준 임베딩 캐시
+EMBEDDING_CACHE = os.getenv("EMBEDDING_CACHE", "true").lower() == "true"
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "./embedding_cache/embeddings.sqlite3")
+EMBEDDING_CACHE_MAX_MB = int(os.getenv("EMBEDDING_CACHE_MAX_MB", "512"))  # 초과 시 오래 사용되지 않은 항목부터 삭제
+
+# 문서 적재 시 길이순 토큰 예산 배치 (배치 크기 × 배치 내 최대 길이 <= EMBEDDING_TOKEN_BUDGET)
+EMBEDDING_TOKEN_BUDGET = int(os.getenv("EMBEDDING_TOKEN_BUDGET", "4096"))
+EMBEDDING_MAX_BATCH = int(os.getenv("EMBEDDING_MAX_BATCH", "256"))
+
+# torch 연산 스레드 수 (0이면 라이브러리 기본값, uvicorn 워커와 코어를 나눠 쓸 때 제한)
+EMBEDDING_INTRA_OP_THREADS = int(os.getenv("EMBEDDING_INTRA_OP_THREADS", "0"))
+EMBEDDING_INTER_OP_THREADS = int(os.getenv("EMBEDDING_INTER_OP_THREADS", "0"))
 
 # Use SentenceTransformer model for embeddings
-NomicEmbeddings = lambda: HuggingFaceEmbeddings(
-    model_name="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
-)
-    
+def NomicEmbeddings():
+    configure_threads(EMBEDDING_INTRA_OP_THREADS, EMBEDDING_INTER_OP_THREADS)
+    return HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME)
+
+@lru_cache(maxsize=None)
+def get_shared_embeddings():
+    """요청마다 모델을 다시 로드하지 않도록 프로세스에서 공유하는 임베딩 모델 (공유 워커 사용 시 클라이언트)"""
+    if EMBEDDING_SERVER_SOCKET:
+        return EmbeddingClient(EMBEDDING_SERVER_SOCKET)
+    return NomicEmbeddings()
+
+@lru_cache(maxsize=None)
+def get_embedding_cache():
+    """프로세스에서 공유하는 임베딩 캐시 (EMBEDDING_CACHE=false이면 None)"""
+    if not EMBEDDING_CACHE:
+        return None
+    return EmbeddingCache(EMBEDDING_CACHE_PATH, max_bytes=EMBEDDING_CACHE_MAX_MB * 2**20)
 
+@lru_cache(maxsize=None)
+def get_batched_embeddings():
+    """길이순 토큰 예산 배치로 임베딩하는 적재용 모델"""
+    return TokenBudgetEmbeddings(get_shared_embeddings(), token_budget=EMBEDDING_TOKEN_BUDGET, max_batch=EMBEDDING_MAX_BATCH)
 
+def get_ingest_embeddings():
+    """문서 적재용 임베딩 모델 (반복되는 청크는 임베딩 캐시에서 재사용, 나머지는 토큰 예산 배치로 계산)"""
+    cache = get_embedding_cache()
+    if cache is None:
+        return get_batched_embeddings()
+    return CachedEmbeddings(get_batched_embeddings(), cache, EMBEDDING_MODEL_NAME)
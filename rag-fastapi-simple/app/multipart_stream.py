@@ -0,0 +1,85 @@
+"""
+multipart/form-data 업로드 스트리밍 수신
+
+rag-fastapi-structured/app/utils/multipart_stream.py 와 동일한 내용을 유지합니다.
+Starlette의 request.form()은 파일 전체를 임시 파일에 받은 뒤 반환하므로,
+python-multipart 파서에 요청 본문을 직접 흘려 첫 번째 파일 파트의 내용을 받는 대로 전달합니다.
+"""
+from typing import AsyncIterator, Dict, List, Tuple
+
+from fastapi import Request
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+
+class UploadError(ValueError):
+    """업로드 요청 형식이 잘못된 경우"""
+
+
+async def iter_multipart_file(request: Request) -> AsyncIterator[Tuple[str, bytes]]:
+    """
+    요청 본문에서 첫 번째 파일 파트를 찾아 (파일명, 바이트 조각)을 순서대로 반환합니다.
+    파일이 아닌 폼 필드와 두 번째 이후 파일 파트는 무시합니다.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise UploadError("Expected multipart/form-data with a boundary")
+
+    state: Dict[str, object] = {"filename": None, "active": False, "done": False}
+    header = {"field": b"", "value": b""}
+    headers: Dict[bytes, bytes] = {}
+    pieces: List[bytes] = []
+
+    def on_part_begin():
+        headers.clear()
+
+    def on_header_field(data, start, end):
+        header["field"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        header["value"] += data[start:end]
+
+    def on_header_end():
+        headers[header["field"].lower()] = header["value"]
+        header["field"], header["value"] = b"", b""
+
+    def on_headers_finished():
+        _, disposition = parse_options_header(headers.get(b"content-disposition", b""))
+        filename = disposition.get(b"filename")
+        if filename and not state["done"]:
+            state["filename"] = filename.decode("utf-8", errors="replace")
+            state["active"] = True
+
+    def on_part_data(data, start, end):
+        if state["active"]:
+            pieces.append(bytes(data[start:end]))
+
+    def on_part_end():
+        if state["active"]:
+            state["active"] = False
+            state["done"] = True
+
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+
+    async for body in request.stream():
+        parser.write(body)
+        if pieces:
+            data = b"".join(pieces)
+            pieces.clear()
+            yield state["filename"], data
+    parser.finalize()
+
+    if not state["done"]:
+        raise UploadError("No file part found in upload")
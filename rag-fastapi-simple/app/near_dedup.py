@@ -0,0 +1,150 @@
+"""
+MinHash 기반 유사 중복 청크 제거
+
+rag-fastapi-structured/app/utils/near_dedup.py 와 동일한 내용을 유지합니다.
+- 청크를 공백 정규화 후 글자 n-gram(shingle) 집합으로 만들고 MinHash 서명 계산
+  (한글은 띄어쓰기 단위가 일정하지 않아 단어 대신 글자 단위 사용)
+- LSH 밴딩으로 후보만 찾은 뒤 서명 일치율(추정 Jaccard 유사도)이 threshold 이상이면 중복으로 판단
+- 먼저 들어온 청크를 남기고 이후의 유사 청크는 저장하지 않음
+- 제거한 청크 수/글자 수로 인덱스가 얼마나 줄었는지 집계
+"""
+import zlib
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# 2^31 - 1 (메르센 소수): crc32(32bit) * a(31bit) 가 uint64 범위를 넘지 않음
+_PRIME = np.uint64((1 << 31) - 1)
+
+
+def _choose_bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """
+    num_perm 개의 해시를 (밴드 수, 밴드당 행 수)로 나눕니다.
+    후보 판정 임계값 (1/b)^(1/r) 이 threshold 이하인 조합 중 가장 가까운 것을 골라
+    실제 중복이 후보에서 빠지지 않도록 합니다. (최종 판정은 서명 일치율로 다시 확인)
+    """
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        if (1 / bands) ** (1 / rows) <= threshold:
+            best = (bands, rows)
+    return best
+
+
+class NearDuplicateFilter:
+    """한 번의 적재(파일/업로드 작업) 동안 본 청크의 MinHash 서명을 유지하며 유사 중복을 걸러냅니다."""
+
+    def __init__(self, threshold: float = 0.9, num_perm: int = 64, shingle_size: int = 5):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands, self.rows = _choose_bands(num_perm, threshold)
+        # 같은 입력이 항상 같은 서명이 되도록 고정 시드 사용
+        rng = np.random.RandomState(1)
+        self._a = rng.randint(1, int(_PRIME), num_perm).astype(np.uint64)
+        self._b = rng.randint(0, int(_PRIME), num_perm).astype(np.uint64)
+        # 밴드 키마다 그 키를 가진 모든 서명의 인덱스 (첫 서명만 두면 그와 다른 유사 청크를 놓침)
+        self._buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(self.bands)]
+        self._signatures: List[np.ndarray] = []
+
+        self.chunks_in = 0
+        self.chunks_dropped = 0
+        self.chars_in = 0
+        self.chars_dropped = 0
+
+    def signature(self, text: str) -> np.ndarray:
+        normalized = " ".join(text.split()).lower()
+        size = self.shingle_size
+        shingles = {normalized[i:i + size] for i in range(max(len(normalized) - size + 1, 1))}
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode("utf-8")) for shingle in shingles),
+            dtype=np.uint64,
+            count=len(shingles)
+        )
+        return ((np.outer(hashes, self._a) + self._b) % _PRIME).min(axis=0).astype(np.uint32)
+
+    def is_duplicate(self, text: str) -> bool:
+        """이미 본 청크와 유사하면 True, 아니면 서명을 등록하고 False를 반환합니다."""
+        signature = self.signature(text)
+        keys = [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+        candidates = {index for bucket, key in zip(self._buckets, keys) for index in bucket.get(key, ())}
+        for candidate in candidates:
+            if np.mean(self._signatures[candidate] == signature) >= self.threshold:
+                return True
+
+        index = len(self._signatures)
+        self._signatures.append(signature)
+        for bucket, key in zip(self._buckets, keys):
+            bucket.setdefault(key, []).append(index)
+        return False
+
+    def keep(self, texts: List[str]) -> List[int]:
+        """중복이 아닌 청크의 인덱스 목록을 반환합니다."""
+        kept = []
+        for i, text in enumerate(texts):
+            self.chunks_in += 1
+            self.chars_in += len(text)
+            if self.is_duplicate(text):
+                self.chunks_dropped += 1
+                self.chars_dropped += len(text)
+            else:
+                kept.append(i)
+        return kept
+
+    def filter(self, texts: List[str], metadatas: Optional[List[Dict[str, Any]]] = None,
+               ids: Optional[List[str]] = None) -> Tuple[List[str], Optional[List[Dict[str, Any]]], Optional[List[str]]]:
+        """청크와 (있으면) 메타데이터, ID에서 유사 중복을 제거합니다."""
+        kept = self.keep(texts)
+        if len(kept) == len(texts):
+            return texts, metadatas, ids
+        return (
+            [texts[i] for i in kept],
+            [metadatas[i] for i in kept] if metadatas is not None else None,
+            [ids[i] for i in kept] if ids is not None else None
+        )
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "chunks_in": self.chunks_in,
+            "chunks_dropped": self.chunks_dropped,
+            "chars_dropped": self.chars_dropped,
+            "shrink_ratio": round(self.chunks_dropped / self.chunks_in, 4) if self.chunks_in else 0.0
+        }
+
+
+class DedupStats:
+    """적재별 유사 중복 제거 결과를 누적합니다."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.ingestions = 0
+        self.chunks_in = 0
+        self.chunks_dropped = 0
+        self.chars_in = 0
+        self.chars_dropped = 0
+
+    def record(self, dedup: NearDuplicateFilter, label: str = ""):
+        with self._lock:
+            self.ingestions += 1
+            self.chunks_in += dedup.chunks_in
+            self.chunks_dropped += dedup.chunks_dropped
+            self.chars_in += dedup.chars_in
+            self.chars_dropped += dedup.chars_dropped
+        if dedup.chunks_dropped:
+            print(f"🧹 Dropped {dedup.chunks_dropped}/{dedup.chunks_in} near-duplicate chunks "
+                  f"({dedup.chunks_dropped / dedup.chunks_in:.1%}) {label}".rstrip())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "ingestions": self.ingestions,
+                "chunks_in": self.chunks_in,
+                "chunks_dropped": self.chunks_dropped,
+                "chars_dropped": self.chars_dropped,
+                "shrink_ratio": round(self.chunks_dropped / self.chunks_in, 4) if self.chunks_in else 0.0,
+                "chars_shrink_ratio": round(self.chars_dropped / self.chars_in, 4) if self.chars_in else 0.0
+            }
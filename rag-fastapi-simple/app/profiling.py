@@ -0,0 +1,227 @@
+"""
+요청 단위 프로파일링 및 메모리 스냅샷 (관리자 전용)
+
+rag-fastapi-structured/app/utils/profiling.py 와 동일한 내용을 유지합니다.
+- X-Profile: 1 헤더 또는 ?profile=1 쿼리가 있는 요청만 프로파일링 (X-Admin-Token 필요)
+- pyinstrument가 설치되어 있으면 샘플링 프로파일(HTML 플레임그래프),
+  없으면 cProfile 결과(.prof, snakeviz 등으로 확인)를 저장하고 X-Profile-Id 헤더로 파일명을 반환
+- tracemalloc 상위 할당 위치, 프로세스 RSS, 모델 파라미터 크기, 경로별 매핑 파일 RSS 조회
+"""
+import os
+import re
+import time
+import hmac
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+from fastapi import Header, HTTPException
+
+PROFILE_ID_PATTERN = re.compile(r"^[\w.\-]+\.(html|prof)$")
+
+
+def admin_guard(token: str):
+    """X-Admin-Token 헤더를 확인하는 FastAPI 의존성을 만듭니다. (토큰이 비어있으면 관리 기능 비활성화)"""
+    def dependency(x_admin_token: Optional[str] = Header(default=None)):
+        if not token:
+            raise HTTPException(status_code=404, detail="Admin endpoints are disabled")
+        if not x_admin_token or not hmac.compare_digest(x_admin_token, token):
+            raise HTTPException(status_code=403, detail="Invalid admin token")
+    return dependency
+
+
+class _Profile:
+    """pyinstrument(있으면) 또는 cProfile로 한 요청을 프로파일링합니다."""
+
+    def __init__(self):
+        try:
+            from pyinstrument import Profiler
+            # async_mode: await 중인 시간도 해당 코루틴의 호출 스택에 포함
+            self._profiler = Profiler(async_mode="enabled")
+            self.extension = "html"
+        except ImportError:
+            import cProfile
+            self._profiler = cProfile.Profile()
+            self.extension = "prof"
+
+    def start(self):
+        self._profiler.start() if self.extension == "html" else self._profiler.enable()
+
+    def stop_and_save(self, path: str):
+        if self.extension == "html":
+            self._profiler.stop()
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(self._profiler.output_html())
+        else:
+            self._profiler.disable()
+            self._profiler.dump_stats(path)
+
+
+class ProfilingMiddleware:
+    """
+    요청 단위 프로파일링 ASGI 미들웨어
+    스트리밍 응답도 본문 전송이 끝날 때까지 프로파일에 포함됩니다.
+    프로파일러는 스레드당 하나만 동작하므로 이미 프로파일링 중이면 요청을 그대로 처리합니다.
+    """
+
+    def __init__(self, app, token: str, profile_dir: str = "./profiles"):
+        self.app = app
+        self.token = token
+        self.profile_dir = profile_dir
+        self._active = False
+
+    def _requested(self, scope) -> bool:
+        if not self.token:
+            return False
+        headers = dict(scope.get("headers") or [])
+        flag = headers.get(b"x-profile", b"") == b"1" or b"profile=1" in scope.get("query_string", b"").split(b"&")
+        supplied = headers.get(b"x-admin-token", b"").decode("latin-1")
+        return flag and bool(supplied) and hmac.compare_digest(supplied, self.token)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+        if self._active:
+            print(f"⚠️ Profiler busy, serving {scope.get('path')} without profiling")
+            await self.app(scope, receive, send)
+            return
+
+        profile = _Profile()
+        slug = re.sub(r"[^\w]+", "_", scope.get("path", "")).strip("_") or "root"
+        profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{slug}-{os.getpid()}.{profile.extension}"
+
+        async def send_with_header(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": list(message.get("headers", [])) + [
+                    (b"x-profile-id", profile_id.encode())
+                ]}
+            await send(message)
+
+        start = time.perf_counter()
+        self._active = True
+        profile.start()
+        try:
+            await self.app(scope, receive, send_with_header)
+        finally:
+            self._active = False
+            os.makedirs(self.profile_dir, exist_ok=True)
+            profile.stop_and_save(os.path.join(self.profile_dir, profile_id))
+            print(f"🔬 Profiled {scope.get('path')} in {time.perf_counter() - start:.2f}s -> {profile_id}")
+
+
+def list_profiles(profile_dir: str) -> List[Dict[str, Any]]:
+    """저장된 프로파일 목록을 최신순으로 반환합니다."""
+    if not os.path.isdir(profile_dir):
+        return []
+    profiles = []
+    for name in os.listdir(profile_dir):
+        if PROFILE_ID_PATTERN.match(name):
+            stat = os.stat(os.path.join(profile_dir, name))
+            profiles.append({"id": name, "size_kb": round(stat.st_size / 1024, 1), "created": stat.st_mtime})
+    return sorted(profiles, key=lambda p: p["created"], reverse=True)
+
+
+def profile_path(profile_dir: str, profile_id: str) -> str:
+    """프로파일 ID를 파일 경로로 변환합니다. (경로 조작 방지)"""
+    path = os.path.join(profile_dir, profile_id)
+    if not PROFILE_ID_PATTERN.match(profile_id) or not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail=f"Profile '{profile_id}' not found")
+    return path
+
+
+def tracemalloc_start(frames: int = 1) -> Dict[str, Any]:
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+    return {"tracing": True, "frames": tracemalloc.get_traceback_limit()}
+
+
+def tracemalloc_stop() -> Dict[str, Any]:
+    tracemalloc.stop()
+    return {"tracing": False}
+
+
+def tracemalloc_top(limit: int = 20, key_type: str = "lineno") -> Dict[str, Any]:
+    """tracemalloc 스냅샷의 상위 할당 위치를 반환합니다."""
+    if not tracemalloc.is_tracing():
+        return {"tracing": False, "top": []}
+    snapshot = tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ])
+    current, peak = tracemalloc.get_traced_memory()
+    return {
+        "tracing": True,
+        "traced_mb": round(current / 2**20, 1),
+        "peak_mb": round(peak / 2**20, 1),
+        "top": [
+            {
+                "location": str(stat.traceback[0]),
+                "size_kb": round(stat.size / 1024, 1),
+                "count": stat.count
+            }
+            for stat in snapshot.statistics(key_type)[:limit]
+        ]
+    }
+
+
+def process_rss_mb() -> Optional[float]:
+    """현재 프로세스의 RSS(MB)를 반환합니다."""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    try:
+        import resource
+        import sys
+        # Linux 외 환경에서는 최대 RSS만 조회 가능 (macOS는 bytes 단위)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round(peak / (2**20 if sys.platform == "darwin" else 1024), 1)
+    except ImportError:
+        return None
+
+
+def mapped_rss_mb(paths: Dict[str, str]) -> Dict[str, float]:
+    """
+    /proc/self/smaps 에서 경로별로 메모리에 매핑된 파일의 RSS(MB)를 합산합니다. (Linux 전용)
+    예: {"chroma": "./data"} -> Chroma 세그먼트/SQLite 파일 중 실제 메모리에 올라온 크기
+    """
+    prefixes = {name: os.path.realpath(path) for name, path in paths.items() if path}
+    totals = {name: 0 for name in prefixes}
+    current = None
+    try:
+        with open("/proc/self/smaps", "r") as f:
+            for line in f:
+                if line[0] in "0123456789abcdef" and "-" in line.split(" ", 1)[0]:
+                    parts = line.split(None, 5)
+                    mapped = parts[5].strip() if len(parts) > 5 else ""
+                    current = next((n for n, p in prefixes.items() if mapped.startswith(p)), None)
+                elif current and line.startswith("Rss:"):
+                    totals[current] += int(line.split()[1])
+    except OSError:
+        return {}
+    return {name: round(kb / 1024, 1) for name, kb in totals.items()}
+
+
+def directory_size_mb(path: str) -> Optional[float]:
+    if not path or not os.path.isdir(path):
+        return None
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return round(total / 2**20, 1)
+
+
+def model_parameter_mb(model) -> Optional[float]:
+    """임베딩 모델(SentenceTransformer 등 torch 모듈)의 파라미터 메모리(MB)를 반환합니다."""
+    module = getattr(model, "_client", None) or getattr(model, "client", None) or model
+    if not hasattr(module, "parameters"):
+        return None
+    total = sum(p.numel() * p.element_size() for p in module.parameters())
+    return round(total / 2**20, 1)
@@ -1,11 +1,34 @@
+import os
 import json
 import requests
 from langchain_community.vectorstores import Chroma
+from response_normalizer import THINK_CLOSE, ResponseNormalizer, iter_json_objects
+from reasoning_budget import ReasoningStats, ThinkBudgetExceeded, ThinkTracker, build_generation_fields
 
 # Ollama 서버 정보
 OLLAMA_HOST = "http://localhost:11434"
 OLLAMA_MODEL = "deepseek-r1:8b"
 
+# 생성 옵션 (0 또는 빈 값이면 Ollama 기본값 사용)
+OLLAMA_NUM_PREDICT = int(os.getenv("OLLAMA_NUM_PREDICT", "0"))  # 최대 생성 토큰 수
+OLLAMA_NUM_CTX = int(os.getenv("OLLAMA_NUM_CTX", "0"))  # 컨텍스트 길이
+OLLAMA_STOP = json.loads(os.getenv("OLLAMA_STOP", "[]"))  # 생성 중단 문자열 (JSON 배열)
+OLLAMA_THINK = {"true": True, "false": False}.get(os.getenv("OLLAMA_THINK", "").lower())  # false이면 think 비활성화
+THINK_TOKEN_BUDGET = int(os.getenv("THINK_TOKEN_BUDGET", "0"))  # think 단계 최대 토큰 수 (0이면 제한 없음)
+THINK_BUDGET_MODE = os.getenv("THINK_BUDGET_MODE", "cut")  # 예산 초과 시 처리 (cut | abort)
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "3"))  # 프롬프트에 넣는 검색 문서 수
+
+# think 토큰 사용량 및 예산으로 절약한 토큰 집계
+reasoning_stats = ReasoningStats()
+
+def _generate(payload, normalizer, tracker):
+    """Ollama 스트리밍 응답을 집계하며 정규화기에 전달합니다. (예산 초과 시 연결을 닫아 생성 중단)"""
+    with requests.post(f"{OLLAMA_HOST}/api/generate", json=payload, stream=True) as response:
+        for obj in iter_json_objects(response.iter_content(chunk_size=None)):
+            tracker.observe(obj)
+            if obj.get("response"):
+                normalizer.feed(obj["response"])
+
 def query_ollama(prompt):
     """Ollama API를 사용하여 deepseek-r1:8b 모델 호출 (스트리밍 응답 처리)"""
     try:
@@ -27,45 +50,37 @@ def query_ollama(prompt):
 답변 형식:
 [질문에 대한 답변만 작성]
 """
-        response = requests.post(
-            f"{OLLAMA_HOST}/api/generate",
-            json={
-                "model": OLLAMA_MODEL,
-                "prompt": korean_prompt,
-                "system": "당신은 한국어 전용 답변 도우미입니다. 다음 규칙을 절대적으로 따르세요:\n1. 오직 한글로만 답변하세요\n2. 영어는 한글로 변환하세요 (API -> 에이피아이)\n3. 특수문자와 한자는 사용하지 마세요\n4. 간단명료하게 핵심만 답변하세요\n5. 모든 외래어는 한글로 표기하세요\n6. 답변 이외의 설명은 하지 마세요\n7. 생각하는 과정을 보여주지 마세요\n8. 바로 결과만 보여주세요"
-            },
-            stream=True  # Enable streaming for better response handling
-        )
-        
-        full_response = ""
-        for line in response.iter_lines():
-            if line:
-                json_response = json.loads(line)
-                if 'response' in json_response:
-                    full_response += json_response['response']
+        payload = {
+            "model": OLLAMA_MODEL,
+            "prompt": korean_prompt,
+            "system": "당신은 한국어 전용 답변 도우미입니다. 다음 규칙을 절대적으로 따르세요:\n1. 오직 한글로만 답변하세요\n2. 영어는 한글로 변환하세요 (API -> 에이피아이)\n3. 특수문자와 한자는 사용하지 마세요\n4. 간단명료하게 핵심만 답변하세요\n5. 모든 외래어는 한글로 표기하세요\n6. 답변 이외의 설명은 하지 마세요\n7. 생각하는 과정을 보여주지 마세요\n8. 바로 결과만 보여주세요",
+            **build_generation_fields(
+                num_predict=OLLAMA_NUM_PREDICT,
+                num_ctx=OLLAMA_NUM_CTX,
+                stop=OLLAMA_STOP,
+                think=OLLAMA_THINK
+            )
+        }
         
-        # think 태그와 그 내용 제거
-        if '<think>' in full_response:
-            parts = full_response.split('<think>')
-            for i in range(1, len(parts)):
-                if '</think>' in parts[i]:
-                    parts[i] = parts[i].split('</think>', 1)[1]
-            full_response = ''.join(parts).strip()
-            
-        # 응답에서 '[' 로 시작하는 헤더 부분 제거
-        if '[' in full_response:
-            full_response = full_response.split(']')[-1].strip()
-            
-        # 추가 개행 제거 및 포맷 정리
-        lines = [line.strip() for line in full_response.split('\n') if line.strip()]
+        # NDJSON 스트림을 증분 파싱하며 think 태그 제거 및 포맷 정리를 한 번에 처리
+        normalizer = ResponseNormalizer()
+        tracker = ThinkTracker(THINK_TOKEN_BUDGET)
+        try:
+            _generate(payload, normalizer, tracker)
+            reasoning_stats.record(tracker, "disabled" if OLLAMA_THINK is False else "natural")
+        except ThinkBudgetExceeded as e:
+            print(f"✂️ {e} (mode={THINK_BUDGET_MODE})")
+            reasoning_stats.record(tracker, "cutoff")
+            if tracker.in_think:
+                # 이미 전달한 think 블록을 닫아 정규화 시 제거되도록 함
+                normalizer.feed(THINK_CLOSE)
+            if THINK_BUDGET_MODE != "abort":
+                # think 단계 없이 답변만 다시 생성
+                retry_tracker = ThinkTracker()
+                _generate({**payload, "think": False}, normalizer, retry_tracker)
+                reasoning_stats.record(retry_tracker, "retry")
         
-        # 처음 줄은 그대로 유지하고, 번호 항목만 구분
-        formatted_response = lines[0]
-        for line in lines[1:]:
-            if line.startswith(('1)', '2)', '3)', '4)', '5)', '6)', '7)', '8)', '9)')): 
-                formatted_response += '\n\n' + line
-            else:
-                formatted_response += '\n' + line
+        formatted_response = normalizer.finish()
         
         return formatted_response if formatted_response else "⚠️ Ollama 응답 오류"
 
@@ -76,7 +91,7 @@ def run_rag_query(vector_db, query):
     """벡터DB에서 질문에 대한 답변을 검색"""
     try:
         # 벡터DB에서 검색 수행
-        results = vector_db.similarity_search(query, k=3)
+        results = vector_db.similarity_search(query, k=RETRIEVAL_TOP_K)
         
         # 검색된 각 문서를 구조화된 형태로 처리
         contexts = []
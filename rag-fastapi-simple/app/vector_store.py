@@ -1,14 +1,52 @@
-import json
+import os
+import chromadb
 from langchain_community.vectorstores import Chroma
-from embeddings import NomicEmbeddings  # embed 모듈 사용
+from embeddings import get_ingest_embeddings  # embed 모듈 사용
+from response_normalizer import iter_response_text
+from near_dedup import DedupStats, NearDuplicateFilter
 
 # CHROMA 서비스 주소 (Kubernetes 클러스터 내 서비스 기준)
-CHROMA_HOST = "localhost"
-CHROMA_PORT = "8090"
+CHROMA_HOST = os.getenv("CHROMA_HOST", "localhost")
+CHROMA_PORT = os.getenv("CHROMA_PORT", "8090")
 PERSIST_DIR = "./data"  # ChromaDB 데이터 영구 저장 경로
+# ChromaDB 접속 방식: persistent(로컬 디렉토리 직접 사용) | http(Chroma 서버 공유)
+CHROMA_MODE = os.getenv("CHROMA_MODE", "persistent")
+# 유사 중복 청크 판정 기준 (추정 Jaccard 유사도, 0이면 중복 제거 안 함)
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.9"))
+DEDUP_NUM_PERM = int(os.getenv("DEDUP_NUM_PERM", "64"))
+DEDUP_SHINGLE_SIZE = int(os.getenv("DEDUP_SHINGLE_SIZE", "5"))
+# 청크 분할 설정 (rag-fastapi-structured 의 scripts.sweep_retrieval 로 측정 후 조정)
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "300"))  # 한글 기준 약 150-200자 정도
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "50"))  # 문맥 유지를 위한 오버랩
+
+# 적재 시 유사 중복 청크 제거 결과 누적
+dedup_stats = DedupStats()
 
 from chromadb.config import Settings
 
+_chroma_client = None
+
+def get_chroma_client():
+    """
+    CHROMA_MODE에 맞는 ChromaDB 클라이언트를 반환합니다.
+    여러 uvicorn 워커가 하나의 인덱스를 공유하려면 CHROMA_MODE=http 로 Chroma 서버에 접속합니다.
+    프로세스당 하나의 클라이언트를 재사용합니다.
+    """
+    global _chroma_client
+    if _chroma_client is None:
+        if CHROMA_MODE == "http":
+            _chroma_client = chromadb.HttpClient(
+                host=CHROMA_HOST,
+                port=int(CHROMA_PORT),
+                settings=Settings(anonymized_telemetry=False)
+            )
+        else:
+            _chroma_client = chromadb.Client(Settings(
+                is_persistent=True,
+                persist_directory=PERSIST_DIR
+            ))
+    return _chroma_client
+
 def parse_llm_response(response: str) -> str:
     """Parse LLM response from JSON format to readable text
 
@@ -19,20 +57,8 @@ def parse_llm_response(response: str) -> str:
         str: Parsed human readable response
     """
     try:
-        # Split response into individual JSON objects
-        response_parts = response.split('}{"model"')
-        response_parts = [part if i == 0 else '{"model"' + part 
-                         for i, part in enumerate(response_parts)]
-        
-        # Extract actual response text from each part
-        full_text = ''
-        for part in response_parts:
-            try:
-                json_obj = json.loads(part)
-                if 'response' in json_obj:
-                    full_text += json_obj['response']
-            except json.JSONDecodeError:
-                continue
+        # 연결된 JSON 객체를 증분 파싱하여 응답 텍스트만 추출
+        full_text = ''.join(iter_response_text([response]))
         
         # Remove think tags and clean up the text
         full_text = full_text.replace('<think>\n', '').replace('</think>', '')
@@ -43,6 +69,74 @@ def parse_llm_response(response: str) -> str:
 
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 
+def _make_splitter():
+    # 한글 문서에 최적화된 텍스트 스플리터 설정
+    return RecursiveCharacterTextSplitter(
+        separators=["\n\n", "\n", ".", "!", "?", "。", "！", "？", " ", ""],
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        length_function=len,
+        keep_separator=False,
+        is_separator_regex=False
+    )
+
+class StreamingTextChunker:
+    """
+    텍스트를 조각 단위로 받아 청크로 분할합니다. (업로드 스트림을 전체 버퍼링하지 않고 처리)
+    window 글자 이상 쌓이면 마지막 문단/줄 경계까지를 잘라 분할하고, 나머지는 다음 조각과 이어 붙입니다.
+    rag-fastapi-structured 의 utils.document_parser.StreamingTextChunker 와 같은 방식 (헤딩/오프셋 메타데이터 없음)
+    """
+
+    def __init__(self, window=None):
+        self.window = CHUNK_SIZE * 8 if window is None else window
+        self._splitter = _make_splitter()
+        self._buffer = ""
+
+    def feed(self, text):
+        """텍스트 조각을 추가하고, 분할이 끝난 청크 목록을 반환합니다."""
+        self._buffer += text
+        if len(self._buffer) < self.window:
+            return []
+
+        # 문단 경계 > 줄 경계 순으로 자르고, 줄바꿈이 없는 긴 텍스트는 window*4 에서 강제로 자름
+        cut = self._buffer.rfind("\n\n")
+        if cut > 0:
+            cut += 2
+        else:
+            cut = self._buffer.rfind("\n") + 1
+        if cut <= 0:
+            if len(self._buffer) < self.window * 4:
+                return []
+            cut = len(self._buffer)
+
+        block, self._buffer = self._buffer[:cut], self._buffer[cut:]
+        return self._split(block)
+
+    def close(self):
+        """남은 텍스트를 분할하여 반환합니다."""
+        block, self._buffer = self._buffer, ""
+        return self._split(block)
+
+    def _split(self, block):
+        return self._splitter.split_text(block) if block.strip() else []
+
+def add_chunks_to_chroma(splits, collection_name, dedup=None):
+    """
+    이미 분할된 청크를 콜렉션에 추가하고, 저장한 청크 수를 반환합니다. (업로드 적재 배치 단위)
+    dedup 필터를 여러 배치에 걸쳐 재사용하면 배치 사이의 유사 중복도 제거합니다.
+    """
+    if dedup is not None:
+        splits, _, _ = dedup.filter(splits)
+    if not splits:
+        return 0
+    vector_db = Chroma(
+        collection_name=collection_name,
+        embedding_function=get_ingest_embeddings(),
+        client=get_chroma_client()
+    )
+    vector_db.add_texts(splits)
+    return len(splits)
+
 def store_documents_in_chroma(documents, collection_name="rag_test"):
     """
     문서를 벡터로 변환하여 ChromaDB에 저장하는 함수.
@@ -61,15 +155,7 @@ def store_documents_in_chroma(documents, collection_name="rag_test"):
             else:
                 raise ValueError(f"Unsupported document type: {type(doc)}")
 
-        # 한글 문서에 최적화된 텍스트 스플리터 설정
-        text_splitter = RecursiveCharacterTextSplitter(
-            separators=["\n\n", "\n", ".", "!", "?", "。", "！", "？", " ", ""],
-            chunk_size=300,  # 한글 기준 약 150-200자 정도
-            chunk_overlap=50,  # 문맥 유지를 위한 오버랩
-            length_function=len,
-            keep_separator=False,
-            is_separator_regex=False
-        )
+        text_splitter = _make_splitter()
         
         # 문서를 청크로 분할
         splits = []
@@ -81,15 +167,21 @@ def store_documents_in_chroma(documents, collection_name="rag_test"):
         if not splits:
             raise ValueError("No valid text content found in documents")
 
-        # ✅ 임베딩 모델 사용
-        embedding_model = NomicEmbeddings()
+        # 유사 중복 청크 제거 (반복되는 문단이 여러 벡터로 저장되어 검색 결과를 차지하지 않도록)
+        if DEDUP_THRESHOLD:
+            dedup = NearDuplicateFilter(DEDUP_THRESHOLD, DEDUP_NUM_PERM, DEDUP_SHINGLE_SIZE)
+            splits, _, _ = dedup.filter(splits)
+            dedup_stats.record(dedup, f"from {collection_name}")
+
+        # ✅ 임베딩 모델 사용 (공유 모델 + 임베딩 캐시, 이미 임베딩한 청크는 재계산하지 않음)
+        embedding_model = get_ingest_embeddings()
 
         # ✅ Chroma 인스턴스 생성
         vector_db = Chroma.from_texts(
             texts=splits,
             embedding=embedding_model,
             collection_name=collection_name,
-            persist_directory=PERSIST_DIR
+            client=get_chroma_client()
         )
 
         return vector_db
@@ -1,12 +1,68 @@
+from typing import List, Optional
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     OLLAMA_BASE_URL: str = "http://localhost:11434"
     MODEL_NAME: str = "deepseek-r1:8b"
     EMBEDDING_MODEL: str = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+    EMBEDDING_BACKEND: str = "torch"  # 임베딩 백엔드 (torch | onnx)
+    ONNX_MODEL_DIR: str = "./onnx_model"  # ONNX 변환 모델 저장 경로
+    ONNX_QUANTIZE: bool = False  # ONNX 모델 동적 int8 양자화 사용 여부
+    EMBEDDING_INTRA_OP_THREADS: int = 0  # 임베딩 연산 내부 병렬 스레드 수 (torch/onnx, 0이면 라이브러리 기본값)
+    EMBEDDING_INTER_OP_THREADS: int = 0  # 독립 연산 간 병렬 스레드 수 (0이면 라이브러리 기본값)
+    EMBEDDING_TOKEN_BUDGET: int = 4096  # 문서 적재 시 배치당 최대 토큰 수 (배치 크기 × 배치 내 최대 길이)
+    EMBEDDING_MAX_BATCH: int = 256  # 문서 적재 시 배치당 최대 청크 수
+    EMBEDDING_SERVER_SOCKET: str = ""  # 공유 임베딩 워커 소켓 경로 (비어있으면 프로세스마다 모델 로드)
+    EMBEDDING_SERVER_MAX_BATCH: int = 64  # 임베딩 워커가 한 번에 모아 계산하는 최대 텍스트 수
+    EMBEDDING_SERVER_MAX_WAIT_MS: float = 5.0  # 배치를 모으기 위해 기다리는 최대 시간(ms)
+    EMBEDDING_CACHE: bool = True  # 문서 적재 시 (모델, 청크 해시) 기준 임베딩 캐시 사용 여부
+    EMBEDDING_CACHE_PATH: str = "./embedding_cache/embeddings.sqlite3"  # 임베딩 캐시 SQLite 파일 경로
+    EMBEDDING_CACHE_MAX_MB: int = 512  # 임베딩 캐시 최대 크기 (초과 시 오래 사용되지 않은 항목부터 삭제)
     DOCUMENT_PATH: str = "./document"
+    DOCUMENT_WATCH: bool = False  # 문서 폴더 변경 감시 및 자동 재색인 여부
+    DOCUMENT_WATCH_DEBOUNCE_MS: int = 1000  # 변경 이벤트를 모아서 처리할 간격(ms)
     PERSIST_DIR: str = "./data"  # ChromaDB 데이터 영구 저장 경로
-    
+    CHUNK_SIZE: int = 300  # 청크 크기 (한글 기준 약 150-200자 정도)
+    CHUNK_OVERLAP: int = 50  # 문맥 유지를 위한 청크 오버랩
+    RETRIEVAL_TOP_K: int = 3  # 질의 시 프롬프트에 넣는 검색 문서 수 (scripts.sweep_retrieval 로 측정 후 조정)
+    CATALOG_CHUNK_ROWS: int = 10000  # 카탈로그 CSV를 한 번에 읽는 행 수 (메모리 상한)
+    CATALOG_EMBED_BATCH_SIZE: int = 256  # 카탈로그 임베딩 배치 크기
+    CATALOG_WORKERS: int = 1  # 카탈로그 임베딩 배치 동시 실행 수 (각 배치가 EMBEDDING_INTRA_OP_THREADS 만큼 코어를 쓰므로 곱이 코어 수를 넘지 않게)
+    DEDUP_THRESHOLD: float = 0.9  # 유사 중복 청크 판정 기준 (추정 Jaccard 유사도, 0이면 중복 제거 안 함)
+    DEDUP_NUM_PERM: int = 64  # MinHash 서명 길이 (클수록 정확하지만 느림)
+    DEDUP_SHINGLE_SIZE: int = 5  # 유사도 계산에 사용하는 글자 n-gram 크기
+    INGEST_WORKERS: int = 2  # 업로드 문서 적재 워커 스레드 수
+    INGEST_MAX_PENDING: int = 16  # 수신/대기/실행 중인 업로드 작업 최대 수 (초과 시 429)
+    INGEST_MAX_UPLOAD_MB: int = 512  # 업로드 파일 최대 크기(MB) (초과 시 413)
+    INGEST_SPOOL_DIR: str = "./upload_spool"  # 업로드 수신 중 청크/CSV를 임시 저장하는 경로
+    INGEST_BATCH_SIZE: int = 512  # 업로드 적재 시 한 번에 임베딩/저장하는 청크 수
+    FILTER_EXACT_SEARCH_MAX: int = 2000  # where 필터 후보가 이 수 이하이면 후보만 정확히 거리 계산
+    CHROMA_MODE: str = "persistent"  # ChromaDB 접속 방식 (persistent | http)
+    CHROMA_HOST: str = "localhost"  # http 모드 Chroma 서버 주소
+    CHROMA_PORT: int = 8090  # http 모드 Chroma 서버 포트
+    CHROMA_SSL: bool = False  # http 모드 HTTPS 사용 여부
+    CHROMA_SHARDS: List[str] = []  # 샤드 저장소 목록 (로컬 경로 또는 http://host:port, .env 에서는 JSON 배열, 비어있으면 CHROMA_MODE 단일 저장소)
+    CHROMA_PARTITIONED_COLLECTIONS: List[str] = []  # 청크 ID 해시로 모든 샤드에 나누어 저장할 대형 콜렉션 (나머지는 콜렉션 단위로 한 샤드에 배치)
+    QUERY_COALESCING: bool = True  # 동일 질의의 동시 요청 병합 여부
+    MODEL_TIERS: List[str] = []  # 빠른 모델부터 큰 모델 순서의 생성 모델 목록 (.env 에서는 JSON 배열, 비어있으면 MODEL_NAME만 사용)
+    ROUTING_SHORT_QUERY_CHARS: int = 30  # 이 길이 이하의 질의는 짧은 질의로 판단
+    ROUTING_SHORT_CONTEXT_CHARS: int = 1200  # 검색 문서 합계가 이 길이 이하이면 짧은 컨텍스트로 판단
+    ROUTING_CONFIDENT_DISTANCE: float = 0.5  # top-1 검색 거리가 이 값 이하이면 확실한 검색 결과로 판단
+    ROUTING_TIMEOUT_S: float = 60.0  # 모델별 생성 제한 시간(초), 초과 시 다른 모델로 재시도
+    GENERATION_CONCURRENCY: int = 1  # Ollama 동시 생성 수
+    GENERATION_QUEUE_SIZE: int = 32  # 생성 대기열 최대 길이 (초과 시 429)
+    GENERATION_QUEUE_TIMEOUT: float = 60.0  # 대기열 최대 대기 시간(초) (초과 시 503)
+    GENERATION_NUM_PREDICT: int = 0  # 최대 생성 토큰 수 (0이면 Ollama 기본값)
+    GENERATION_NUM_CTX: int = 0  # 컨텍스트 길이 (0이면 Ollama 기본값)
+    GENERATION_STOP: List[str] = []  # 생성 중단 문자열 (.env 에서는 JSON 배열)
+    GENERATION_THINK: Optional[bool] = None  # false이면 think 단계 비활성화 (비어있으면 모델 기본값)
+    THINK_TOKEN_BUDGET: int = 0  # think 단계 최대 토큰 수 (0이면 제한 없음)
+    THINK_BUDGET_MODE: str = "cut"  # 예산 초과 시 처리 (cut: think 없이 재생성 | abort: 중단)
+    ADMIN_TOKEN: str = ""  # 관리자 API/요청 프로파일링 토큰 (비어있으면 비활성화)
+    PROFILE_DIR: str = "./profiles"  # 요청 프로파일 저장 경로
+    BATCH_MAX_QUERIES: int = 500  # 배치 질의 최대 개수
+    BATCH_MAX_CONCURRENCY: int = 4  # 배치 내 동시 생성 수
+
     class Config:
         env_file = ".env"
 
@@ -1,8 +1,9 @@
 import os
 from fastapi import FastAPI
-from routers import rag_router
-from services.rag_service import RAGService
+from routers import rag_router, admin_router
+from services.document_watcher import DocumentWatcher
 from config import settings
+from utils.profiling import ProfilingMiddleware
 
 app = FastAPI(
     title="RAG API",
@@ -12,24 +13,34 @@ app = FastAPI(
     redoc_url=None
 )
 
+# 요청 단위 프로파일링 (ADMIN_TOKEN 설정 시 X-Profile: 1 헤더로 활성화)
+app.add_middleware(ProfilingMiddleware, token=settings.ADMIN_TOKEN, profile_dir=settings.PROFILE_DIR)
+
 # API 라우터 등록
 app.include_router(
     rag_router.router,
     prefix="/api/v1"
 )
+app.include_router(
+    admin_router.router,
+    prefix="/api/v1/admin"
+)
+
+document_watcher = None
 
 # 시작 이벤트 핸들러
 @app.on_event("startup")
 async def startup_event():
     """서버 시작 시 문서 폴더를 초기화하고 문서를 로드합니다."""
+    global document_watcher
     try:
         # document 폴더 경로 가져오기
         if not os.path.exists(settings.DOCUMENT_PATH):
             os.makedirs(settings.DOCUMENT_PATH)
             print(f"Created document directory at: {settings.DOCUMENT_PATH}")
         
-        # 문서 자동 로드
-        rag_service = RAGService()
+        # 문서 자동 로드 (라우터와 같은 서비스 인스턴스 사용)
+        rag_service = rag_router.rag_service
         loaded_files = rag_service.load_all_documents()
         if loaded_files:
             print("\n📄 Document Loading Status:")
@@ -40,11 +51,23 @@ async def startup_event():
         else:
             print("\n⚠️ No documents found to load\n")
             
+        # 문서 폴더 변경 감시 시작 (선택)
+        if settings.DOCUMENT_WATCH:
+            document_watcher = DocumentWatcher(rag_service)
+            document_watcher.start()
+            
         print("🟢 Server started successfully")
             
     except Exception as e:
         print(f"Error during startup: {str(e)}")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """서버 종료 시 문서 감시와 업로드 적재 워커를 중지합니다."""
+    if document_watcher is not None:
+        await document_watcher.stop()
+    rag_router.rag_service.ingest_jobs.shutdown()
+
 @app.get("/")
 async def root():
     return {
@@ -0,0 +1,62 @@
+import os
+from typing import Any, Dict, List
+from fastapi import APIRouter, Depends
+from fastapi.responses import FileResponse
+from config import settings
+from routers.rag_router import rag_service
+from utils.profiling import (
+    admin_guard, list_profiles, profile_path, tracemalloc_start, tracemalloc_stop, tracemalloc_top,
+    process_rss_mb, mapped_rss_mb, directory_size_mb, model_parameter_mb
+)
+
+# ADMIN_TOKEN이 설정된 경우에만 X-Admin-Token 헤더로 접근 가능
+router = APIRouter(dependencies=[Depends(admin_guard(settings.ADMIN_TOKEN))])
+
+HF_CACHE_DIR = os.getenv("HF_HOME", os.path.expanduser("~/.cache/huggingface"))
+
+@router.get("/profiles", response_model=List[Dict[str, Any]], tags=["5. Admin"])
+async def get_profiles():
+    """저장된 요청 프로파일 목록을 반환합니다. (X-Profile: 1 헤더로 요청 시 생성)"""
+    return list_profiles(settings.PROFILE_DIR)
+
+@router.get("/profiles/{profile_id}", tags=["5. Admin"])
+async def download_profile(profile_id: str):
+    """프로파일 파일(pyinstrument HTML 또는 cProfile .prof)을 반환합니다."""
+    path = profile_path(settings.PROFILE_DIR, profile_id)
+    media_type = "text/html" if path.endswith(".html") else "application/octet-stream"
+    return FileResponse(path, media_type=media_type, filename=profile_id)
+
+@router.post("/tracemalloc/start", tags=["5. Admin"])
+async def start_tracemalloc(frames: int = 1):
+    """메모리 할당 추적을 시작합니다. (추적 중에는 할당 비용이 증가)"""
+    return tracemalloc_start(frames)
+
+@router.post("/tracemalloc/stop", tags=["5. Admin"])
+async def stop_tracemalloc():
+    """메모리 할당 추적을 중지합니다."""
+    return tracemalloc_stop()
+
+@router.get("/memory", tags=["5. Admin"])
+async def get_memory(top: int = 20, key_type: str = "lineno"):
+    """프로세스 RSS, 임베딩 모델/Chroma 세그먼트 메모리, tracemalloc 상위 할당 위치를 반환합니다."""
+    mapped = mapped_rss_mb({
+        "chroma": settings.PERSIST_DIR if settings.CHROMA_MODE.lower() == "persistent" else "",
+        "hf_models": HF_CACHE_DIR,
+        "onnx_model": settings.ONNX_MODEL_DIR
+    })
+    return {
+        "rss_mb": process_rss_mb(),
+        "embedding_model": {
+            "backend": settings.EMBEDDING_BACKEND,
+            # 공유 임베딩 워커 사용 시 이 프로세스에는 모델이 없음 (parameters_mb = None)
+            "server_socket": settings.EMBEDDING_SERVER_SOCKET or None,
+            "parameters_mb": model_parameter_mb(rag_service.vector_store.embedding_model),
+            "mapped_rss_mb": round(mapped.get("hf_models", 0) + mapped.get("onnx_model", 0), 1)
+        },
+        "chroma": {
+            "mode": settings.CHROMA_MODE,
+            "mapped_rss_mb": mapped.get("chroma"),
+            "on_disk_mb": directory_size_mb(settings.PERSIST_DIR) if "chroma" in mapped else None
+        },
+        "tracemalloc": tracemalloc_top(top, key_type)
+    }
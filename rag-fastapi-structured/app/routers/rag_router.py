@@ -1,15 +1,48 @@
-from fastapi import APIRouter, HTTPException
+import time
+import asyncio
+from typing import Any, AsyncIterator, Dict, List, Optional
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pathlib import Path
 from schemas.rag import (
-    LoadDocumentRequest, QueryRequest, QueryResponse,
+    LoadDocumentRequest, QueryRequest, QueryResponse, BatchQueryRequest,
+    SearchRequest, SearchResponse, SearchResult,
     DeleteCollectionResponse, CollectionListResponse,
     CollectionContentsResponse, LoadAllResponse, DeleteAllResponse
 )
-from services.rag_service import RAGService
+from services.rag_service import RAGService, UploadTooLarge
+from config import settings
+from utils.generation_scheduler import GenerationRejected
+from utils.cancellation import ClientDisconnected, run_until_disconnected
+from utils.ingest_jobs import JobQueueFull
+from utils.multipart_stream import UploadError, iter_multipart_file
 
 router = APIRouter()
 rag_service = RAGService()
 
+def rejected_to_http(error: GenerationRejected) -> HTTPException:
+    """생성 대기열 거절을 Retry-After 헤더가 포함된 HTTP 오류로 변환합니다."""
+    return HTTPException(
+        status_code=error.status_code,
+        detail=error.detail,
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+def disconnected_to_http() -> HTTPException:
+    """클라이언트 연결 종료를 기록하고 499(Client Closed Request)로 변환합니다."""
+    rag_service.record_disconnect()
+    return HTTPException(status_code=499, detail="Client closed request")
+
+async def cancel_on_disconnect(source: AsyncIterator[str]) -> AsyncIterator[str]:
+    """스트리밍 응답 도중 연결이 끊겨 취소되면 기록합니다. (스트림 정리는 source에서 수행)"""
+    try:
+        async for piece in source:
+            yield piece
+    except asyncio.CancelledError:
+        rag_service.record_disconnect()
+        raise
+
 # 1. Load API endpoints
 @router.post("/documents", response_model=LoadAllResponse, tags=["1. Load"])
 async def load_all_documents():
@@ -45,17 +78,53 @@ async def load_document(request: LoadDocumentRequest):
                 detail=f"File '{request.file_path}' is empty"
             )
         
-        # 벡터 DB 저장
-        rag_service.vector_store.add_texts([text_content], collection_name)
+        # 청크 분할 후 메타데이터와 함께 벡터 DB 저장
+        rag_service.index_document(str(file_path), collection_name)
         
         return {
             "message": "Document loaded and stored successfully",
             "collection_name": collection_name
         }
         
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/documents/upload", status_code=202, tags=["1. Load"])
+async def upload_document(http_request: Request, collection_name: Optional[str] = None, replace: bool = False):
+    """
+    문서(.txt, .csv)를 multipart/form-data로 업로드하여 백그라운드에서 적재합니다.
+    업로드 본문은 받는 대로 청크 분할되며, 수신이 끝나면 작업 ID를 반환합니다.
+    진행 상황은 /documents/jobs/{job_id} 에서 조회합니다.
+    replace=true이면 적재가 끝난 뒤 기존 콜렉션을 원자적으로 교체합니다.
+    """
+    try:
+        job = rag_service.ingest_jobs.create(collection_name, replace)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+    try:
+        await rag_service.receive_upload(job, iter_multipart_file(http_request))
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except (UploadError, ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return job.to_dict()
+
+@router.get("/documents/jobs", response_model=List[Dict[str, Any]], tags=["1. Load"])
+async def list_ingest_jobs():
+    """업로드 적재 작업 목록을 최신순으로 반환합니다."""
+    return [job.to_dict() for job in rag_service.ingest_jobs.list()]
+
+@router.get("/documents/jobs/{job_id}", response_model=Dict[str, Any], tags=["1. Load"])
+async def get_ingest_job(job_id: str):
+    """업로드 적재 작업의 상태와 진행률을 반환합니다."""
+    job = rag_service.ingest_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Ingest job '{job_id}' not found")
+    return job.to_dict()
+
 # 2. Collection API endpoints
 @router.get("/collections", response_model=CollectionListResponse, tags=["2. Collections"])
 async def list_collections():
@@ -102,7 +171,7 @@ async def delete_all_collections():
 
 # 3. Query API endpoints
 @router.post("/query", response_model=QueryResponse, tags=["3. Query"])
-async def process_query(request: QueryRequest):
+async def process_query(request: QueryRequest, http_request: Request):
     """콜렉션에서 쿼리에 대한 답변을 생성합니다."""
     try:
         # 콜렉션 존재 여부 확인
@@ -123,13 +192,117 @@ async def process_query(request: QueryRequest):
             )
         context = documents[0]  # 첫 번째 문서를 컨텍스트로 사용
         
-        response = await rag_service.run_rag_query(request.collection_name, request.query, stream=request.stream)
-        print(f"Response: {response}")
+        # 클라이언트 연결이 끊기면 검색/대기열/생성 작업을 즉시 취소
+        response = await run_until_disconnected(http_request, rag_service.run_rag_query(
+            request.collection_name, request.query,
+            stream=request.stream, priority=request.priority, where=request.where,
+            options=request.generation, latency_budget_ms=request.latency_budget_ms
+        ))
+        print(f"Response: {response.response}")
         
-        return QueryResponse(response=response)
+        return response
         
     except HTTPException as e:
         raise e
+    except GenerationRejected as e:
+        raise rejected_to_http(e)
+    except ClientDisconnected:
+        raise disconnected_to_http()
     except Exception as e:
         import traceback
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/query/stream", tags=["3. Query"])
+async def process_query_stream(request: QueryRequest):
+    """콜렉션에서 쿼리에 대한 답변을 생성하여 텍스트 스트림으로 반환합니다."""
+    collections = rag_service.vector_store.list_collections()
+    if request.collection_name not in collections:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Collection '{request.collection_name}' not found"
+        )
+
+    # 대기열이 가득 찬 경우 스트림 시작 전에 거절
+    try:
+        rag_service.scheduler.check_admission()
+    except GenerationRejected as e:
+        raise rejected_to_http(e)
+
+    return StreamingResponse(
+        cancel_on_disconnect(rag_service.stream_rag_query(
+            request.collection_name, request.query,
+            priority=request.priority, where=request.where,
+            options=request.generation, latency_budget_ms=request.latency_budget_ms
+        )),
+        media_type="text/plain; charset=utf-8"
+    )
+
+@router.post("/query/batch", tags=["3. Query"])
+async def process_query_batch(request: BatchQueryRequest):
+    """여러 질의를 한 번에 처리하고 완료된 항목부터 NDJSON으로 스트리밍합니다."""
+    if not request.queries:
+        raise HTTPException(status_code=400, detail="No queries provided")
+    if len(request.queries) > settings.BATCH_MAX_QUERIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many queries: {len(request.queries)} > {settings.BATCH_MAX_QUERIES}"
+        )
+
+    collections = rag_service.vector_store.list_collections()
+    if request.collection_name not in collections:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Collection '{request.collection_name}' not found"
+        )
+
+    async def results():
+        async for item in rag_service.run_rag_batch(
+            request.collection_name, request.queries, top_k=request.top_k,
+            max_concurrency=request.max_concurrency, priority=request.priority,
+            where=request.where, options=request.generation,
+            latency_budget_ms=request.latency_budget_ms
+        ):
+            yield item.model_dump_json() + "\n"
+
+    # 연결이 끊기면 남은 배치 항목의 생성도 모두 취소됨
+    return StreamingResponse(cancel_on_disconnect(results()), media_type="application/x-ndjson")
+
+@router.post("/search", response_model=SearchResponse, tags=["3. Query"])
+async def search(request: SearchRequest, http_request: Request):
+    """LLM 생성 없이 관련 청크를 거리와 메타데이터와 함께 반환합니다."""
+    try:
+        collections = rag_service.vector_store.list_collections()
+        if request.collection_name not in collections:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Collection '{request.collection_name}' not found"
+            )
+
+        start = time.perf_counter()
+        results = await run_until_disconnected(http_request, run_in_threadpool(
+            rag_service.vector_store.similarity_search_with_scores,
+            request.collection_name,
+            request.query,
+            request.top_k,
+            where=request.where,
+            score_threshold=request.score_threshold
+        ))
+        return SearchResponse(
+            collection_name=request.collection_name,
+            results=[SearchResult(**result) for result in results],
+            count=len(results),
+            took_ms=round((time.perf_counter() - start) * 1000, 2)
+        )
+
+    except HTTPException as e:
+        raise e
+    except ClientDisconnected:
+        raise disconnected_to_http()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# 4. Metrics API endpoints
+@router.get("/metrics", response_model=Dict[str, Any], tags=["4. Metrics"])
+async def get_metrics():
+    """쿼리 서비스 지표를 반환합니다."""
+    return rag_service.get_metrics()
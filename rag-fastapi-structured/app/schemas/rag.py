@@ -1,17 +1,71 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Any, Dict, List, Literal, Optional
 
 class LoadDocumentRequest(BaseModel):
     file_path: str = "sample.txt"  # document 폴더 내 파일명
     collection_name: str = ""  # 비어있으면 파일명이 콜렉션명으로 사용됨
 
+class GenerationOptions(BaseModel):
+    """비어있는 항목은 서버 설정(GENERATION_*, THINK_*)을 사용합니다."""
+    num_predict: Optional[int] = None  # 최대 생성 토큰 수
+    num_ctx: Optional[int] = None  # 컨텍스트 길이
+    stop: Optional[List[str]] = None  # 생성 중단 문자열
+    think: Optional[bool] = None  # False이면 think 단계 비활성화
+    think_budget: Optional[int] = None  # think 단계 최대 토큰 수 (0이면 제한 없음)
+    think_budget_mode: Optional[Literal["cut", "abort"]] = None  # 예산 초과 시 처리 방식
+
 class QueryRequest(BaseModel):
     collection_name: str
     query: str
     stream: bool = False
+    priority: Literal["high", "normal", "low"] = "normal"  # 생성 대기열 우선순위
+    where: Optional[Dict[str, Any]] = None  # 메타데이터 필터 (예: {"table_name": "customer_orders"})
+    generation: Optional[GenerationOptions] = None  # 생성 옵션 및 think 예산
+    latency_budget_ms: Optional[int] = None  # 지연 예산 (MODEL_TIERS 중 평균 생성 시간이 예산 안에 드는 모델만 사용)
 
 class QueryResponse(BaseModel):
     response: str
+    model: Optional[str] = None  # 답변을 생성한 모델
+    queue_wait_ms: Optional[float] = None  # 생성 대기열 대기 시간
+    generation_ms: Optional[float] = None  # Ollama 생성 시간
+
+class BatchQueryRequest(BaseModel):
+    collection_name: str
+    queries: List[str]
+    top_k: int = 3
+    max_concurrency: Optional[int] = None  # 비어있으면 BATCH_MAX_CONCURRENCY 사용
+    priority: Literal["high", "normal", "low"] = "low"  # 대화형 요청보다 낮은 우선순위
+    where: Optional[Dict[str, Any]] = None  # 메타데이터 필터
+    generation: Optional[GenerationOptions] = None  # 생성 옵션 및 think 예산
+    latency_budget_ms: Optional[int] = None  # 질의별 지연 예산
+
+class BatchQueryItem(BaseModel):
+    index: int  # 요청 queries 내 위치
+    query: str
+    response: Optional[str] = None
+    model: Optional[str] = None  # 답변을 생성한 모델
+    error: Optional[str] = None
+    queue_wait_ms: Optional[float] = None
+    generation_ms: Optional[float] = None
+
+class SearchRequest(BaseModel):
+    collection_name: str
+    query: str
+    top_k: int = 3
+    score_threshold: Optional[float] = None  # 이 거리보다 먼 결과는 제외
+    where: Optional[Dict[str, Any]] = None  # Chroma 메타데이터 필터
+
+class SearchResult(BaseModel):
+    id: str
+    document: str
+    distance: float  # 작을수록 유사
+    metadata: Dict[str, Any] = {}
+
+class SearchResponse(BaseModel):
+    collection_name: str
+    results: List[SearchResult]
+    count: int
+    took_ms: float
 
 class DeleteCollectionResponse(BaseModel):
     message: str
@@ -0,0 +1,92 @@
+"""
+임베딩 배치 방식 벤치마크 (모델 기본 배치 / 생성 순서 고정 크기 배치 / 길이순 토큰 예산 배치)
+
+사용법 (app 디렉토리에서 실행):
+    python -m scripts.benchmark_batching --token-budgets 4096 8192 16384 --intra-op 4 --inter-op 1
+"""
+import time
+import random
+import argparse
+from typing import List
+
+import numpy as np
+
+from config import settings
+from utils.batched_embeddings import TokenBudgetEmbeddings, find_batch_encoder, configure_threads
+from scripts.benchmark_embeddings import build_model, cosine_agreement, load_chunks
+
+
+def embed_fixed(model, chunks: List[str], batch_size: int) -> List[List[float]]:
+    """기존 적재 방식: 생성 순서대로 고정 크기 배치 (모델 내부에서 다시 나누지 않도록 같은 배치 인코더 사용)"""
+    encode = find_batch_encoder(model)
+    vectors = []
+    for start in range(0, len(chunks), batch_size):
+        vectors.extend(encode(chunks[start:start + batch_size]))
+    return vectors
+
+
+def padding_ratio(lengths: List[int], batches: List[List[int]]) -> float:
+    padded = sum(len(batch) * max(lengths[i] for i in batch) for batch in batches)
+    return 1 - sum(lengths) / padded
+
+
+def best_of(fn, repeat: int):
+    elapsed, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed.append(time.perf_counter() - start)
+    return np.asarray(result, dtype=np.float32), min(elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Length-sorted token-budget batching benchmark")
+    parser.add_argument("--backend", default=settings.EMBEDDING_BACKEND, help="torch | onnx | onnx-int8")
+    parser.add_argument("--document-path", default=settings.DOCUMENT_PATH)
+    parser.add_argument("--min-chunks", type=int, default=1024)
+    parser.add_argument("--fixed-batch", type=int, default=64, help="비교 기준 고정 배치 크기")
+    parser.add_argument("--token-budgets", type=int, nargs="+", default=[2048, 4096, 8192, 16384])
+    parser.add_argument("--max-batch", type=int, default=settings.EMBEDDING_MAX_BATCH)
+    parser.add_argument("--intra-op", type=int, default=settings.EMBEDDING_INTRA_OP_THREADS)
+    parser.add_argument("--inter-op", type=int, default=settings.EMBEDDING_INTER_OP_THREADS)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    # 모델 로드 전에 스레드 수 설정 (onnx는 세션 생성 시 설정값 사용)
+    configure_threads(args.intra_op, args.inter_op)
+    settings.EMBEDDING_INTRA_OP_THREADS = args.intra_op
+    settings.EMBEDDING_INTER_OP_THREADS = args.inter_op
+    model = build_model(args.backend)
+
+    # 여러 문서의 청크가 섞여 들어오는 상황을 재현하기 위해 순서를 섞음 (고정 시드)
+    chunks = load_chunks(args.document_path, args.min_chunks)
+    random.Random(0).shuffle(chunks)
+    model.embed_documents(chunks[:8])  # 워밍업
+
+    probe = TokenBudgetEmbeddings(model)
+    lengths = probe.token_lengths(chunks)
+    print(f"📄 {len(chunks)} chunks, tokens min/avg/max = "
+          f"{min(lengths)}/{sum(lengths) / len(lengths):.0f}/{max(lengths)}, "
+          f"backend={args.backend}, intra_op={args.intra_op or 'default'}, inter_op={args.inter_op or 'default'}\n")
+
+    # 이전 적재 경로: 전체 청크를 embed_documents 에 전달 (모델 내부 기본 배치 크기로 계산)
+    default, seconds = best_of(lambda: model.embed_documents(chunks), args.repeat)
+    print(f"{'embed_documents':>14}: {len(chunks) / seconds:8.1f} chunks/s (model default batching)")
+
+    fixed_batches = [list(range(i, min(i + args.fixed_batch, len(chunks)))) for i in range(0, len(chunks), args.fixed_batch)]
+    _, seconds = best_of(lambda: embed_fixed(model, chunks, args.fixed_batch), args.repeat)
+    print(f"{'fixed ' + str(args.fixed_batch):>14}: {len(chunks) / seconds:8.1f} chunks/s "
+          f"({len(fixed_batches)} batches, padding {padding_ratio(lengths, fixed_batches):.1%})")
+
+    for budget in args.token_budgets:
+        batched = TokenBudgetEmbeddings(model, token_budget=budget, max_batch=args.max_batch)
+        batches = batched.plan_batches(lengths)
+        vectors, seconds = best_of(lambda: batched.embed_documents(chunks), args.repeat)
+        agreement = cosine_agreement(default, vectors).min()
+        print(f"{'budget ' + str(budget):>14}: {len(chunks) / seconds:8.1f} chunks/s "
+              f"({len(batches)} batches, padding {padding_ratio(lengths, batches):.1%}, "
+              f"min cos vs embed_documents {agreement:.5f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+임베딩 백엔드 벤치마크 (torch vs onnx vs onnx-int8)
+
+사용법 (app 디렉토리에서 실행):
+    python -m scripts.benchmark_embeddings --repeat 3
+"""
+import os
+import time
+import argparse
+from typing import List
+
+import numpy as np
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from config import settings
+from utils.embeddings import OnnxEmbeddings, create_embedding_model
+
+
+def load_chunks(document_path: str, min_chunks: int) -> List[str]:
+    """document 폴더의 텍스트를 청크로 분할하여 벤치마크 입력으로 사용합니다."""
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=300, chunk_overlap=50)
+    chunks = []
+    for file_name in sorted(os.listdir(document_path)):
+        if file_name.endswith('.txt'):
+            with open(os.path.join(document_path, file_name), 'r', encoding='utf-8') as f:
+                chunks.extend(text_splitter.split_text(f.read()))
+
+    if not chunks:
+        raise SystemExit(f"No text chunks found in '{document_path}'")
+
+    # 처리량 측정을 위해 최소 청크 수만큼 반복
+    while len(chunks) < min_chunks:
+        chunks = chunks + chunks
+    return chunks
+
+
+def build_model(backend: str):
+    if backend == "onnx-int8":
+        return OnnxEmbeddings(
+            model_name=settings.EMBEDDING_MODEL,
+            model_dir=settings.ONNX_MODEL_DIR,
+            quantize=True
+        )
+    return create_embedding_model(backend)
+
+
+def measure(model, chunks: List[str], repeat: int):
+    model.embed_documents(chunks[:8])  # 워밍업
+    elapsed = []
+    vectors = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        vectors = model.embed_documents(chunks)
+        elapsed.append(time.perf_counter() - start)
+    return np.asarray(vectors, dtype=np.float32), min(elapsed)
+
+
+def cosine_agreement(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return (a * b).sum(axis=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding backend benchmark")
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "onnx-int8"])
+    parser.add_argument("--document-path", default=settings.DOCUMENT_PATH)
+    parser.add_argument("--min-chunks", type=int, default=512)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    chunks = load_chunks(args.document_path, args.min_chunks)
+    print(f"📄 {len(chunks)} chunks, model: {settings.EMBEDDING_MODEL}\n")
+
+    results = {}
+    for backend in args.backends:
+        vectors, seconds = measure(build_model(backend), chunks, args.repeat)
+        results[backend] = vectors
+        print(f"{backend:>10}: {len(chunks) / seconds:8.1f} chunks/s ({seconds:.2f}s)")
+
+    # torch 백엔드 기준 코사인 유사도 일치도
+    if "torch" in results:
+        print("\nCosine agreement vs torch:")
+        for backend, vectors in results.items():
+            if backend == "torch":
+                continue
+            cos = cosine_agreement(results["torch"], vectors)
+            print(f"{backend:>10}: mean={cos.mean():.5f} min={cos.min():.5f}")
+
+
+if __name__ == "__main__":
+    main()
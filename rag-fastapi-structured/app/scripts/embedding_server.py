@@ -0,0 +1,36 @@
+"""
+공유 임베딩 워커 실행
+
+API 워커들이 EMBEDDING_SERVER_SOCKET 으로 접속하여 하나의 모델을 함께 사용합니다.
+
+사용법 (app 디렉토리에서 실행):
+    python -m scripts.embedding_server [--socket ./run/embedding.sock] [--max-batch 64] [--max-wait-ms 5]
+    EMBEDDING_SERVER_SOCKET=./run/embedding.sock uvicorn main:app --workers 4
+"""
+import asyncio
+import argparse
+
+from config import settings
+from utils.embeddings import create_embedding_model
+from utils.embedding_server import EmbeddingServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared host-local embedding worker")
+    parser.add_argument("--socket", default=settings.EMBEDDING_SERVER_SOCKET or "./run/embedding.sock")
+    parser.add_argument("--max-batch", type=int, default=settings.EMBEDDING_SERVER_MAX_BATCH)
+    parser.add_argument("--max-wait-ms", type=float, default=settings.EMBEDDING_SERVER_MAX_WAIT_MS)
+    parser.add_argument("--backend", default=None, help="torch | onnx (기본값: EMBEDDING_BACKEND)")
+    args = parser.parse_args()
+
+    # 클라이언트가 아닌 실제 모델을 로드 (get_embedding_model은 소켓 설정 시 클라이언트를 반환)
+    model = create_embedding_model(args.backend)
+    server = EmbeddingServer(model, args.socket, max_batch=args.max_batch, max_wait_ms=args.max_wait_ms)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
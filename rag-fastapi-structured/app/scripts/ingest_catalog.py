@@ -0,0 +1,33 @@
+"""
+테이블 메타데이터 카탈로그(CSV) 대용량 적재
+
+사용법 (app 디렉토리에서 실행):
+    python -m scripts.ingest_catalog ./document/catalog.csv [--collection NAME] [--chunk-rows 10000] [--workers 2]
+"""
+import os
+import argparse
+
+from utils.vector_store import VectorStore
+from utils.catalog_loader import ingest_catalog
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chunked table-metadata catalog ingestion")
+    parser.add_argument("path")
+    parser.add_argument("--collection", default=None, help="비어있으면 파일명 사용")
+    parser.add_argument("--chunk-rows", type=int, default=None, help="한 번에 읽는 행 수 (기본값: CATALOG_CHUNK_ROWS)")
+    parser.add_argument("--batch-size", type=int, default=None, help="임베딩 배치 크기 (기본값: CATALOG_EMBED_BATCH_SIZE)")
+    parser.add_argument("--workers", type=int, default=None, help="동시에 계산하는 임베딩 배치 수 (기본값: CATALOG_WORKERS, 1)")
+    args = parser.parse_args()
+
+    collection_name = args.collection or os.path.splitext(os.path.basename(args.path))[0]
+    ingest_catalog(
+        VectorStore(), args.path, collection_name,
+        chunk_rows=args.chunk_rows,
+        embed_batch_size=args.batch_size,
+        workers=args.workers
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+샤드 재배치 (CHROMA_SHARDS 변경 후 청크를 현재 배치 규칙에 맞는 샤드로 이동)
+
+사용법 (app 디렉토리에서 실행, 적재 작업이 없는 동안 실행 권장):
+    python -m scripts.rebalance_shards --dry-run
+    python -m scripts.rebalance_shards
+    python -m scripts.rebalance_shards --retire ./data/shard2   # CHROMA_SHARDS 에서 뺀 저장소의 청크를 옮긴 뒤 비움
+"""
+import time
+import argparse
+
+from config import settings
+from utils.sharded_store import ShardedClient
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebalance chunks across Chroma shards")
+    parser.add_argument("--retire", nargs="*", default=[], help="CHROMA_SHARDS 에서 제거한 저장소 (로컬 경로 또는 http://host:port)")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true", help="옮길 청크 수만 출력")
+    args = parser.parse_args()
+
+    if not settings.CHROMA_SHARDS:
+        raise SystemExit("CHROMA_SHARDS is not configured")
+
+    client = ShardedClient(settings.CHROMA_SHARDS, partitioned=settings.CHROMA_PARTITIONED_COLLECTIONS)
+    start = time.perf_counter()
+    report = client.rebalance(args.retire, batch_size=args.batch_size, dry_run=args.dry_run)
+
+    verb = "Would move" if args.dry_run else "Moved"
+    for name, entry in report["collections"].items():
+        print(f"{verb} {entry['moved']} chunks of '{name}'")
+    total = sum(entry["moved"] for entry in report["collections"].values())
+    print(f"✅ {verb} {total} chunks in {time.perf_counter() - start:.2f}s")
+
+    for shard in client.stats()["shards"]:
+        print(f"  {shard['shard']}: {shard['collections']} collections, {shard['records']} chunks")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+콜렉션 스냅샷 내보내기/가져오기
+
+사용법 (app 디렉토리에서 실행):
+    python -m scripts.snapshot export companyinfo ./snapshots/companyinfo
+    python -m scripts.snapshot import ./snapshots/companyinfo [--collection NAME] [--replace]
+"""
+import argparse
+
+from config import settings
+from utils.vector_store import get_chroma_client
+from utils.snapshot import export_collection, import_collection, read_manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Collection snapshot export/import")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="콜렉션을 스냅샷으로 내보내기")
+    export_parser.add_argument("collection")
+    export_parser.add_argument("path")
+    export_parser.add_argument("--batch-size", type=int, default=1000)
+
+    import_parser = subparsers.add_parser("import", help="스냅샷을 콜렉션으로 가져오기")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--collection", default=None, help="비어있으면 스냅샷의 콜렉션명 사용")
+    import_parser.add_argument("--replace", action="store_true", help="기존 콜렉션을 삭제 후 복원")
+    import_parser.add_argument("--batch-size", type=int, default=5000)
+
+    args = parser.parse_args()
+    client = get_chroma_client()
+
+    if args.command == "export":
+        export_collection(
+            client, args.collection, args.path,
+            embedding_model=settings.EMBEDDING_MODEL,
+            batch_size=args.batch_size
+        )
+    else:
+        manifest = read_manifest(args.path)
+        if manifest.get("embedding_model") not in (None, settings.EMBEDDING_MODEL):
+            print(f"⚠️ Snapshot was embedded with '{manifest['embedding_model']}', "
+                  f"but EMBEDDING_MODEL is '{settings.EMBEDDING_MODEL}'")
+        import_collection(
+            client, args.path,
+            collection_name=args.collection,
+            replace=args.replace,
+            batch_size=args.batch_size
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""
+검색 파라미터 스윕 (청크 크기 × 오버랩 × top_k)
+
+document 폴더의 .txt 문서를 설정 조합마다 임시 Chroma 디렉토리에 다시 색인하고, 라벨링된 질의 세트로
+적재 시간, 인덱스 크기, 검색 지연, 프롬프트 토큰 수, recall@k / MRR 을 측정합니다.
+- 적재는 서비스와 같은 청크 분할(document_parser)과 유사 중복 제거를 사용하며, 임베딩 캐시는 거치지 않습니다.
+- 프롬프트는 서비스와 같은 템플릿(build_prompt, SYSTEM_PROMPT)으로 만들고 /api/generate 형식으로 보냅니다.
+  기본값은 오프라인 Ollama 대역(httpx MockTransport)이 토크나이저로 프롬프트 토큰 수(prompt_eval_count)만 세어 응답하므로
+  Ollama 없이 실행할 수 있습니다. 기본 토크나이저는 임베딩 모델의 것이므로 생성 모델의 실제 토큰 수와 다를 수 있으며,
+  --tokenizer 로 생성 모델의 HuggingFace 토크나이저를 지정하거나 --ollama-url 로 실제 Ollama 에 요청할 수 있습니다. (num_predict=1)
+
+질의 세트 형식 (JSONL, 한 줄에 하나):
+    {"query": "...", "answers": ["정답이 포함된 문구", ...], "collection": "companyinfo"}
+    collection 은 문서 파일명(확장자 제외)이며, 검색된 청크에 answers 중 하나가 (공백 정규화 후) 포함되면 정답 청크로 봅니다.
+
+사용법 (app 디렉토리에서 실행):
+    python -m scripts.sweep_retrieval --chunk-sizes 200 300 500 --overlaps 0 50 100 --top-k 1 3 5
+    python -m scripts.sweep_retrieval --output sweep.csv
+"""
+import os
+import csv
+import json
+import time
+import argparse
+import tempfile
+import itertools
+from typing import Any, Callable, Dict, List
+
+import httpx
+import numpy as np
+
+from config import settings
+from services.rag_service import SYSTEM_PROMPT, build_prompt
+from utils.document_parser import load_document
+from utils.embeddings import get_batched_embedding_model
+from utils.near_dedup import NearDuplicateFilter
+from utils.reasoning_budget import build_generation_fields
+
+
+def load_queries(path: str) -> List[Dict[str, Any]]:
+    queries = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if not item.get("query") or not item.get("answers") or not item.get("collection"):
+                raise SystemExit(f"{path}:{line_number}: 'query', 'answers', 'collection' are required")
+            item["answers"] = [normalize(answer) for answer in item["answers"]]
+            queries.append(item)
+    if not queries:
+        raise SystemExit(f"No queries found in '{path}'")
+    return queries
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.split())
+
+
+def dir_size(path: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, files in os.walk(path)
+        for name in files
+    )
+
+
+def make_token_counter(model, tokenizer_name: str = "") -> Callable[[str], int]:
+    """프롬프트 토큰 수를 세는 함수 (토크나이저를 찾을 수 없으면 글자 수)"""
+    if tokenizer_name:
+        from transformers import AutoTokenizer
+        tokenizer = AutoTokenizer.from_pretrained(tokenizer_name)
+    else:
+        inner = getattr(model, "model", model)  # TokenBudgetEmbeddings 래퍼 안의 모델
+        client = getattr(inner, "_client", None) or getattr(inner, "client", None)
+        tokenizer = getattr(inner, "tokenizer", None) or getattr(client, "tokenizer", None)
+    if tokenizer is None:
+        print("⚠️ Tokenizer not found, counting prompt characters instead of tokens")
+        return len
+    return lambda text: len(tokenizer(text, add_special_tokens=False)["input_ids"])
+
+
+class OfflineOllama:
+    """
+    /api/generate 요청을 받아 프롬프트 토큰 수만 세어 응답하는 오프라인 Ollama 대역
+    응답 텍스트는 첫 번째 검색 문서의 첫 줄입니다. (검색 품질 측정에는 사용하지 않음)
+    """
+
+    def __init__(self, count_tokens: Callable[[str], int]):
+        self.count_tokens = count_tokens
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        if request.url.path != "/api/generate":
+            return httpx.Response(404, json={"error": f"unsupported path {request.url.path}"})
+        payload = json.loads(request.content)
+        prompt = payload.get("prompt", "")
+        marker = "문서 1:\n"
+        answer = prompt.split(marker, 1)[1].split("\n", 1)[0] if marker in prompt else ""
+        return httpx.Response(200, json={
+            "model": payload.get("model"),
+            "response": answer,
+            "done": True,
+            "prompt_eval_count": self.count_tokens(payload.get("system", "")) + self.count_tokens(prompt),
+            "eval_count": self.count_tokens(answer)
+        })
+
+
+def index_corpus(client, embedding_model, document_path: str) -> Dict[str, Any]:
+    """현재 CHUNK_SIZE/CHUNK_OVERLAP 설정으로 문서를 파일별 콜렉션에 색인합니다."""
+    chunks = 0
+    dropped = 0
+    start = time.perf_counter()
+    for file_name in sorted(os.listdir(document_path)):
+        if not file_name.endswith('.txt'):
+            continue
+        collection_name = os.path.splitext(file_name)[0]
+        texts, metadatas, _ = load_document(os.path.join(document_path, file_name), collection_name)
+        ids = [f"{collection_name}_{i}" for i in range(len(texts))]
+        if settings.DEDUP_THRESHOLD:
+            dedup = NearDuplicateFilter(settings.DEDUP_THRESHOLD, settings.DEDUP_NUM_PERM, settings.DEDUP_SHINGLE_SIZE)
+            texts, metadatas, ids = dedup.filter(texts, metadatas, ids)
+            dropped += dedup.chunks_dropped
+        if not texts:
+            continue
+
+        collection = client.create_collection(name=collection_name)
+        batch_size = client.get_max_batch_size() if hasattr(client, "get_max_batch_size") else 5000
+        for offset in range(0, len(texts), batch_size):
+            batch = texts[offset:offset + batch_size]
+            collection.add(
+                documents=batch,
+                embeddings=embedding_model.embed_documents(batch),
+                ids=ids[offset:offset + batch_size],
+                metadatas=metadatas[offset:offset + batch_size]
+            )
+        chunks += len(texts)
+    return {"chunks": chunks, "dedup_dropped": dropped, "ingest_s": time.perf_counter() - start}
+
+
+def evaluate(client, queries: List[Dict[str, Any]], query_vectors: List[List[float]], top_k: int,
+             http: httpx.Client) -> Dict[str, Any]:
+    """질의 세트로 top_k 검색 지연, 프롬프트 토큰 수, recall@k, MRR 을 측정합니다."""
+    latencies, prompt_tokens, hits, reciprocal_ranks = [], [], 0, []
+    for item, vector in zip(queries, query_vectors):
+        collection = client.get_collection(item["collection"])
+        n_results = min(top_k, collection.count())
+        start = time.perf_counter()
+        results = collection.query(query_embeddings=[vector], n_results=n_results, include=["documents"])
+        latencies.append((time.perf_counter() - start) * 1000)
+
+        documents = results["documents"][0] if results["documents"] else []
+        rank = next(
+            (i for i, doc in enumerate(documents, 1) if any(answer in normalize(doc) for answer in item["answers"])),
+            None
+        )
+        hits += rank is not None
+        reciprocal_ranks.append(1 / rank if rank else 0.0)
+
+        payload = {
+            "model": settings.MODEL_NAME,
+            "prompt": build_prompt(item["query"], documents),
+            "system": SYSTEM_PROMPT,
+            "stream": False,
+            **build_generation_fields(num_predict=1, num_ctx=settings.GENERATION_NUM_CTX, think=False)
+        }
+        response = http.post("/api/generate", json=payload)
+        response.raise_for_status()
+        prompt_tokens.append(response.json().get("prompt_eval_count", 0))
+
+    return {
+        "search_p50_ms": float(np.percentile(latencies, 50)),
+        "search_p95_ms": float(np.percentile(latencies, 95)),
+        "prompt_tokens": float(np.mean(prompt_tokens)),
+        "recall": hits / len(queries),
+        "mrr": float(np.mean(reciprocal_ranks))
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrieval parameter sweep (chunk size × overlap × top_k)")
+    parser.add_argument("--document-path", default=settings.DOCUMENT_PATH)
+    parser.add_argument("--queries", default="./eval/retrieval_queries.jsonl", help="라벨링된 질의 세트 (JSONL)")
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[150, 300, 500, 800])
+    parser.add_argument("--overlaps", type=int, nargs="+", default=[0, 50, 100])
+    parser.add_argument("--top-k", type=int, nargs="+", default=[1, 3, 5])
+    parser.add_argument("--tokenizer", default="", help="프롬프트 토큰 수 계산용 HuggingFace 토크나이저 (기본: 임베딩 모델)")
+    parser.add_argument("--ollama-url", default="", help="지정하면 오프라인 대역 대신 실제 Ollama 의 prompt_eval_count 사용")
+    parser.add_argument("--output", default="", help="결과를 저장할 CSV 경로")
+    args = parser.parse_args()
+
+    import chromadb
+    from chromadb.config import Settings as ChromaSettings
+
+    queries = load_queries(args.queries)
+    embedding_model = get_batched_embedding_model()
+
+    # 질의 임베딩은 청크 설정과 무관하므로 한 번만 계산
+    start = time.perf_counter()
+    query_vectors = [embedding_model.embed_query(item["query"]) for item in queries]
+    embed_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    if args.ollama_url:
+        http = httpx.Client(base_url=args.ollama_url, timeout=120.0)
+        backend = args.ollama_url
+    else:
+        offline = OfflineOllama(make_token_counter(embedding_model, args.tokenizer))
+        http = httpx.Client(base_url="http://offline-ollama", transport=httpx.MockTransport(offline.handle))
+        backend = f"offline ({args.tokenizer or 'embedding tokenizer'})"
+    print(f"📊 {len(queries)} queries, query embedding {embed_ms:.1f}ms/query, prompt tokens from {backend}\n")
+
+    header = (f"{'chunk':>6} {'overlap':>7} {'k':>3} {'chunks':>7} {'ingest_s':>9} {'index_kb':>9} "
+              f"{'p50_ms':>7} {'p95_ms':>7} {'prompt_tok':>10} {'recall':>7} {'mrr':>6}")
+    print(header)
+    print("-" * len(header))
+
+    rows = []
+    with tempfile.TemporaryDirectory(prefix="sweep_retrieval_") as workdir:
+        for chunk_size, overlap in itertools.product(args.chunk_sizes, args.overlaps):
+            if overlap >= chunk_size:
+                continue
+            settings.CHUNK_SIZE = chunk_size
+            settings.CHUNK_OVERLAP = overlap
+
+            # 조합마다 빈 디렉토리에 색인하여 인덱스 크기를 따로 측정
+            persist_dir = os.path.join(workdir, f"c{chunk_size}_o{overlap}")
+            client = chromadb.PersistentClient(path=persist_dir, settings=ChromaSettings(anonymized_telemetry=False))
+            ingest = index_corpus(client, embedding_model, args.document_path)
+            index_kb = dir_size(persist_dir) / 1024
+
+            for top_k in args.top_k:
+                metrics = evaluate(client, queries, query_vectors, top_k, http)
+                row = {"chunk_size": chunk_size, "overlap": overlap, "top_k": top_k, **ingest,
+                       "index_kb": index_kb, **metrics}
+                rows.append(row)
+                print(f"{chunk_size:>6} {overlap:>7} {top_k:>3} {ingest['chunks']:>7} {ingest['ingest_s']:>9.2f} "
+                      f"{index_kb:>9.0f} {metrics['search_p50_ms']:>7.2f} {metrics['search_p95_ms']:>7.2f} "
+                      f"{metrics['prompt_tokens']:>10.0f} {metrics['recall']:>7.2f} {metrics['mrr']:>6.3f}")
+    http.close()
+
+    if not rows:
+        raise SystemExit("No valid (chunk size, overlap) combinations")
+
+    # 가장 높은 recall 중 프롬프트 토큰이 가장 적은 조합
+    best = min(rows, key=lambda row: (-row["recall"], row["prompt_tokens"], -row["mrr"]))
+    print(f"\n✅ Best recall with fewest prompt tokens: CHUNK_SIZE={best['chunk_size']} "
+          f"CHUNK_OVERLAP={best['overlap']} RETRIEVAL_TOP_K={best['top_k']} "
+          f"(recall {best['recall']:.2f}, MRR {best['mrr']:.3f}, {best['prompt_tokens']:.0f} prompt tokens)")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"💾 Saved {len(rows)} rows to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
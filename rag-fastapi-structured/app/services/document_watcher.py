@@ -0,0 +1,68 @@
+import os
+import asyncio
+from pathlib import Path
+from typing import Dict
+
+from config import settings
+from utils.document_parser import SUPPORTED_EXTENSIONS
+
+
+class DocumentWatcher:
+    """
+    문서 폴더를 감시하여 변경된 파일의 콜렉션만 다시 색인합니다.
+    - watchfiles(inotify) 기반, debounce 구간 동안의 변경을 한 번에 처리
+    - 추가/수정된 파일은 해당 콜렉션만 원자적으로 교체
+    - 삭제된 파일은 해당 콜렉션 삭제
+    """
+
+    def __init__(self, rag_service, path: str = None, debounce_ms: int = None):
+        self.rag_service = rag_service
+        self.path = path or settings.DOCUMENT_PATH
+        self.debounce_ms = debounce_ms or settings.DOCUMENT_WATCH_DEBOUNCE_MS
+        self._stop_event = asyncio.Event()
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+        print(f"👀 Watching document directory: {self.path}")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._stop_event.set()
+        await self._task
+        self._task = None
+
+    async def _run(self):
+        try:
+            from watchfiles import awatch, Change
+        except ImportError:
+            print("⚠️ watchfiles is not installed; document watcher disabled")
+            return
+
+        async for changes in awatch(
+            self.path,
+            debounce=self.debounce_ms,
+            stop_event=self._stop_event,
+            recursive=False
+        ):
+            # 같은 파일에 대한 여러 이벤트는 마지막 상태만 반영
+            latest: Dict[str, Change] = {}
+            for change, file_path in changes:
+                if file_path.endswith(SUPPORTED_EXTENSIONS):
+                    latest[file_path] = change
+
+            for file_path, change in latest.items():
+                try:
+                    await asyncio.to_thread(self._apply, file_path, change == Change.deleted)
+                except Exception as e:
+                    print(f"⚠️ Failed to re-index '{file_path}': {e}")
+
+    def _apply(self, file_path: str, deleted: bool):
+        collection_name = Path(file_path).stem
+        if deleted or not os.path.exists(file_path):
+            self.rag_service.remove_document(collection_name)
+            print(f"🗑️ Removed collection for deleted file: {collection_name}")
+        else:
+            self.rag_service.reindex_document(file_path, collection_name)
+            print(f"🔄 Re-indexed: {os.path.basename(file_path)} -> {collection_name}")
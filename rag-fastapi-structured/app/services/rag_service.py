@@ -1,10 +1,68 @@
 import os
 import json
+import time
+import codecs
 import httpx
-from typing import List, Dict, Any
+import asyncio
+from typing import List, Dict, Any, AsyncIterator, Optional, Tuple
 from config import settings
-from utils.embeddings import get_embeddings
+from utils.embeddings import get_embeddings, get_embedding_cache, get_batched_embedding_model
+from utils.embedding_server import EmbeddingClient
 from utils.vector_store import VectorStore
+from utils.sharded_store import ShardedClient
+from utils.document_parser import SUPPORTED_EXTENSIONS, StreamingTextChunker, load_document
+from utils.ingest_jobs import IngestJob, IngestJobManager
+from utils.near_dedup import NearDuplicateFilter
+from utils.model_router import ModelRouter, RouteDecision
+from utils.catalog_loader import ingest_catalog
+from utils.single_flight import SingleFlight
+from utils.generation_scheduler import GenerationScheduler, GenerationRejected
+from schemas.rag import QueryResponse, BatchQueryItem, GenerationOptions
+from utils.response_normalizer import (
+    THINK_CLOSE, ResponseNormalizer, aiter_json_objects, anormalize_stream, normalize_response
+)
+from utils.reasoning_budget import ReasoningStats, ThinkBudgetExceeded, ThinkTracker, build_generation_fields
+
+# Ollama 시스템 프롬프트 (scripts.sweep_retrieval 에서도 프롬프트 토큰 수 계산에 사용)
+SYSTEM_PROMPT = "당신은 한국어 전용 답변 도우미입니다. 다음 규칙을 절대적으로 따르세요:\n1. 오직 한글로만 답변하세요\n2. 영어는 한글로 변환하세요 (API -> 에이피아이)\n3. 특수문자와 한자는 사용하지 마세요\n4. 간단명료하게 핵심만 답변하세요\n5. 모든 외래어는 한글로 표기하세요\n6. 답변 이외의 설명은 하지 마세요\n7. 생각하는 과정을 보여주지 마세요\n8. 바로 결과만 보여주세요"
+
+def build_prompt(query: str, similar_docs: List[str]) -> str:
+    """검색된 문서로 Ollama 프롬프트를 구성합니다."""
+    # 검색된 문서를 구조화된 형태로 처리
+    contexts = []
+    for i, doc in enumerate(similar_docs, 1):
+        if doc:
+            contexts.append(f"문서 {i}:\n{doc}")
+    
+    # 명확한 구분자로 문서들을 결합
+    context = "\n\n=== 다음 문서 ===\n\n".join(contexts)
+    
+    # 프롬프트 구성
+    return f"""
+다음 지시사항을 엄격히 따라 답변해주세요:
+
+1. 반드시 한글로만 답변하세요.
+2. 영어 단어는 모두 한글로 변환하세요 (예: API -> 에이피아이).
+3. 특수문자나 한자는 절대 사용하지 마세요.
+4. 간단명료하게 답변하세요.
+5. 불필요한 설명이나 부연은 제외하세요.
+6. 답변 전에 생각하는 과정을 보여주지 마세요.
+7. 바로 결과만 보여주세요.
+
+주어진 문서:
+{context}
+
+질문:
+{query}
+
+답변 형식:
+[질문에 대한 답변만 작성]
+"""
+
+class UploadTooLarge(Exception):
+    def __init__(self, limit_mb: int):
+        super().__init__(f"Upload exceeds {limit_mb} MB limit")
+        self.limit_mb = limit_mb
 
 class RAGService:
     def __init__(self):
@@ -12,26 +70,55 @@ class RAGService:
         self.base_url = settings.OLLAMA_BASE_URL
         self.model = settings.MODEL_NAME
         self.document_path = settings.DOCUMENT_PATH
+        # 타임아웃 설정 증가
+        self.timeout = httpx.Timeout(
+            timeout=120.0,     # 전체 타임아웃
+            connect=30.0,     # 연결 타임아웃
+            read=120.0,       # 읽기 타임아웃
+            write=30.0,       # 쓰기 타임아웃
+            pool=30.0         # 풀 타임아웃
+        )
+        self._http_client = None
+        # 동일 질의의 동시 요청을 하나의 파이프라인으로 합침
+        self.single_flight = SingleFlight()
+        # Ollama 생성 동시 실행 수 제한 및 대기열 관리
+        self.scheduler = GenerationScheduler(
+            concurrency=settings.GENERATION_CONCURRENCY,
+            max_queue=settings.GENERATION_QUEUE_SIZE,
+            queue_timeout=settings.GENERATION_QUEUE_TIMEOUT
+        )
+        # 질의 난이도/지연 예산에 따라 MODEL_TIERS 중 생성 모델 선택 (비어있으면 MODEL_NAME만 사용)
+        self.model_router = ModelRouter(
+            settings.MODEL_TIERS or [self.model],
+            short_query_chars=settings.ROUTING_SHORT_QUERY_CHARS,
+            short_context_chars=settings.ROUTING_SHORT_CONTEXT_CHARS,
+            confident_distance=settings.ROUTING_CONFIDENT_DISTANCE,
+            timeout=settings.ROUTING_TIMEOUT_S
+        )
+        # think 토큰 사용량 및 예산으로 절약한 토큰 집계
+        self.reasoning_stats = ReasoningStats()
+        # 클라이언트 연결 종료로 취소된 작업 집계
+        self.cancellations = {"client_disconnects": 0, "retrieval": 0, "queue": 0, "generation": 0}
+        # 업로드 문서 적재 작업 (제한된 워커 스레드에서 임베딩/저장)
+        self.ingest_jobs = IngestJobManager(
+            workers=settings.INGEST_WORKERS,
+            max_pending=settings.INGEST_MAX_PENDING
+        )
         
     def load_all_documents(self) -> List[str]:
-        """document 폴더의 모든 텍스트 파일을 로드하여 벡터 DB에 저장합니다."""
+        """document 폴더의 모든 문서(.txt, .csv)를 로드하여 벡터 DB에 저장합니다."""
         loaded_files = []
         try:
-            # 문서 폴더 내 모든 .txt 파일 검색
+            # 문서 폴더 내 색인 대상 파일 검색
             for file_name in os.listdir(self.document_path):
-                if not file_name.endswith('.txt'):
+                if not file_name.endswith(SUPPORTED_EXTENSIONS):
                     continue
                     
                 file_path = os.path.join(self.document_path, file_name)
                 collection_name = os.path.splitext(file_name)[0]
                 
-                # 파일 내용 읽기
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    text_content = f.read().strip()
-                    
-                if text_content:
-                    # 벡터 DB 저장
-                    self.vector_store.add_texts([text_content], collection_name)
+                # 청크 분할 후 벡터 DB 저장
+                if self.index_document(file_path, collection_name):
                     loaded_files.append(file_name)
                     
             return loaded_files
@@ -40,140 +127,607 @@ class RAGService:
             print(f"Error loading documents: {e}")
             return []
 
-    async def query_ollama(self, prompt: str, stream: bool = False) -> str:
+    def index_document(self, file_path: str, collection_name: str) -> int:
+        """
+        파일을 청크로 분할하여 구조화된 메타데이터(file, section, chunk_index, offset 또는
+        table_name, column_name, data_type)와 함께 저장하고, 청크 수를 반환합니다.
+        """
+        if file_path.endswith('.csv'):
+            # 대용량 카탈로그는 청크 단위로 읽어 병렬 임베딩 후 table.column ID로 upsert
+            return ingest_catalog(self.vector_store, file_path, collection_name)["rows"]
+
+        texts, metadatas, ids = load_document(file_path, collection_name)
+        self.vector_store.add_texts(texts, collection_name, metadatas, ids)
+        return len(texts)
+
+    def reindex_document(self, file_path: str, collection_name: str):
+        """파일 하나의 콜렉션을 새 내용으로 원자적으로 교체합니다."""
+        if file_path.endswith('.csv'):
+            self._reindex_catalog(file_path, collection_name)
+            return
+
+        texts, metadatas, ids = load_document(file_path, collection_name)
+
+        if not texts:
+            # 빈 파일은 load_all_documents와 동일하게 색인하지 않음
+            self.remove_document(collection_name)
+            return
+
+        self.vector_store.replace_collection(collection_name, texts, metadatas, ids)
+
+    def _reindex_catalog(self, file_path: str, collection_name: str):
+        """
+        카탈로그 CSV를 청크 단위로 임시 콜렉션에 적재한 뒤 원자적으로 교체합니다.
+        (파일 전체를 메모리에 올리지 않으며, 컬럼별 고정 ID를 쓰므로 유사 중복 제거는 하지 않음)
+        """
+        target = self.vector_store.create_staging_collection(collection_name)
         try:
-            # 타임아웃 설정 증가
-            timeout = httpx.Timeout(
-                timeout=120.0,     # 전체 타임아웃
-                connect=30.0,     # 연결 타임아웃
-                read=120.0,       # 읽기 타임아웃
-                write=30.0,       # 쓰기 타임아웃
-                pool=30.0         # 풀 타임아웃
+            rows = ingest_catalog(self.vector_store, file_path, collection_name, target_collection=target)["rows"]
+        except Exception:
+            self.vector_store.client.delete_collection(target)
+            raise
+
+        if not rows:
+            # 빈 파일은 load_all_documents와 동일하게 색인하지 않음
+            self.vector_store.client.delete_collection(target)
+            self.remove_document(collection_name)
+            return
+        self.vector_store.swap_in_staging(collection_name, target)
+
+    def remove_document(self, collection_name: str):
+        """삭제된 파일의 콜렉션을 제거합니다."""
+        if collection_name in self.vector_store.list_collections():
+            self.vector_store.delete_collection(collection_name)
+
+    async def receive_upload(self, job: IngestJob, pieces: AsyncIterator[Tuple[str, bytes]]):
+        """
+        업로드 스트림을 받는 대로 처리하고, 수신이 끝나면 적재 작업을 워커 풀에 넣습니다.
+        - 텍스트: 조각 단위로 청크 분할하여 JSONL로 임시 저장 (파일 전체를 메모리에 올리지 않음)
+        - CSV: 원본 그대로 임시 저장 후 카탈로그 적재 경로(ingest_catalog)로 처리
+        청크 분할과 임시 파일 쓰기는 조각마다 스레드에서 실행하여 이벤트 루프(다른 질의 처리)를 막지 않습니다.
+        (조각당 스레드 전환 비용이 들지만 수신 중인 업로드가 질의 지연에 영향을 주지 않음)
+        오류가 발생하면 작업을 실패로 기록하고 예외를 그대로 발생시킵니다.
+        """
+        os.makedirs(settings.INGEST_SPOOL_DIR, exist_ok=True)
+        max_bytes = settings.INGEST_MAX_UPLOAD_MB * 2**20
+        spool_path, spool, chunker = None, None, None
+        decoder = codecs.getincrementaldecoder("utf-8")()
+
+        def spool_chunks(texts, metadatas):
+            for text, metadata in zip(texts, metadatas):
+                spool.write(json.dumps({"text": text, "metadata": metadata}, ensure_ascii=False) + "\n")
+            job.chunks_total += len(texts)
+
+        def write_piece(data: bytes):
+            if chunker is None:
+                spool.write(data)
+                # 행 수 추정 (진행률 계산용, 헤더 제외)
+                job.chunks_total += data.count(b"\n")
+            else:
+                spool_chunks(*chunker.feed(decoder.decode(data)))
+
+        def finish_spool():
+            if chunker is not None:
+                chunker.feed(decoder.decode(b"", final=True))
+                spool_chunks(*chunker.close())
+            else:
+                job.chunks_total = max(job.chunks_total - 1, 1)
+            spool.close()
+
+        try:
+            async for file_name, data in pieces:
+                if spool is None:
+                    file_name = os.path.basename(file_name)
+                    if not file_name.endswith(SUPPORTED_EXTENSIONS):
+                        raise ValueError(f"Unsupported file type: '{file_name}' (expected {', '.join(SUPPORTED_EXTENSIONS)})")
+                    job.file_name = file_name
+                    job.collection_name = job.collection_name or os.path.splitext(file_name)[0]
+                    job.chunks_total = 0
+                    if file_name.endswith('.csv'):
+                        spool_path = os.path.join(settings.INGEST_SPOOL_DIR, f"{job.job_id}.csv")
+                        spool = open(spool_path, "wb")
+                    else:
+                        spool_path = os.path.join(settings.INGEST_SPOOL_DIR, f"{job.job_id}.jsonl")
+                        spool = open(spool_path, "w", encoding="utf-8")
+                        chunker = StreamingTextChunker(file_name, job.collection_name)
+
+                job.bytes_received += len(data)
+                if job.bytes_received > max_bytes:
+                    raise UploadTooLarge(settings.INGEST_MAX_UPLOAD_MB)
+
+                await asyncio.to_thread(write_piece, data)
+
+            if spool is None:
+                raise ValueError("Uploaded file is empty")
+            await asyncio.to_thread(finish_spool)
+        except BaseException as e:
+            if spool is not None:
+                spool.close()
+                os.remove(spool_path)
+            self.ingest_jobs.fail(job, str(e) or type(e).__name__)
+            raise
+
+        print(f"📥 Received '{job.file_name}' ({job.bytes_received / 2**20:.1f} MB) as ingest job {job.job_id}")
+        self.ingest_jobs.submit(job, lambda job: self._run_ingest_job(job, spool_path))
+
+    def _run_ingest_job(self, job: IngestJob, spool_path: str):
+        """
+        임시 저장한 업로드를 임베딩하여 저장하고, 유사 중복 제거 결과를 반환합니다.
+        (replace이면 임시 콜렉션에 저장 후 원자적으로 교체)
+        """
+        target = self.vector_store.create_staging_collection(job.collection_name) if job.replace else None
+        try:
+            if spool_path.endswith('.csv'):
+                result = ingest_catalog(
+                    self.vector_store, spool_path, job.collection_name,
+                    target_collection=target, progress=job.advance
+                )
+                job.chunks_total = result["rows"]
+                report = None
+            else:
+                # 업로드 전체에 하나의 필터를 사용하여 배치 간 유사 중복도 제거
+                dedup = self.vector_store.new_dedup_filter()
+                with open(spool_path, "r", encoding="utf-8") as f:
+                    batch = []
+                    for line in f:
+                        batch.append(json.loads(line))
+                        if len(batch) >= settings.INGEST_BATCH_SIZE:
+                            self._add_upload_batch(job, target, batch, dedup)
+                            batch = []
+                    self._add_upload_batch(job, target, batch, dedup)
+                report = dedup.report() if dedup else None
+                if dedup:
+                    self.vector_store.dedup_stats.record(dedup, f"from {job.file_name}")
+
+            if target:
+                self.vector_store.swap_in_staging(job.collection_name, target)
+            return {"dedup": report}
+        except Exception:
+            if target:
+                self.vector_store.client.delete_collection(target)
+            raise
+        finally:
+            os.remove(spool_path)
+
+    def _add_upload_batch(self, job: IngestJob, target: Optional[str], batch: List[Dict[str, Any]],
+                          dedup: Optional[NearDuplicateFilter]):
+        if not batch:
+            return
+        metadatas = [item["metadata"] for item in batch]
+        self.vector_store.add_chunks(
+            target or job.collection_name,
+            [item["text"] for item in batch],
+            metadatas,
+            [f"{job.collection_name}_{metadata['chunk_index']}" for metadata in metadatas],
+            dedup=dedup
+        )
+        job.advance(len(batch))
+
+    def _get_http_client(self) -> httpx.AsyncClient:
+        """Ollama 연결을 재사용하도록 서비스 전체에서 하나의 HTTP 클라이언트를 공유합니다."""
+        if self._http_client is None or self._http_client.is_closed:
+            self._http_client = httpx.AsyncClient(timeout=self.timeout)
+        return self._http_client
+
+    def _resolve_generation(self, options: Optional[GenerationOptions] = None) -> GenerationOptions:
+        """요청별 생성 옵션에 서버 기본값을 채웁니다."""
+        defaults = GenerationOptions(
+            num_predict=settings.GENERATION_NUM_PREDICT,
+            num_ctx=settings.GENERATION_NUM_CTX,
+            stop=settings.GENERATION_STOP or None,
+            think=settings.GENERATION_THINK,
+            think_budget=settings.THINK_TOKEN_BUDGET,
+            think_budget_mode=settings.THINK_BUDGET_MODE
+        )
+        if options is None:
+            return defaults
+        return defaults.model_copy(update=options.model_dump(exclude_none=True))
+
+    def _ollama_payload(self, prompt: str, stream: bool, options: GenerationOptions,
+                        model: Optional[str] = None) -> Dict[str, Any]:
+        return {
+            "model": model or self.model,
+            "prompt": prompt,
+            "stream": stream,
+            "system": SYSTEM_PROMPT,
+            **build_generation_fields(
+                num_predict=options.num_predict,
+                num_ctx=options.num_ctx,
+                stop=options.stop,
+                think=options.think
             )
-            
-            async with httpx.AsyncClient(timeout=timeout) as client:
-                response = await client.post(
-                    f"{self.base_url}/api/generate",
-                    json={
-                        "model": self.model,
-                        "prompt": prompt,
-                        "stream": stream,
-                        "system": "당신은 한국어 전용 답변 도우미입니다. 다음 규칙을 절대적으로 따르세요:\n1. 오직 한글로만 답변하세요\n2. 영어는 한글로 변환하세요 (API -> 에이피아이)\n3. 특수문자와 한자는 사용하지 마세요\n4. 간단명료하게 핵심만 답변하세요\n5. 모든 외래어는 한글로 표기하세요\n6. 답변 이외의 설명은 하지 마세요\n7. 생각하는 과정을 보여주지 마세요\n8. 바로 결과만 보여주세요"
-                    }
+        }
+
+    async def _generate_stream(self, prompt: str, options: GenerationOptions,
+                               tracker: ThinkTracker, model: Optional[str] = None) -> AsyncIterator[str]:
+        """Ollama 스트리밍 응답의 각 객체를 집계하며 'response' 텍스트를 반환합니다."""
+        async with self._get_http_client().stream(
+            "POST",
+            f"{self.base_url}/api/generate",
+            json=self._ollama_payload(prompt, stream=True, options=options, model=model)
+        ) as response:
+            if response.status_code != 200:
+                await response.aread()
+                print(f"Error response from Ollama API: {response.text}")
+                raise RuntimeError("Ollama API error")
+
+            async for obj in aiter_json_objects(response.aiter_bytes()):
+                # 예산 초과 시 예외가 발생하며 스트림을 닫아 Ollama 생성도 중단됨
+                tracker.observe(obj)
+                if obj.get("response"):
+                    yield obj["response"]
+
+    async def _stream_tokens(self, prompt: str, options: Optional[GenerationOptions] = None,
+                             model: Optional[str] = None) -> AsyncIterator[str]:
+        """Ollama 스트리밍 응답에서 원본 텍스트 조각을 순서대로 반환합니다. (think 예산 적용)"""
+        options = self._resolve_generation(options)
+        tracker = ThinkTracker(options.think_budget or 0)
+        try:
+            async for text in self._generate_stream(prompt, options, tracker, model):
+                yield text
+        except ThinkBudgetExceeded as e:
+            print(f"✂️ {e} (mode={options.think_budget_mode})")
+            self.reasoning_stats.record(tracker, "cutoff")
+            if tracker.in_think:
+                # 이미 전달한 think 블록을 닫아 정규화 시 제거되도록 함
+                yield THINK_CLOSE
+            if options.think_budget_mode == "abort":
+                return
+
+            # think 단계 없이 답변만 다시 생성
+            retry_options = options.model_copy(update={"think": False, "think_budget": 0})
+            retry_tracker = ThinkTracker()
+            async for text in self._generate_stream(prompt, retry_options, retry_tracker, model):
+                yield text
+            self.reasoning_stats.record(retry_tracker, "retry")
+            return
+
+        self.reasoning_stats.record(tracker, "disabled" if options.think is False else "natural")
+
+    def _default_route(self) -> RouteDecision:
+        return RouteDecision([self.model], "default", None, None)
+
+    async def _routed_tokens(self, prompt: str, options: Optional[GenerationOptions],
+                             route: RouteDecision) -> AsyncIterator[str]:
+        """
+        후보 모델 순서대로 스트리밍 생성을 시도합니다.
+        첫 토큰이 제한 시간 안에 오지 않거나 오류가 나면 다음 모델로 넘어갑니다.
+        (첫 토큰을 전달한 뒤에는 모델을 바꾸지 않음)
+        """
+        last_error: Optional[Exception] = None
+        for attempt, model in enumerate(route.candidates):
+            start = time.perf_counter()
+            tokens = self._stream_tokens(prompt, options, model)
+            try:
+                first = await asyncio.wait_for(tokens.__anext__(), route.timeout_for(attempt))
+            except StopAsyncIteration:
+                first = None
+            except Exception as e:
+                await tokens.aclose()
+                self._record_route_failure(model, route, attempt, e)
+                last_error = e
+                continue
+
+            if first is not None:
+                yield first
+                async for text in tokens:
+                    yield text
+            self._record_route_success(model, route, attempt, start)
+            return
+        raise last_error or RuntimeError("No model available")
+
+    async def stream_ollama(self, prompt: str, options: Optional[GenerationOptions] = None,
+                            route: Optional[RouteDecision] = None) -> AsyncIterator[str]:
+        """정리된 응답을 완성된 줄 단위로 스트리밍합니다."""
+        try:
+            tokens = self._routed_tokens(prompt, options, route or self._default_route())
+            async for piece in anormalize_stream(tokens):
+                yield piece
+        except Exception as e:
+            print(f"Error in stream_ollama: {e}")
+            yield "⚠️ Ollama API 오류"
+
+    async def _query_model(self, prompt: str, stream: bool, options: GenerationOptions,
+                           model: Optional[str] = None) -> str:
+        """모델 하나로 답변을 생성합니다. (오류 시 예외 발생)"""
+        if stream or options.think_budget:
+            # 스트리밍 응답을 증분 정규화하여 전체 응답으로 반환
+            # (think 예산은 스트림에서만 적용할 수 있으므로 예산이 있으면 항상 스트리밍)
+            normalizer = ResponseNormalizer()
+            async for text in self._stream_tokens(prompt, options, model):
+                normalizer.feed(text)
+            return normalizer.finish()
+
+        response = await self._get_http_client().post(
+            f"{self.base_url}/api/generate",
+            json=self._ollama_payload(prompt, stream=False, options=options, model=model)
+        )
+
+        if response.status_code != 200:
+            print(f"Error response from Ollama API: {response.text}")
+            raise RuntimeError("Ollama API error")
+
+        # 단일 응답 처리
+        json_response = response.json()
+        if 'response' not in json_response:
+            raise RuntimeError("Ollama response has no 'response' field")
+
+        return normalize_response(json_response['response'])
+
+    async def generate_answer(self, prompt: str, stream: bool = False,
+                              options: Optional[GenerationOptions] = None,
+                              route: Optional[RouteDecision] = None) -> Tuple[str, Optional[str]]:
+        """
+        후보 모델 순서대로 답변 생성을 시도하고 (답변, 응답한 모델)을 반환합니다.
+        제한 시간 초과나 오류가 나면 다음 모델로 넘어가며, 모두 실패하면 오류 메시지를 반환합니다.
+        """
+        resolved = self._resolve_generation(options)
+        route = route or self._default_route()
+        for attempt, model in enumerate(route.candidates):
+            start = time.perf_counter()
+            try:
+                response_text = await asyncio.wait_for(
+                    self._query_model(prompt, stream, resolved, model),
+                    route.timeout_for(attempt)
                 )
+            except Exception as e:
+                self._record_route_failure(model, route, attempt, e)
+                continue
 
-                if response.status_code != 200:
-                    print(f"Error response from Ollama API: {response.text}")
-                    return "⚠️ Ollama API 오류"
-                
-                if stream:
-                    # 스트리밍 응답 처리
-                    full_response = ""
-                    async for line in response.aiter_lines():
-                        if line:
-                            try:
-                                json_response = json.loads(line)
-                                if 'response' in json_response:
-                                    full_response += json_response['response']
-                            except json.JSONDecodeError:
-                                continue
-                    
-                    if not full_response:
-                        return "⚠️ Ollama 응답 오류"
-                    
-                    response_text = full_response
-                else:
-                    # 단일 응답 처리
-                    json_response = response.json()
-                    if 'response' not in json_response:
-                        return "⚠️ Ollama 응답 오류"
-                    
-                    response_text = json_response['response']
-                
-                # think 태그와 그 내용 제거
-                if '<think>' in response_text:
-                    parts = response_text.split('<think>')
-                    for i in range(1, len(parts)):
-                        if '</think>' in parts[i]:
-                            parts[i] = parts[i].split('</think>', 1)[1]
-                    response_text = ''.join(parts).strip()
-                
-                # 응답에서 '[' 로 시작하는 헤더 부분 제거
-                if '[' in response_text:
-                    response_text = response_text.split(']')[-1].strip()
-                
-                # 추가 개행 제거 및 포맷 정리
-                lines = [line.strip() for line in response_text.split('\n') if line.strip()]
-                
-                # 처음 줄은 그대로 유지하고, 번호 항목만 구분
-                if not lines:
-                    return "⚠️ 응답이 비어있습니다."
-                    
-                formatted_response = lines[0]
-                for line in lines[1:]:
-                    # 숫자로 시작하는 경우 (1. 2. 3. 등)
-                    if line[0].isdigit() and len(line) > 1 and line[1] == '.':
-                        formatted_response += '\n\n' + line
-                    # 번호 리스트로 시작하는 경우 (1), 2), 3) 등)
-                    elif line.startswith(('1)', '2)', '3)', '4)', '5)', '6)', '7)', '8)', '9)')): 
-                        formatted_response += '\n\n' + line
-                    else:
-                        formatted_response += '\n' + line
-                
-                return formatted_response
-                
+            self._record_route_success(model, route, attempt, start)
+            if not response_text:
+                return "⚠️ 응답이 비어있습니다.", model
+            return response_text, model
+
+        return "⚠️ Ollama API 오류", None
+
+    async def query_ollama(self, prompt: str, stream: bool = False,
+                           options: Optional[GenerationOptions] = None) -> str:
+        response_text, _ = await self.generate_answer(prompt, stream, options)
+        return response_text
+
+    def _record_route_success(self, model: str, route: RouteDecision, attempt: int, start: float):
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.model_router.record_success(model, elapsed_ms, attempt)
+        if self.model_router.enabled:
+            fallback = f", fallback #{attempt}" if attempt else ""
+            print(f"🧭 Served by {model} in {elapsed_ms:.0f}ms ({route.reason}{fallback})")
+
+    def _record_route_failure(self, model: str, route: RouteDecision, attempt: int, error: Exception):
+        timed_out = isinstance(error, (asyncio.TimeoutError, httpx.TimeoutException))
+        self.model_router.record_failure(model, timed_out)
+        remaining = route.candidates[attempt + 1:]
+        if not timed_out:
+            import traceback
+            print(f"Error in query_ollama: {error}")
+            print(f"Traceback: {traceback.format_exc()}")
+        kind = "timed out" if timed_out else "failed"
+        print(f"⚠️ {model} {kind}" + (f", falling back to {remaining[0]}" if remaining else ""))
+
+    def _build_prompt(self, query: str, similar_docs: List[str]) -> str:
+        """검색된 문서로 Ollama 프롬프트를 구성합니다."""
+        return build_prompt(query, similar_docs)
+
+    def _flight_key(self, collection_name: str, query: str, where: Optional[Dict[str, Any]] = None,
+                    options: Optional[GenerationOptions] = None, latency_budget_ms: Optional[int] = None,
+                    priority: str = "normal"):
+        """
+        (콜렉션, 정규화된 질의, 모델, 필터, 생성 옵션, 지연 예산, 우선순위) 조합으로 동시 요청 병합 키를 만듭니다.
+        우선순위가 다른 요청은 합치지 않아 높은 우선순위 요청이 낮은 우선순위 요청의 대기열 위치를 기다리지 않습니다.
+        """
+        normalized_query = " ".join(query.split()).casefold()
+        where_key = json.dumps(where, sort_keys=True, ensure_ascii=False) if where else ""
+        options_key = options.model_dump_json(exclude_none=True) if options else ""
+        return (collection_name, normalized_query, self.model, where_key, options_key, latency_budget_ms, priority)
+
+    def _retrieve(self, collection_name: str, query: str,
+                  where: Optional[Dict[str, Any]] = None) -> Tuple[List[str], Optional[float]]:
+        """유사 문서와 top-1 거리(모델 선택의 검색 확신도)를 반환합니다."""
+        try:
+            matches = self.vector_store.similarity_search_with_scores(
+                collection_name, query, settings.RETRIEVAL_TOP_K, where=where
+            )
         except Exception as e:
             import traceback
-            print(f"Error in query_ollama: {e}")
+            print(f"Error in similarity search: {e}")
             print(f"Traceback: {traceback.format_exc()}")
-            return "⚠️ Ollama API 오류"
+            return [], None
+        documents = [match["document"] for match in matches if match["document"]]
+        return documents, (matches[0]["distance"] if matches else None)
 
-    async def run_rag_query(self, collection_name: str, query: str, stream: bool = False) -> str:
+    async def run_rag_query(self, collection_name: str, query: str, stream: bool = False,
+                            priority: str = "normal", where: Optional[Dict[str, Any]] = None,
+                            options: Optional[GenerationOptions] = None,
+                            latency_budget_ms: Optional[int] = None) -> QueryResponse:
+        if not settings.QUERY_COALESCING:
+            return await self._run_rag_query(collection_name, query, stream, priority, where, options, latency_budget_ms)
+        return await self.single_flight.do(
+            self._flight_key(collection_name, query, where, options, latency_budget_ms, priority),
+            lambda: self._run_rag_query(collection_name, query, stream, priority, where, options, latency_budget_ms)
+        )
+
+    async def _run_rag_query(self, collection_name: str, query: str, stream: bool = False,
+                             priority: str = "normal", where: Optional[Dict[str, Any]] = None,
+                             options: Optional[GenerationOptions] = None,
+                             latency_budget_ms: Optional[int] = None) -> QueryResponse:
+        stage = "retrieval"
         try:
-            # 지정된 콜렉션의 문서 검색
-            similar_docs = self.vector_store.similarity_search(collection_name, query)
+            # 지정된 콜렉션의 문서 검색 (where 필터로 후보를 먼저 좁힘)
+            # 스레드에서 실행하므로 요청이 취소되면 시작 전인 검색 작업도 함께 취소됨
+            similar_docs, top_distance = await asyncio.to_thread(self._retrieve, collection_name, query, where)
             if not similar_docs:
-                return "문서가 없습니다."
-            
-            # 프롬프트 생성
-            # 검색된 문서를 구조화된 형태로 처리
-            contexts = []
-            for i, doc in enumerate(similar_docs, 1):
-                if doc:
-                    contexts.append(f"문서 {i}:\n{doc}")
+                return QueryResponse(response="문서가 없습니다.")
             
-            # 명확한 구분자로 문서들을 결합
-            context = "\n\n=== 다음 문서 ===\n\n".join(contexts)
+            prompt = self._build_prompt(query, similar_docs)
+            route = self.model_router.choose(
+                query, sum(len(doc) for doc in similar_docs), top_distance, latency_budget_ms
+            )
             
-            # 프롬프트 구성
-            prompt = f"""
-다음 지시사항을 엄격히 따라 답변해주세요:
-
-1. 반드시 한글로만 답변하세요.
-2. 영어 단어는 모두 한글로 변환하세요 (예: API -> 에이피아이).
-3. 특수문자나 한자는 절대 사용하지 마세요.
-4. 간단명료하게 답변하세요.
-5. 불필요한 설명이나 부연은 제외하세요.
-6. 답변 전에 생각하는 과정을 보여주지 마세요.
-7. 바로 결과만 보여주세요.
+            # 생성 슬롯 확보 후 Ollama API 호출
+            stage = "queue"
+            async with self.scheduler.slot(priority) as ticket:
+                stage = "generation"
+                response, model = await self.generate_answer(prompt, stream=stream, options=options, route=route)
+            print(f"Generation timings: queue_wait={ticket.queue_wait_ms:.0f}ms, generation={ticket.generation_ms:.0f}ms")
 
-주어진 문서:
-{context}
-
-질문:
-{query}
-
-답변 형식:
-[질문에 대한 답변만 작성]
-"""
-            # 프롬프트 출력 제거
-            
-            # Ollama API 호출
-            response = await self.query_ollama(prompt, stream=stream)
-            return response
+            return QueryResponse(
+                response=response,
+                model=model,
+                queue_wait_ms=round(ticket.queue_wait_ms, 1),
+                generation_ms=round(ticket.generation_ms, 1)
+            )
             
+        except asyncio.CancelledError:
+            # 클라이언트 연결 종료: Ollama 요청도 함께 닫혀 모델이 즉시 해제됨
+            self._record_cancellation(stage, query)
+            raise
+        except GenerationRejected:
+            raise
         except Exception as e:
             import traceback
             print(f"Error in run_rag_query: {e}")
             print(f"Traceback: {traceback.format_exc()}")
-            return "쿼리 처리 중 오류가 발생했습니다."
+            return QueryResponse(response="쿼리 처리 중 오류가 발생했습니다.")
+
+    async def stream_rag_query(self, collection_name: str, query: str, priority: str = "normal",
+                               where: Optional[Dict[str, Any]] = None,
+                               options: Optional[GenerationOptions] = None,
+                               latency_budget_ms: Optional[int] = None) -> AsyncIterator[str]:
+        """run_rag_query와 동일한 검색 후 답변을 스트리밍으로 반환합니다."""
+        if not settings.QUERY_COALESCING:
+            source = self._stream_rag_query(collection_name, query, priority, where, options, latency_budget_ms)
+        else:
+            source = self.single_flight.stream(
+                self._flight_key(collection_name, query, where, options, latency_budget_ms, priority),
+                lambda: self._stream_rag_query(collection_name, query, priority, where, options, latency_budget_ms)
+            )
+        async for piece in source:
+            yield piece
+
+    async def _stream_rag_query(self, collection_name: str, query: str, priority: str = "normal",
+                                where: Optional[Dict[str, Any]] = None,
+                                options: Optional[GenerationOptions] = None,
+                                latency_budget_ms: Optional[int] = None) -> AsyncIterator[str]:
+        stage = "retrieval"
+        try:
+            similar_docs, top_distance = await asyncio.to_thread(self._retrieve, collection_name, query, where)
+            if not similar_docs:
+                yield "문서가 없습니다."
+                return
+
+            prompt = self._build_prompt(query, similar_docs)
+            route = self.model_router.choose(
+                query, sum(len(doc) for doc in similar_docs), top_distance, latency_budget_ms
+            )
+            stage = "queue"
+            async with self.scheduler.slot(priority):
+                stage = "generation"
+                async for piece in self.stream_ollama(prompt, options, route):
+                    yield piece
+        except GenerationRejected as e:
+            # 응답 헤더가 이미 전송된 뒤이므로 본문으로 알림
+            yield f"⚠️ {e.detail} (retry after {e.retry_after}s)"
+        except (asyncio.CancelledError, GeneratorExit):
+            # 스트림 소비자가 사라지면 Ollama 스트림도 닫힘
+            self._record_cancellation(stage, query)
+            raise
+
+    async def run_rag_batch(self, collection_name: str, queries: List[str], top_k: int = 3,
+                            max_concurrency: int = None, priority: str = "low",
+                            where: Optional[Dict[str, Any]] = None,
+                            options: Optional[GenerationOptions] = None,
+                            latency_budget_ms: Optional[int] = None) -> AsyncIterator[BatchQueryItem]:
+        """
+        여러 질의를 한 번에 처리하고 완료되는 순서대로 결과를 반환합니다.
+        - 임베딩과 검색은 배치 전체에 대해 한 번만 수행
+        - 생성은 max_concurrency 개까지만 동시에 생성 대기열에 진입
+        - 모델은 질의마다 선택 (배치 검색은 거리를 반환하지 않으므로 길이와 지연 예산만 사용)
+        """
+        similar_docs_list = await asyncio.to_thread(
+            self.vector_store.similarity_search_batch, collection_name, queries, top_k, where
+        )
+        semaphore = asyncio.Semaphore(max(1, max_concurrency or settings.BATCH_MAX_CONCURRENCY))
+
+        async def generate(index: int, query: str, similar_docs: List[str]) -> BatchQueryItem:
+            if not similar_docs:
+                return BatchQueryItem(index=index, query=query, response="문서가 없습니다.")
+            route = self.model_router.choose(
+                query, sum(len(doc) for doc in similar_docs), latency_budget_ms=latency_budget_ms
+            )
+            stage = "queue"
+            async with semaphore:
+                try:
+                    async with self.scheduler.slot(priority) as ticket:
+                        stage = "generation"
+                        response, model = await self.generate_answer(
+                            self._build_prompt(query, similar_docs), options=options, route=route
+                        )
+                except GenerationRejected as e:
+                    return BatchQueryItem(index=index, query=query, error=e.detail)
+                except asyncio.CancelledError:
+                    self._record_cancellation(stage, query)
+                    raise
+            return BatchQueryItem(
+                index=index,
+                query=query,
+                response=response,
+                model=model,
+                queue_wait_ms=round(ticket.queue_wait_ms, 1),
+                generation_ms=round(ticket.generation_ms, 1)
+            )
+
+        tasks = [
+            asyncio.ensure_future(generate(i, query, docs))
+            for i, (query, docs) in enumerate(zip(queries, similar_docs_list))
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def _record_cancellation(self, stage: str, query: str):
+        """취소된 작업을 단계별(retrieval | queue | generation)로 집계합니다."""
+        self.cancellations[stage] += 1
+        print(f"🛑 Cancelled during {stage}: {query[:50]}")
+
+    def record_disconnect(self):
+        """요청 처리 중 클라이언트 연결이 끊긴 횟수를 집계합니다."""
+        self.cancellations["client_disconnects"] += 1
+
+    def _embedding_server_stats(self) -> Optional[Dict[str, Any]]:
+        """공유 임베딩 워커 사용 시 워커의 배치 처리 현황을 조회합니다."""
+        model = self.vector_store.embedding_model
+        if not isinstance(model, EmbeddingClient):
+            return None
+        try:
+            return model.stats()
+        except Exception as e:
+            return {"error": str(e)}
+
+    def _shard_stats(self) -> Optional[Dict[str, Any]]:
+        """샤딩 사용 시 샤드별 콜렉션 수와 청크 수를 조회합니다."""
+        client = self.vector_store.client
+        if not isinstance(client, ShardedClient):
+            return None
+        try:
+            return client.stats()
+        except Exception as e:
+            return {"error": str(e)}
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """서비스 내부 지표를 반환합니다."""
+        return {
+            "single_flight": self.single_flight.stats(),
+            "generation_scheduler": self.scheduler.stats(),
+            "reasoning": self.reasoning_stats.stats(),
+            "model_routing": self.model_router.stats(),
+            "cancellations": dict(self.cancellations),
+            "embedding_cache": get_embedding_cache().stats() if get_embedding_cache() else None,
+            "embedding_server": self._embedding_server_stats(),
+            "embedding_batching": get_batched_embedding_model().stats() if get_batched_embedding_model.cache_info().currsize else None,
+            "ingest_jobs": self.ingest_jobs.stats(),
+            "dedup": self.vector_store.dedup_stats.stats(),
+            "shards": self._shard_stats()
+        }
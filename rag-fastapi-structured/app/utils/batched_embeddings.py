@@ -0,0 +1,141 @@
+"""
+길이 정렬 + 토큰 예산 배치 임베딩
+
+rag-fastapi-simple/app/batched_embeddings.py 와 동일한 내용을 유지합니다.
+청크를 생성 순서대로 고정 크기 배치로 임베딩하면 짧은 청크가 긴 청크 길이만큼 패딩되어 계산이 낭비됩니다.
+- 입력을 토큰 길이순으로 정렬하고
+- (배치 내 최대 길이 × 배치 크기)가 token_budget 을 넘지 않도록 배치를 나누고
+- 각 배치를 모델 내부에서 다시 나누지 않고 한 번의 forward pass 로 계산한 뒤
+- 결과를 원래 입력 순서로 되돌려 반환합니다.
+토크나이저를 찾을 수 없는 모델은 글자 수를 길이로 사용합니다.
+"""
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+
+def configure_threads(intra_op: int = 0, inter_op: int = 0):
+    """
+    torch 연산 스레드 수를 설정합니다. (0이면 라이브러리 기본값 유지)
+    uvicorn 워커와 같은 노드에서 실행될 때 코어를 과점유하지 않도록 제한합니다.
+    """
+    try:
+        import torch
+    except ImportError:
+        return
+    if intra_op > 0:
+        torch.set_num_threads(intra_op)
+    if inter_op > 0:
+        try:
+            torch.set_num_interop_threads(inter_op)
+        except RuntimeError:
+            # inter-op 스레드 수는 병렬 작업이 시작되기 전에 한 번만 설정 가능
+            print(f"⚠️ torch inter-op threads already initialized ({torch.get_num_interop_threads()})")
+
+
+def _find_token_counter(model) -> Optional[Callable[[List[str]], List[int]]]:
+    """모델의 토크나이저로 텍스트별 토큰 수(최대 길이에서 잘림)를 계산하는 함수를 만듭니다."""
+    client = getattr(model, "_client", None) or getattr(model, "client", None)
+    tokenizer = getattr(model, "tokenizer", None) or getattr(client, "tokenizer", None)
+    if tokenizer is None or not callable(tokenizer):
+        return None
+    max_length = getattr(model, "max_length", None) or getattr(client, "max_seq_length", None) or 512
+
+    def count(texts: List[str]) -> List[int]:
+        encoded = tokenizer(texts, add_special_tokens=True, truncation=True, max_length=max_length)
+        return [len(ids) for ids in encoded["input_ids"]]
+    return count
+
+
+def find_batch_encoder(model) -> Callable[[List[str]], List[List[float]]]:
+    """
+    계획한 배치를 그대로 한 번의 forward pass 로 계산하는 함수를 만듭니다.
+    model.embed_documents 는 내부에서 고정 크기(기본 32)로 다시 나누므로 토큰 예산이 실제 배치 크기가 되지 않습니다.
+    - OnnxEmbeddings: encode_batch (세션 1회 실행)
+    - HuggingFaceEmbeddings: SentenceTransformer.encode(batch_size=len(texts)) (embed_documents 와 같은 전처리/옵션)
+    - 그 외 (임베딩 워커 클라이언트 등): embed_documents
+    """
+    if callable(getattr(model, "encode_batch", None)):
+        return model.encode_batch
+
+    client = getattr(model, "_client", None) or getattr(model, "client", None)
+    if client is not None and callable(getattr(client, "encode", None)):
+        encode_kwargs = dict(getattr(model, "encode_kwargs", None) or {})
+
+        def encode(texts: List[str]) -> List[List[float]]:
+            texts = [text.replace("\n", " ") for text in texts]
+            vectors = client.encode(texts, **{**encode_kwargs, "batch_size": len(texts)})
+            return vectors.tolist()
+        return encode
+
+    return model.embed_documents
+
+
+class TokenBudgetEmbeddings(Embeddings):
+    """embed_documents 호출을 길이순 토큰 예산 배치로 나누어 원래 모델에 전달하는 래퍼"""
+
+    def __init__(self, model, token_budget: int = 4096, max_batch: int = 256):
+        self.model = model
+        self.token_budget = token_budget
+        self.max_batch = max_batch
+        self._count_tokens = _find_token_counter(model)
+        self._encode_batch = find_batch_encoder(model)
+        self._lock = threading.Lock()
+        self.texts = 0
+        self.batches = 0
+        self.tokens = 0
+        self.padded_tokens = 0
+
+    def token_lengths(self, texts: List[str]) -> List[int]:
+        if self._count_tokens is not None:
+            return self._count_tokens(texts)
+        return [len(text) for text in texts]
+
+    def plan_batches(self, lengths: List[int]) -> List[List[int]]:
+        """길이순으로 정렬한 입력 인덱스를 토큰 예산 안의 배치로 나눕니다."""
+        order = sorted(range(len(lengths)), key=lengths.__getitem__)
+        batches, current = [], []
+        for index in order:
+            # 오름차순이므로 새 항목의 길이가 배치 내 최대 길이 (패딩 기준)
+            if current and ((len(current) + 1) * lengths[index] > self.token_budget
+                            or len(current) >= self.max_batch):
+                batches.append(current)
+                current = []
+            current.append(index)
+        if current:
+            batches.append(current)
+        return batches
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        texts = list(texts)
+        if not texts:
+            return []
+        lengths = self.token_lengths(texts)
+        batches = self.plan_batches(lengths)
+
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        for batch in batches:
+            vectors = self._encode_batch([texts[i] for i in batch])
+            for i, vector in zip(batch, vectors):
+                results[i] = vector
+
+        with self._lock:
+            self.texts += len(texts)
+            self.batches += len(batches)
+            self.tokens += sum(lengths)
+            self.padded_tokens += sum(len(batch) * max(lengths[i] for i in batch) for batch in batches)
+        return results
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.model.embed_query(text)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "token_budget": self.token_budget,
+                "texts": self.texts,
+                "batches": self.batches,
+                "avg_batch_size": round(self.texts / self.batches, 1) if self.batches else 0.0,
+                "padding_ratio": round(1 - self.tokens / self.padded_tokens, 4) if self.padded_tokens else 0.0
+            }
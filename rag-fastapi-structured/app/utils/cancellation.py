@@ -0,0 +1,28 @@
+import asyncio
+from typing import Any, Awaitable
+
+from fastapi import Request
+
+
+class ClientDisconnected(Exception):
+    """응답을 받을 클라이언트가 연결을 끊은 경우"""
+
+
+async def run_until_disconnected(request: Request, awaitable: Awaitable[Any],
+                                 poll_interval: float = 0.5) -> Any:
+    """
+    작업을 실행하면서 클라이언트 연결을 주기적으로 확인합니다.
+    연결이 끊기면 작업을 취소하고 ClientDisconnected를 발생시키므로
+    대기 중인 검색 작업, 생성 대기열, Ollama 연결이 즉시 정리됩니다.
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                raise ClientDisconnected()
+    finally:
+        if not task.done():
+            task.cancel()
@@ -0,0 +1,249 @@
+"""
+테이블 메타데이터 카탈로그(CSV) 대용량 적재
+
+CSV를 CATALOG_CHUNK_ROWS 행 단위로 읽어 메모리 사용량을 고정하고,
+행 단위 apply 대신 pandas 문자열 연산으로 문서 텍스트를 한 번에 만듭니다.
+임베딩은 스레드 풀에서 병렬로 계산하고(토치/ONNX 연산은 GIL을 해제),
+`table.column` 형식의 고정 ID로 upsert 하므로 같은 카탈로그를 다시 적재해도 중복이 생기지 않습니다.
+"""
+import io
+import os
+import csv
+import time
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from config import settings
+
+CATALOG_COLUMNS = ["table_name", "column_name", "data_type", "description", "sample_values", "statistics"]
+
+# 통계 항목 (키, 표시 이름) - 노트북의 format_metadata_to_text와 동일한 항목만 사용
+STATISTICS_FIELDS = [
+    ("min", "min"),
+    ("max", "max"),
+    ("null_count", "NULL 값 개수"),
+    ("distinct_count", "고유 값 개수"),
+]
+
+
+def _format_sample_values(values: pd.Series) -> pd.Series:
+    """"[1001, 1002]" / "['a', 'b']" 형식의 리스트 문자열을 "1001, 1002" / "a, b"로 변환합니다."""
+    return (
+        values.str.strip()
+        .str.replace(r"^\[|\]$", "", regex=True)
+        .str.replace(r"""['"]""", "", regex=True)
+        .str.replace(r"\s*,\s*", ", ", regex=True)
+    )
+
+
+def _format_statistics(statistics: pd.Series) -> pd.Series:
+    """통계 딕셔너리 문자열에서 항목별 값을 정규식으로 추출하여 읽기 쉬운 형식으로 변환합니다."""
+    parts = []
+    for key, label in STATISTICS_FIELDS:
+        value = statistics.str.extract(rf"""['"]{key}['"]\s*:\s*['"]?([^,'"}}]*)""", expand=False)
+        parts.append((label + ": " + value.str.strip()).where(value.notna(), ""))
+
+    combined = parts[0]
+    for part in parts[1:]:
+        combined = combined.str.cat(part, sep=", ")
+    # 비어있는 항목 사이의 구분자 정리
+    return combined.str.replace(r"(, )+", ", ", regex=True).str.strip(", ")
+
+
+def format_catalog_documents(df: pd.DataFrame) -> pd.Series:
+    """카탈로그 DataFrame 전체를 검색용 문서 텍스트로 변환합니다. (벡터화 연산)"""
+    return (
+        "테이블 '" + df["table_name"] + "'의 '" + df["column_name"] + "' 컬럼:\n"
+        + "- 데이터 타입: " + df["data_type"] + "\n"
+        + "- 설명: " + df["description"] + "\n"
+        + "- 샘플 값: " + _format_sample_values(df["sample_values"]) + "\n"
+        + "- 통계: " + _format_statistics(df["statistics"])
+    )
+
+
+def _prepare_chunk(df: pd.DataFrame, collection_name: str, file_name: str,
+                   row_offset: int) -> Tuple[List[str], List[Dict[str, Any]], List[str]]:
+    """CSV 청크 하나를 (문서, 메타데이터, ID) 목록으로 변환합니다."""
+    for column in CATALOG_COLUMNS:
+        if column not in df.columns:
+            df[column] = ""
+    df = df.assign(chunk_index=range(row_offset, row_offset + len(df)))
+
+    # 같은 청크 안에서 ID가 중복되면 upsert가 실패하므로 마지막 행만 유지
+    df = df.assign(doc_id=df["table_name"] + "." + df["column_name"])
+    df = df.drop_duplicates("doc_id", keep="last")
+
+    metadatas = df[["table_name", "column_name", "data_type", "chunk_index"]].assign(
+        source=collection_name,
+        file=file_name
+    ).to_dict("records")
+    return format_catalog_documents(df).tolist(), metadatas, df["doc_id"].tolist()
+
+
+class _BadLineHandler:
+    """
+    필드 수가 헤더보다 많은 행(csv 모듈로 나눈 필드 목록)을 처리합니다.
+    따옴표 없는 `decimal(10,2)` 처럼 data_type 안의 쉼표로 필드가 늘어난 행은
+    앞의 table_name, column_name 과 뒤의 description, sample_values, statistics 를 기준으로 data_type 을 다시 합치고,
+    헤더가 표준 카탈로그 열 순서가 아니라 복구할 수 없으면 경고 후 건너뜁니다.
+    """
+
+    def __init__(self, file_name: str, header: List[str]):
+        self.file_name = file_name
+        self.header = header
+        self.repaired = 0
+        self.skipped = 0
+
+    def __call__(self, fields: List[str]) -> Optional[List[str]]:
+        if self.header == CATALOG_COLUMNS and len(fields) > len(CATALOG_COLUMNS):
+            self.repaired += 1
+            return fields[:2] + [",".join(fields[2:len(fields) - 3])] + fields[-3:]
+        self.skipped += 1
+        print(f"⚠️ Skipping malformed catalog row in {self.file_name} "
+              f"({len(fields)} fields, expected {len(self.header)}): {','.join(fields)[:120]}")
+        return None
+
+
+def _iter_blocks(file_path: str, chunk_rows: int) -> Iterator[str]:
+    """헤더를 제외한 CSV 본문을 약 chunk_rows 줄씩 잘라 반환합니다. (따옴표 안의 줄바꿈에서는 자르지 않음)"""
+    with open(file_path, "r", encoding="utf-8", newline="") as f:
+        f.readline()
+        while True:
+            block = "".join(itertools.islice(f, chunk_rows))
+            if not block:
+                return
+            while block.count('"') % 2:
+                line = f.readline()
+                if not line:
+                    break
+                block += line
+            if block.strip():
+                yield block
+
+
+def _parse_block(block: str, header: List[str], bad_lines: _BadLineHandler) -> pd.DataFrame:
+    """
+    블록을 C 엔진으로 읽고, 필드 수가 많은 행이 있으면 그 블록만 csv 모듈로 다시 나누어 해당 행을 복구합니다.
+    (정상 블록은 행 단위 python 파싱 비용이 없음)
+    pandas 의 chunksize 읽기와 python 엔진은 초과 필드를 오류 없이 자르거나 첫 열을 인덱스로 추정하므로 사용하지 않습니다.
+    """
+    try:
+        # 헤더 행이 있어야 첫 데이터 행의 필드 수도 헤더와 비교됨
+        df = pd.read_csv(io.StringIO(",".join(header) + "\n" + block), header=0, names=header,
+                         dtype=str, keep_default_na=False)
+        # 첫 데이터 행의 필드가 많으면 오류 대신 앞 열을 인덱스로 추정하므로 같은 경우로 처리
+        if isinstance(df.index, pd.RangeIndex):
+            return df
+    except pd.errors.ParserError:
+        pass
+
+    rows = []
+    for fields in csv.reader(io.StringIO(block)):
+        if not fields:
+            continue
+        if len(fields) > len(header):
+            fields = bad_lines(fields)
+            if fields is None:
+                continue
+        rows.append(fields + [""] * (len(header) - len(fields)))
+    return pd.DataFrame(rows, columns=header, dtype=str)
+
+
+def iter_catalog_chunks(file_path: str, collection_name: str,
+                        chunk_rows: Optional[int] = None) -> Iterator[Tuple[List[str], List[Dict[str, Any]], List[str]]]:
+    """CSV를 chunk_rows 행씩 읽어 (문서, 메타데이터, ID)를 순서대로 반환합니다."""
+    file_name = os.path.basename(file_path)
+    header = pd.read_csv(file_path, nrows=0, encoding="utf-8").columns.tolist()
+    bad_lines = _BadLineHandler(file_name, header)
+    row_offset = 0
+    for block in _iter_blocks(file_path, chunk_rows or settings.CATALOG_CHUNK_ROWS):
+        df = _parse_block(block, header, bad_lines)
+        yield _prepare_chunk(df, collection_name, file_name, row_offset)
+        row_offset += len(df)
+
+    if bad_lines.repaired:
+        print(f"🔧 Repaired {bad_lines.repaired} catalog rows with unquoted commas in data_type ({file_name})")
+
+
+def load_catalog(file_path: str, collection_name: str) -> Tuple[List[str], List[Dict[str, Any]], List[str]]:
+    """작은 카탈로그를 한 번에 (문서, 메타데이터, ID)로 변환합니다. (재색인용)"""
+    texts, metadatas, ids = [], [], []
+    for chunk_texts, chunk_metadatas, chunk_ids in iter_catalog_chunks(file_path, collection_name):
+        texts.extend(chunk_texts)
+        metadatas.extend(chunk_metadatas)
+        ids.extend(chunk_ids)
+    return texts, metadatas, ids
+
+
+def ingest_catalog(vector_store, file_path: str, collection_name: str,
+                   chunk_rows: Optional[int] = None, embed_batch_size: Optional[int] = None,
+                   workers: Optional[int] = None, target_collection: Optional[str] = None,
+                   progress: Optional[Callable[[int], None]] = None) -> Dict[str, Any]:
+    """
+    카탈로그 CSV를 청크 단위로 임베딩하여 콜렉션에 upsert 합니다.
+    - 메모리에는 임베딩 중인 청크와 저장 중인 청크, 최대 2개만 유지
+    - 청크 안의 임베딩 배치는 workers개 스레드에서 병렬 계산
+    - 저장은 입력 순서대로 upsert (같은 ID는 마지막 값으로 덮어씀)
+    target_collection을 지정하면 메타데이터의 source는 collection_name으로 두고
+    해당 콜렉션(교체용 임시 콜렉션 등)에 저장합니다. progress(행 수)는 청크를 저장할 때마다 호출됩니다.
+    """
+    start = time.perf_counter()
+    chunk_rows = chunk_rows or settings.CATALOG_CHUNK_ROWS
+    embed_batch_size = embed_batch_size or settings.CATALOG_EMBED_BATCH_SIZE
+    workers = workers or settings.CATALOG_WORKERS or 1
+    collection = vector_store.client.get_or_create_collection(
+        name=target_collection or collection_name,
+        embedding_function=vector_store.embed_function
+    )
+    client = vector_store.client
+    max_batch = client.get_max_batch_size() if hasattr(client, "get_max_batch_size") else 5000
+
+    def upsert(texts, metadatas, ids, embeddings):
+        for batch_start in range(0, len(ids), max_batch):
+            batch_stop = batch_start + max_batch
+            collection.upsert(
+                ids=ids[batch_start:batch_stop],
+                documents=texts[batch_start:batch_stop],
+                metadatas=metadatas[batch_start:batch_stop],
+                embeddings=embeddings[batch_start:batch_stop]
+            )
+        if progress:
+            progress(len(ids))
+
+    rows = 0
+    pending = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for texts, metadatas, ids in iter_catalog_chunks(file_path, collection_name, chunk_rows):
+            # 청크를 임베딩 배치로 나누어 병렬 계산
+            futures = [
+                executor.submit(vector_store.ingest_embedding_model.embed_documents, texts[i:i + embed_batch_size])
+                for i in range(0, len(texts), embed_batch_size)
+            ]
+            pending.append((texts, metadatas, ids, futures))
+
+            # 다음 청크를 임베딩하는 동안 이전 청크를 저장
+            while len(pending) > 1:
+                rows += _flush(pending.pop(0), upsert)
+
+        while pending:
+            rows += _flush(pending.pop(0), upsert)
+
+    elapsed = time.perf_counter() - start
+    print(f"📚 Ingested {rows} catalog columns into '{collection_name}' "
+          f"in {elapsed:.2f}s ({rows / elapsed if elapsed else 0:.0f} rows/s)")
+    return {
+        "collection_name": collection_name,
+        "rows": rows,
+        "elapsed_s": round(elapsed, 2),
+        "rows_per_s": round(rows / elapsed, 1) if elapsed else None
+    }
+
+
+def _flush(item, upsert) -> int:
+    texts, metadatas, ids, futures = item
+    embeddings = [vector for future in futures for vector in future.result()]
+    upsert(texts, metadatas, ids, embeddings)
+    return len(ids)
@@ -0,0 +1,134 @@
+import re
+import os
+from typing import Any, Dict, List, Optional, Tuple
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from config import settings
+from utils.catalog_loader import load_catalog
+
+# 색인 대상 파일 확장자
+SUPPORTED_EXTENSIONS = ('.txt', '.csv')
+
+# 마크다운 헤딩 (# 제목, ## 소제목 ...)
+HEADING_PATTERN = re.compile(r'^(#{1,6})[ \t]+(.+?)[ \t]*$', re.MULTILINE)
+
+
+def _make_splitter() -> RecursiveCharacterTextSplitter:
+    # 한글 문서에 최적화된 텍스트 스플리터 설정
+    return RecursiveCharacterTextSplitter(
+        separators=["\n\n", "\n", ".", "!", "?", "。", "！", "？", " ", ""],
+        chunk_size=settings.CHUNK_SIZE,
+        chunk_overlap=settings.CHUNK_OVERLAP,
+        length_function=len,
+        keep_separator=False,
+        is_separator_regex=False
+    )
+
+
+class StreamingTextChunker:
+    """
+    텍스트를 조각 단위로 받아 청크로 분할합니다. (업로드 스트림을 전체 버퍼링하지 않고 처리)
+    window 글자 이상 쌓이면 마지막 문단/줄 경계까지를 잘라 분할하고, 나머지는 다음 조각과 이어 붙입니다.
+    헤딩 경로, 청크 번호, 파일 내 오프셋은 조각 경계와 관계없이 이어서 기록합니다.
+    window가 0이면 close() 에서 한 번에 분할합니다. (split_text_document와 동일한 결과)
+    """
+
+    def __init__(self, file_name: str, collection_name: str, window: Optional[int] = None):
+        self.file_name = file_name
+        self.collection_name = collection_name
+        self.window = settings.CHUNK_SIZE * 8 if window is None else window
+        self.chunk_count = 0
+        self._splitter = _make_splitter()
+        self._buffer = ""
+        self._buffer_offset = 0  # 버퍼 시작 위치의 파일 내 오프셋
+        self._heading_path: List[Tuple[int, str]] = []
+        self._section = ""
+
+    def feed(self, text: str) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """텍스트 조각을 추가하고, 분할이 끝난 청크와 메타데이터를 반환합니다."""
+        self._buffer += text
+        if not self.window or len(self._buffer) < self.window:
+            return [], []
+
+        # 문단 경계 > 줄 경계 순으로 자르고, 줄바꿈이 없는 긴 텍스트는 window*4 에서 강제로 자름
+        cut = self._buffer.rfind("\n\n")
+        if cut > 0:
+            cut += 2
+        else:
+            cut = self._buffer.rfind("\n") + 1
+        if cut <= 0:
+            if len(self._buffer) < self.window * 4:
+                return [], []
+            cut = len(self._buffer)
+
+        block, self._buffer = self._buffer[:cut], self._buffer[cut:]
+        return self._split_block(block)
+
+    def close(self) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """남은 텍스트를 분할하여 반환합니다."""
+        block, self._buffer = self._buffer, ""
+        return self._split_block(block)
+
+    def _split_block(self, block: str) -> Tuple[List[str], List[Dict[str, Any]]]:
+        block_offset = self._buffer_offset
+        self._buffer_offset += len(block)
+
+        # 섹션 경계와 헤딩 경로 계산 (이전 블록의 헤딩 경로를 이어받음)
+        sections = []
+        start, section = 0, self._section
+        for match in HEADING_PATTERN.finditer(block):
+            sections.append((start, match.start(), section))
+            level = len(match.group(1))
+            self._heading_path = [h for h in self._heading_path if h[0] < level] + [(level, match.group(2))]
+            start, section = match.start(), " > ".join(h[1] for h in self._heading_path)
+        sections.append((start, len(block), section))
+        self._section = section
+
+        texts, metadatas = [], []
+        for section_start, section_end, section in sections:
+            body = block[section_start:section_end]
+            if not body.strip():
+                continue
+
+            cursor = 0
+            for chunk in self._splitter.split_text(body):
+                position = body.find(chunk, cursor)
+                if position == -1:
+                    position = cursor
+                cursor = position + 1
+
+                metadatas.append({
+                    "source": self.collection_name,
+                    "file": self.file_name,
+                    "section": section,
+                    "chunk_index": self.chunk_count,
+                    "offset": block_offset + section_start + position
+                })
+                texts.append(chunk)
+                self.chunk_count += 1
+
+        return texts, metadatas
+
+
+def split_text_document(text: str, file_name: str, collection_name: str) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """
+    텍스트 문서를 헤딩 단위 섹션으로 나눈 뒤 청크로 분할합니다.
+    각 청크에는 파일명, 섹션 헤딩 경로, 청크 번호, 파일 내 오프셋을 메타데이터로 기록합니다.
+    """
+    chunker = StreamingTextChunker(file_name, collection_name, window=0)
+    chunker.feed(text)
+    return chunker.close()
+
+
+def load_document(file_path: str, collection_name: str) -> Tuple[List[str], List[Dict[str, Any]], Optional[List[str]]]:
+    """
+    파일 형식에 맞게 문서를 (청크, 메타데이터, ID)로 변환합니다.
+    ID가 None이면 저장소 기본 ID(콜렉션명_순번)를 사용합니다.
+    """
+    if file_path.endswith('.csv'):
+        # 테이블 메타데이터 카탈로그: table.column 고정 ID
+        return load_catalog(file_path, collection_name)
+
+    with open(file_path, 'r', encoding='utf-8') as f:
+        text_content = f.read()
+    texts, metadatas = split_text_document(text_content, os.path.basename(file_path), collection_name)
+    return texts, metadatas, None
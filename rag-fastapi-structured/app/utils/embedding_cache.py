@@ -0,0 +1,171 @@
+"""
+내용 주소 기반(content-addressed) 임베딩 캐시
+
+rag-fastapi-simple/app/embedding_cache.py 와 동일한 내용을 유지합니다.
+- (임베딩 모델, 청크 텍스트 SHA-256) 키로 임베딩 벡터를 SQLite에 저장
+- 여러 파일/콜렉션에 반복되는 머리말, 면책 문구 등은 한 번만 임베딩
+- 전체 크기가 max_bytes를 넘으면 가장 오래 사용되지 않은 항목부터 삭제 (LRU)
+- WAL 모드로 여러 워커 프로세스가 같은 캐시 파일을 공유
+- 전체 벡터 크기는 트리거가 갱신하는 카운터 행으로 관리 (저장마다 전체 테이블을 합산하지 않음)
+"""
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from array import array
+from typing import Any, Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+# SQLite 바인딩 변수 개수 제한을 넘지 않도록 조회를 나누는 단위
+_LOOKUP_BATCH = 500
+
+
+def _text_hash(text: str) -> bytes:
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    def __init__(self, path: str, max_bytes: int = 512 * 2**20):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                hash BLOB NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, hash)
+            ) WITHOUT ROWID
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+        # 벡터 바이트 합계 카운터: 삽입/삭제 트리거가 같은 트랜잭션에서 갱신하므로 여러 프로세스가 써도 정확함
+        # (카운터가 없던 기존 캐시 파일은 최초 한 번만 합산)
+        self._conn.executescript("""
+            BEGIN IMMEDIATE;
+            CREATE TABLE IF NOT EXISTS cache_size (id INTEGER PRIMARY KEY CHECK (id = 0), bytes INTEGER NOT NULL);
+            INSERT OR IGNORE INTO cache_size SELECT 0, COALESCE(SUM(length(vector)), 0) FROM embeddings;
+            CREATE TRIGGER IF NOT EXISTS embeddings_size_insert AFTER INSERT ON embeddings BEGIN
+                UPDATE cache_size SET bytes = bytes + length(NEW.vector) WHERE id = 0;
+            END;
+            CREATE TRIGGER IF NOT EXISTS embeddings_size_delete AFTER DELETE ON embeddings BEGIN
+                UPDATE cache_size SET bytes = bytes - length(OLD.vector) WHERE id = 0;
+            END;
+            COMMIT;
+        """)
+
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """텍스트 목록의 캐시된 벡터를 반환합니다. (없으면 None)"""
+        hashes = [_text_hash(text) for text in texts]
+        found: Dict[bytes, List[float]] = {}
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(hashes), _LOOKUP_BATCH):
+                batch = list(set(hashes[start:start + _LOOKUP_BATCH]))
+                rows = self._conn.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({','.join('?' * len(batch))})",
+                    [model, *batch]
+                ).fetchall()
+                for digest, blob in rows:
+                    found[digest] = array("f", blob).tolist()
+            if found:
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND hash = ?",
+                    [(now, model, digest) for digest in found]
+                )
+                self._conn.commit()
+
+            results = [found.get(digest) for digest in hashes]
+            hit_count = sum(1 for vector in results if vector is not None)
+            self.hits += hit_count
+            self.misses += len(results) - hit_count
+        return results
+
+    def put_many(self, model: str, texts: List[str], vectors: List[List[float]]):
+        """새로 계산한 벡터를 저장하고, 크기 상한을 넘으면 오래된 항목을 삭제합니다."""
+        now = time.time()
+        rows = [
+            (model, _text_hash(text), array("f", vector).tobytes(), now)
+            for text, vector in zip(texts, vectors)
+        ]
+        with self._lock:
+            # 같은 (모델, 텍스트)의 벡터는 같으므로 이미 있으면 사용 시각만 갱신 (REPLACE는 삭제 트리거를 거치지 않음)
+            self._conn.executemany(
+                "INSERT INTO embeddings VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (model, hash) DO UPDATE SET last_used = excluded.last_used",
+                rows
+            )
+            self._conn.commit()
+            self._evict()
+
+    def _evict(self):
+        total = self._size_bytes()
+        if total <= self.max_bytes:
+            return
+        # 상한의 90%까지 줄여 매 저장마다 삭제가 반복되지 않도록 함
+        target = int(self.max_bytes * 0.9)
+        cursor = self._conn.execute("SELECT model, hash, length(vector) FROM embeddings ORDER BY last_used")
+        victims = []
+        for model, digest, size in cursor:
+            if total <= target:
+                break
+            victims.append((model, digest))
+            total -= size
+        self._conn.executemany("DELETE FROM embeddings WHERE model = ? AND hash = ?", victims)
+        self._conn.commit()
+        self.evicted += len(victims)
+
+    def _size_bytes(self) -> int:
+        return self._conn.execute("SELECT bytes FROM cache_size WHERE id = 0").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            size = self._size_bytes()
+        total = self.hits + self.misses
+        return {
+            "entries": entries,
+            "size_mb": round(size / 2**20, 1),
+            "max_mb": round(self.max_bytes / 2**20, 1),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "evicted": self.evicted
+        }
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    embed_documents 앞에 EmbeddingCache를 두는 임베딩 래퍼
+    캐시에 없는 텍스트만 (배치 내 중복도 한 번만) 원래 모델로 임베딩합니다.
+    질의 임베딩(embed_query)은 캐시하지 않습니다.
+    """
+
+    def __init__(self, model, cache: EmbeddingCache, model_name: str):
+        self.model = model
+        self.cache = cache
+        self.model_name = model_name
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.cache.get_many(self.model_name, texts)
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        if missing:
+            computed = dict(zip(missing, self.model.embed_documents(missing)))
+            self.cache.put_many(self.model_name, missing, [computed[text] for text in missing])
+            vectors = [computed[text] if vector is None else vector for text, vector in zip(texts, vectors)]
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.model.embed_query(text)
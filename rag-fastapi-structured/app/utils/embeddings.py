@@ -1,13 +1,173 @@
+import os
+from functools import lru_cache
 from typing import List
 from langchain_huggingface import HuggingFaceEmbeddings
 from config import settings
+from utils.embedding_cache import CachedEmbeddings, EmbeddingCache
+from utils.embedding_server import EmbeddingClient
+from utils.batched_embeddings import TokenBudgetEmbeddings, configure_threads
+
+
+class OnnxEmbeddings:
+    """
+    ONNX Runtime 기반 sentence-transformers 임베딩 모델.
+    - 최초 실행 시 모델을 ONNX로 변환하여 `ONNX_MODEL_DIR`에 저장
+    - `quantize=True`이면 동적 int8 양자화 모델 사용 (CPU 전용 노드용)
+    - HuggingFaceEmbeddings와 동일한 embed_documents/embed_query 인터페이스 제공
+    """
+
+    def __init__(self, model_name: str, model_dir: str, quantize: bool = False,
+                 batch_size: int = 32, max_length: int = 128,
+                 intra_op_threads: int = 0, inter_op_threads: int = 0):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
+
+        export_dir = os.path.join(model_dir, model_name.replace("/", "__"))
+        model_file = self._prepare_model(export_dir, quantize)
+
+        self.tokenizer = AutoTokenizer.from_pretrained(export_dir)
+        session_options = ort.SessionOptions()
+        if intra_op_threads > 0:
+            session_options.intra_op_num_threads = intra_op_threads
+        if inter_op_threads > 0:
+            session_options.inter_op_num_threads = inter_op_threads
+        self.session = ort.InferenceSession(model_file, session_options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def _prepare_model(self, export_dir: str, quantize: bool) -> str:
+        """ONNX 모델이 없으면 변환(및 양자화)하고 사용할 모델 파일 경로를 반환합니다."""
+        model_file = os.path.join(export_dir, "model.onnx")
+        quantized_file = os.path.join(export_dir, "model_quantized.onnx")
+
+        if not os.path.exists(model_file):
+            from optimum.onnxruntime import ORTModelForFeatureExtraction
+            from transformers import AutoTokenizer
+
+            print(f"Exporting {self.model_name} to ONNX: {export_dir}")
+            ort_model = ORTModelForFeatureExtraction.from_pretrained(self.model_name, export=True)
+            ort_model.save_pretrained(export_dir)
+            AutoTokenizer.from_pretrained(self.model_name).save_pretrained(export_dir)
+
+        if not quantize:
+            return model_file
+
+        if not os.path.exists(quantized_file):
+            from optimum.onnxruntime import ORTQuantizer
+            from optimum.onnxruntime.configuration import AutoQuantizationConfig
+
+            print(f"Quantizing ONNX model (dynamic int8): {quantized_file}")
+            quantizer = ORTQuantizer.from_pretrained(export_dir, file_name="model.onnx")
+            qconfig = AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+            quantizer.quantize(save_dir=export_dir, quantization_config=qconfig)
+
+        return quantized_file
+
+    def encode_batch(self, texts: List[str]) -> List[List[float]]:
+        """texts 전체를 한 번의 세션 실행으로 임베딩합니다. (배치 크기는 호출 측에서 결정)"""
+        import numpy as np
+
+        # HuggingFaceEmbeddings와 같은 전처리 (줄바꿈을 공백으로 바꾸어 기준 모델과 같은 입력을 사용)
+        texts = [text.replace("\n", " ") for text in texts]
+        encoded = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_length,
+            return_tensors="np"
+        )
+        inputs = {k: v.astype(np.int64) for k, v in encoded.items() if k in self.input_names}
+        token_embeddings = self.session.run(None, inputs)[0]
+
+        # sentence-transformers와 동일한 mean pooling
+        mask = encoded["attention_mask"][..., None].astype(np.float32)
+        summed = (token_embeddings * mask).sum(axis=1)
+        counts = np.clip(mask.sum(axis=1), 1e-9, None)
+        return (summed / counts).tolist()
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        embeddings = []
+        for start in range(0, len(texts), self.batch_size):
+            embeddings.extend(self.encode_batch(texts[start:start + self.batch_size]))
+        return embeddings
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._encode(list(texts))
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode([text])[0]
+
+
+def create_embedding_model(backend: str = None):
+    """설정된 백엔드(torch | onnx)에 맞는 임베딩 모델을 생성합니다."""
+    backend = (backend or settings.EMBEDDING_BACKEND).lower()
+    if backend == "onnx":
+        return OnnxEmbeddings(
+            model_name=settings.EMBEDDING_MODEL,
+            model_dir=settings.ONNX_MODEL_DIR,
+            quantize=settings.ONNX_QUANTIZE,
+            intra_op_threads=settings.EMBEDDING_INTRA_OP_THREADS,
+            inter_op_threads=settings.EMBEDDING_INTER_OP_THREADS
+        )
+    if backend == "torch":
+        configure_threads(settings.EMBEDDING_INTRA_OP_THREADS, settings.EMBEDDING_INTER_OP_THREADS)
+        return HuggingFaceEmbeddings(model_name=settings.EMBEDDING_MODEL)
+    raise ValueError(f"Unsupported embedding backend: {backend}")
+
+
+@lru_cache(maxsize=None)
+def get_embedding_model():
+    """
+    프로세스 전체에서 공유하는 임베딩 모델을 반환합니다.
+    EMBEDDING_SERVER_SOCKET이 설정되어 있으면 모델을 로드하지 않고 공유 임베딩 워커의 클라이언트를 반환합니다.
+    """
+    if settings.EMBEDDING_SERVER_SOCKET:
+        return EmbeddingClient(settings.EMBEDDING_SERVER_SOCKET)
+    return create_embedding_model()
+
+
+def embedding_model_key() -> str:
+    """캐시 키에 사용할 모델 식별자 (백엔드/양자화에 따라 벡터가 달라지므로 함께 구분)"""
+    backend = settings.EMBEDDING_BACKEND.lower()
+    if backend == "onnx" and settings.ONNX_QUANTIZE:
+        backend = "onnx-int8"
+    return f"{settings.EMBEDDING_MODEL}@{backend}"
+
+
+@lru_cache(maxsize=None)
+def get_embedding_cache():
+    """프로세스 전체에서 공유하는 임베딩 캐시를 반환합니다. (EMBEDDING_CACHE=false이면 None)"""
+    if not settings.EMBEDDING_CACHE:
+        return None
+    return EmbeddingCache(settings.EMBEDDING_CACHE_PATH, max_bytes=settings.EMBEDDING_CACHE_MAX_MB * 2**20)
+
+
+@lru_cache(maxsize=None)
+def get_batched_embedding_model() -> TokenBudgetEmbeddings:
+    """길이순 토큰 예산 배치로 임베딩하는 적재용 모델"""
+    return TokenBudgetEmbeddings(
+        get_embedding_model(),
+        token_budget=settings.EMBEDDING_TOKEN_BUDGET,
+        max_batch=settings.EMBEDDING_MAX_BATCH
+    )
+
+
+@lru_cache(maxsize=None)
+def get_ingest_embedding_model():
+    """문서 적재용 임베딩 모델 (임베딩 캐시 사용 시 캐시에 없는 청크만 토큰 예산 배치로 계산)"""
+    cache = get_embedding_cache()
+    if cache is None:
+        return get_batched_embedding_model()
+    return CachedEmbeddings(get_batched_embedding_model(), cache, embedding_model_key())
 
-model = HuggingFaceEmbeddings(model_name=settings.EMBEDDING_MODEL)
 
 def get_embeddings(texts: List[str]) -> List[float]:
     """
     텍스트 리스트를 입력받아 첫 번째 텍스트의 임베딩 벡터를 반환합니다.
     ChromaDB는 단일 임베딩을 바로 받을 수 있습니다.
     """
-    embeddings = model.embed_documents(texts)
+    embeddings = get_embedding_model().embed_documents(texts)
     return embeddings[0]  # 첫 번째 텍스트의 임베딩만 반환
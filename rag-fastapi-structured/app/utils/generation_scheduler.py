@@ -0,0 +1,133 @@
+import math
+import time
+import heapq
+import asyncio
+import itertools
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+# 우선순위 클래스 (값이 작을수록 먼저 처리)
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+
+
+class GenerationRejected(Exception):
+    """생성 요청이 수락되지 않은 경우 (429: 대기열 가득 참, 503: 대기 시간 초과)"""
+
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class GenerationTicket:
+    """한 번의 생성 요청에 대한 대기 시간과 생성 시간 기록"""
+
+    def __init__(self, priority: str):
+        self.priority = priority
+        self.queue_wait_ms = 0.0
+        self.generation_ms = 0.0
+
+
+class GenerationScheduler:
+    """
+    Ollama 생성 요청의 동시 실행 수를 제한하는 스케줄러.
+    - 동시 실행 수를 넘는 요청은 우선순위 대기열에서 대기 (같은 우선순위는 선입선출)
+    - 대기열이 가득 차면 즉시 429, 대기 기한을 넘기면 503으로 거절
+    - 거절 시 최근 평균 생성 시간으로 Retry-After 값을 추정
+    """
+
+    def __init__(self, concurrency: int, max_queue: int, queue_timeout: float):
+        self.concurrency = max(1, concurrency)
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+
+        self._active = 0
+        self._queued = 0
+        self._waiters = []
+        self._seq = itertools.count()
+
+        self.admitted = 0
+        self.rejected_full = 0
+        self.rejected_timeout = 0
+        self._avg_queue_wait = 0.0
+        self._avg_generation = 0.0
+
+    def retry_after(self) -> int:
+        """현재 대기열이 비워질 때까지의 예상 시간(초)"""
+        estimate = self._avg_generation * (self._queued + 1) / self.concurrency
+        return max(1, math.ceil(estimate))
+
+    def check_admission(self):
+        """대기열이 가득 찼으면 즉시 거절합니다. (스트리밍 응답 시작 전 확인용)"""
+        if self._active >= self.concurrency and self._queued >= self.max_queue:
+            self.rejected_full += 1
+            raise GenerationRejected(429, "Generation queue is full", self.retry_after())
+
+    async def _acquire(self, priority: str, timeout: Optional[float]):
+        if self._active < self.concurrency and not self._queued:
+            self._active += 1
+            return
+
+        self.check_admission()
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (PRIORITIES.get(priority, PRIORITIES["normal"]), next(self._seq), future))
+        self._queued += 1
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self._queued -= 1
+            self.rejected_timeout += 1
+            raise GenerationRejected(503, "Timed out waiting for a generation slot", self.retry_after())
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # 슬롯을 받은 직후 취소된 경우 다음 대기자에게 넘김
+                self._release()
+            else:
+                self._queued -= 1
+            raise
+
+    def _release(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue  # 시간 초과 또는 취소된 대기자
+            self._queued -= 1
+            future.set_result(None)  # 슬롯을 그대로 다음 대기자에게 넘김
+            return
+        self._active -= 1
+
+    @asynccontextmanager
+    async def slot(self, priority: str = "normal", timeout: Optional[float] = None) -> AsyncIterator[GenerationTicket]:
+        """생성 슬롯을 확보한 동안 실행할 컨텍스트를 제공합니다."""
+        ticket = GenerationTicket(priority)
+        wait_start = time.perf_counter()
+        await self._acquire(priority, self.queue_timeout if timeout is None else timeout)
+        ticket.queue_wait_ms = (time.perf_counter() - wait_start) * 1000
+        self.admitted += 1
+        self._avg_queue_wait = self._ema(self._avg_queue_wait, ticket.queue_wait_ms / 1000)
+
+        generation_start = time.perf_counter()
+        try:
+            yield ticket
+        finally:
+            ticket.generation_ms = (time.perf_counter() - generation_start) * 1000
+            self._avg_generation = self._ema(self._avg_generation, ticket.generation_ms / 1000)
+            self._release()
+
+    def _ema(self, average: float, value: float, alpha: float = 0.2) -> float:
+        return value if self.admitted <= 1 else average + alpha * (value - average)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "concurrency": self.concurrency,
+            "active": self._active,
+            "queued": self._queued,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected_full": self.rejected_full,
+            "rejected_timeout": self.rejected_timeout,
+            "avg_queue_wait_ms": round(self._avg_queue_wait * 1000, 1),
+            "avg_generation_ms": round(self._avg_generation * 1000, 1)
+        }
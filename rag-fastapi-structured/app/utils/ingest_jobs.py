@@ -0,0 +1,147 @@
+"""
+업로드 문서 적재 작업 관리
+
+rag-fastapi-simple/app/ingest_jobs.py 와 동일한 내용을 유지합니다.
+- 업로드 수신이 끝난 문서를 작업 ID로 등록하고 제한된 수의 워커 스레드에서 임베딩/저장
+- 진행 중인 작업 수가 max_pending 을 넘으면 업로드를 받기 전에 거절 (429)
+- 완료/실패한 작업은 최근 keep_finished 개까지만 상태 조회용으로 보관
+"""
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+FINISHED_STATUSES = ("completed", "failed")
+
+
+class JobQueueFull(Exception):
+    def __init__(self, pending: int, retry_after: int = 10):
+        super().__init__(f"Too many ingest jobs in progress ({pending})")
+        self.pending = pending
+        self.retry_after = retry_after
+
+
+class IngestJob:
+    """
+    업로드 문서 하나의 적재 상태
+    status: uploading(수신 중) -> queued(대기) -> running(임베딩/저장 중) -> completed | failed
+    """
+
+    def __init__(self, collection_name: Optional[str] = None, replace: bool = False):
+        self.job_id = uuid.uuid4().hex
+        self.collection_name = collection_name
+        self.replace = replace
+        self.file_name: Optional[str] = None
+        self.status = "uploading"
+        self.bytes_received = 0
+        self.chunks_total: Optional[int] = None
+        self.chunks_processed = 0
+        self.error: Optional[str] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def advance(self, count: int):
+        """저장을 마친 청크 수를 더합니다. (워커 스레드에서 호출)"""
+        self.chunks_processed += count
+
+    def to_dict(self) -> Dict[str, Any]:
+        progress = None
+        if self.status == "completed":
+            progress = 1.0
+        elif self.chunks_total:
+            progress = round(min(self.chunks_processed / self.chunks_total, 1.0), 4)
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "file_name": self.file_name,
+            "collection_name": self.collection_name,
+            "replace": self.replace,
+            "bytes_received": self.bytes_received,
+            "chunks_total": self.chunks_total,
+            "chunks_processed": self.chunks_processed,
+            "progress": progress,
+            "error": self.error,
+            "result": self.result,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at
+        }
+
+
+class IngestJobManager:
+    def __init__(self, workers: int = 2, max_pending: int = 16, keep_finished: int = 100):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.keep_finished = keep_finished
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest")
+        self._jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, collection_name: Optional[str] = None, replace: bool = False) -> IngestJob:
+        """새 작업을 등록합니다. 진행 중인 작업이 너무 많으면 JobQueueFull을 발생시킵니다."""
+        with self._lock:
+            pending = sum(1 for job in self._jobs.values() if job.status not in FINISHED_STATUSES)
+            if pending >= self.max_pending:
+                raise JobQueueFull(pending)
+            job = IngestJob(collection_name, replace)
+            self._jobs[job.job_id] = job
+            return job
+
+    def submit(self, job: IngestJob, fn: Callable[[IngestJob], Any]):
+        """
+        수신이 끝난 작업을 워커 풀에 넣습니다.
+        fn(job)은 진행 상황을 job에 기록하고, 반환값(dict)은 작업 결과(result)로 보관됩니다.
+        """
+        job.status = "queued"
+        self._executor.submit(self._run, job, fn)
+
+    def _run(self, job: IngestJob, fn: Callable[[IngestJob], Any]):
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            result = fn(job)
+        except Exception as e:
+            self.fail(job, str(e))
+            return
+        # 상태 조회가 completed 와 함께 항상 결과/완료 시각을 보도록 상태를 마지막에 변경
+        job.result = result
+        job.finished_at = time.time()
+        job.status = "completed"
+        print(f"✅ Ingest job {job.job_id} completed: {job.file_name} -> {job.collection_name} "
+              f"({job.chunks_processed} chunks, {job.finished_at - job.started_at:.2f}s)")
+        self._prune()
+
+    def fail(self, job: IngestJob, error: str):
+        job.error = error
+        job.finished_at = time.time()
+        job.status = "failed"
+        print(f"❌ Ingest job {job.job_id} failed: {error}")
+        self._prune()
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        return self._jobs.get(job_id)
+
+    def list(self) -> List[IngestJob]:
+        """작업 목록을 최신순으로 반환합니다."""
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def _prune(self):
+        with self._lock:
+            finished = [job_id for job_id, job in self._jobs.items() if job.status in FINISHED_STATUSES]
+            for job_id in finished[:max(len(finished) - self.keep_finished, 0)]:
+                del self._jobs[job_id]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = {status: 0 for status in ("uploading", "queued", "running") + FINISHED_STATUSES}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+        return {"workers": self.workers, "max_pending": self.max_pending, **counts}
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
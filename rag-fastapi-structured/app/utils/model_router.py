@@ -0,0 +1,117 @@
+"""
+질의 난이도/지연 예산에 따른 생성 모델 선택
+
+MODEL_TIERS 에 빠른(작은) 모델부터 큰 모델 순서로 Ollama 모델을 나열하면
+- 짧은 질의, 짧은 컨텍스트, 확실한 검색 결과(top-1 거리가 작음)는 작은 모델로
+- 조건을 만족하지 못하는 항목이 많을수록 큰 모델로
+- 요청에 latency_budget_ms 가 있으면 관측된 평균 생성 시간이 예산 안에 드는 모델 중 가장 큰 모델 이하로
+보냅니다. 선택한 모델이 시간 초과/오류로 실패하면 가까운 다른 모델(작은 모델 우선)로 다시 시도합니다.
+"""
+import math
+import threading
+from typing import Any, Dict, List, Optional
+
+# 평균 생성 시간(EWMA) 갱신 비율
+_EWMA_ALPHA = 0.2
+
+
+class RouteDecision:
+    """한 요청의 모델 선택 결과 (시도 순서대로 정렬된 후보 모델)"""
+
+    def __init__(self, candidates: List[str], reason: str, first_timeout: Optional[float],
+                 timeout: Optional[float]):
+        self.candidates = candidates
+        self.reason = reason
+        self.first_timeout = first_timeout  # 첫 번째 모델의 제한 시간(초)
+        self.timeout = timeout              # 대체 모델의 제한 시간(초)
+
+    def timeout_for(self, attempt: int) -> Optional[float]:
+        return self.first_timeout if attempt == 0 else self.timeout
+
+
+class ModelRouter:
+    def __init__(self, models: List[str], short_query_chars: int = 30, short_context_chars: int = 1200,
+                 confident_distance: float = 0.5, timeout: Optional[float] = 60.0):
+        self.models = list(dict.fromkeys(models))
+        self.short_query_chars = short_query_chars
+        self.short_context_chars = short_context_chars
+        self.confident_distance = confident_distance
+        self.timeout = timeout if self.enabled else None
+        self._lock = threading.Lock()
+        self._stats = {
+            model: {"served": 0, "routed": 0, "timeouts": 0, "errors": 0, "ewma_ms": None}
+            for model in self.models
+        }
+        self.fallbacks = 0
+
+    @property
+    def enabled(self) -> bool:
+        return len(self.models) > 1
+
+    def choose(self, query: str, context_chars: int, top_distance: Optional[float] = None,
+               latency_budget_ms: Optional[int] = None) -> RouteDecision:
+        """질의/컨텍스트 길이, 검색 확신도, 지연 예산으로 모델과 대체 순서를 정합니다."""
+        if not self.enabled:
+            return RouteDecision(self.models, "single", None, None)
+
+        # 어려운 질의 신호 수 (확신도를 알 수 없으면 신호로 보지 않음)
+        signals = []
+        if len(query) > self.short_query_chars:
+            signals.append("long_query")
+        if context_chars > self.short_context_chars:
+            signals.append("long_context")
+        if top_distance is not None and top_distance > self.confident_distance:
+            signals.append("low_confidence")
+        last = len(self.models) - 1
+        tier = min(last, math.ceil(len(signals) * last / 3))
+        reason = ",".join(signals) or "simple"
+
+        if latency_budget_ms is not None:
+            budget_tier = self._budget_tier(latency_budget_ms)
+            if budget_tier < tier:
+                tier = budget_tier
+                reason += f",budget<={latency_budget_ms}ms"
+
+        # 선택한 모델과 가까운 순서, 같은 거리면 작은(빠른) 모델 우선으로 대체 순서 결정
+        order = sorted(range(len(self.models)), key=lambda i: (abs(i - tier), i))
+        first_timeout = self.timeout
+        if latency_budget_ms is not None:
+            first_timeout = min(self.timeout or math.inf, latency_budget_ms / 1000)
+        with self._lock:
+            self._stats[self.models[tier]]["routed"] += 1
+        return RouteDecision([self.models[i] for i in order], reason, first_timeout, self.timeout)
+
+    def _budget_tier(self, latency_budget_ms: int) -> int:
+        """관측된 평균 생성 시간이 예산 안에 드는 가장 큰 모델 (관측 기록이 없으면 가장 작은 모델만 허용)"""
+        with self._lock:
+            fitting = [
+                i for i, model in enumerate(self.models)
+                if self._stats[model]["ewma_ms"] is not None and self._stats[model]["ewma_ms"] <= latency_budget_ms
+            ]
+        return max(fitting, default=0)
+
+    def record_success(self, model: str, elapsed_ms: float, attempt: int):
+        with self._lock:
+            stats = self._stats.setdefault(model, {"served": 0, "routed": 0, "timeouts": 0, "errors": 0, "ewma_ms": None})
+            stats["served"] += 1
+            stats["ewma_ms"] = elapsed_ms if stats["ewma_ms"] is None else (
+                (1 - _EWMA_ALPHA) * stats["ewma_ms"] + _EWMA_ALPHA * elapsed_ms
+            )
+            if attempt:
+                self.fallbacks += 1
+
+    def record_failure(self, model: str, timed_out: bool):
+        with self._lock:
+            stats = self._stats.setdefault(model, {"served": 0, "routed": 0, "timeouts": 0, "errors": 0, "ewma_ms": None})
+            stats["timeouts" if timed_out else "errors"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "fallbacks": self.fallbacks,
+                "models": {
+                    model: {**stats, "ewma_ms": round(stats["ewma_ms"], 1) if stats["ewma_ms"] is not None else None}
+                    for model, stats in self._stats.items()
+                }
+            }
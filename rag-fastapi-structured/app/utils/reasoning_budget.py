@@ -0,0 +1,146 @@
+"""
+추론 모델(deepseek-r1)의 think 단계 토큰 예산 관리
+
+rag-fastapi-simple/app/reasoning_budget.py 와 동일한 내용을 유지합니다.
+- Ollama 생성 옵션(num_predict, num_ctx, stop, think) 요청 필드 구성
+- 스트림 객체를 think 단계와 답변 단계로 구분하여 토큰 수 집계
+  (응답 본문의 <think>...</think> 태그와 think 옵션 사용 시의 'thinking' 필드 모두 지원)
+- think 단계가 예산을 넘으면 ThinkBudgetExceeded 를 발생시켜 호출 측이 스트림을 닫도록 함
+- 예산 초과로 중단했거나 think를 끈 생성에서 절약한 토큰 수 추정
+Ollama 스트림은 객체 하나에 토큰 하나를 담으므로 객체 수를 토큰 수로 사용합니다.
+"""
+import threading
+from typing import Any, Dict, List, Optional
+
+THINK_OPEN = "<think>"
+THINK_CLOSE = "</think>"
+
+# think 단계 예산 초과 시 처리 방식
+#   cut   : think 단계를 끊고 think 없이 답변만 다시 생성
+#   abort : 생성을 중단하고 빈 응답 반환
+BUDGET_MODES = ("cut", "abort")
+
+
+def build_generation_fields(num_predict: int = 0, num_ctx: int = 0,
+                            stop: Optional[List[str]] = None,
+                            think: Optional[bool] = None) -> Dict[str, Any]:
+    """Ollama /api/generate 요청에 추가할 필드를 만듭니다. (0/None 값은 Ollama 기본값 사용)"""
+    fields: Dict[str, Any] = {}
+    options: Dict[str, Any] = {}
+    if num_predict:
+        options["num_predict"] = num_predict
+    if num_ctx:
+        options["num_ctx"] = num_ctx
+    if stop:
+        options["stop"] = list(stop)
+    if options:
+        fields["options"] = options
+    if think is not None:
+        fields["think"] = think
+    return fields
+
+
+class ThinkBudgetExceeded(Exception):
+    def __init__(self, think_tokens: int, budget: int):
+        super().__init__(f"Think budget exceeded: {think_tokens} > {budget} tokens")
+        self.think_tokens = think_tokens
+        self.budget = budget
+
+
+class ThinkTracker:
+    """Ollama 스트림 객체를 순서대로 받아 think/답변 토큰 수를 셉니다."""
+
+    def __init__(self, budget: int = 0):
+        self.budget = budget
+        self.think_tokens = 0
+        self.answer_tokens = 0
+        self.in_think = False      # 응답 본문의 <think> 블록 안인지 여부
+        self.think_closed = False  # think 단계가 스스로 끝났는지 여부
+        self._tail = ""            # 청크 경계에 걸친 태그 검사용
+
+    def observe(self, obj: Dict[str, Any]):
+        """스트림 객체 하나를 집계하고, think 토큰이 예산을 넘으면 ThinkBudgetExceeded를 발생시킵니다."""
+        is_think = False
+
+        if obj.get("thinking"):
+            # think 옵션 사용 시 별도 필드로 전달되는 추론 토큰
+            is_think = True
+
+        text = obj.get("response")
+        if text:
+            window = self._tail + text
+            was_in_think = self.in_think
+            if not self.in_think and not self.think_closed and THINK_OPEN in window:
+                self.in_think = True
+                window = window[window.index(THINK_OPEN) + len(THINK_OPEN):]
+            if self.in_think and THINK_CLOSE in window:
+                self.in_think = False
+                self.think_closed = True
+                window = window[window.index(THINK_CLOSE) + len(THINK_CLOSE):]
+            self._tail = window[-(len(THINK_CLOSE) - 1):]
+
+            if self.in_think or was_in_think:
+                is_think = True
+            else:
+                if self.think_tokens:
+                    self.think_closed = True
+                self.answer_tokens += 1
+
+        if is_think:
+            self.think_tokens += 1
+            if self.budget and self.think_tokens > self.budget and not self.think_closed:
+                raise ThinkBudgetExceeded(self.think_tokens, self.budget)
+
+
+class ReasoningStats:
+    """think 토큰 사용량과 예산/비활성화로 절약한 토큰 수(추정)를 집계합니다."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.generations = 0
+        self.think_tokens = 0          # 생성 후 버려진 think 토큰 합계
+        self.answer_tokens = 0
+        self.budget_cutoffs = 0
+        self.think_disabled = 0
+        self.tokens_saved_estimate = 0.0
+        self._natural_thinks = 0       # 예산 안에서 스스로 끝난 think 단계 수
+        self._natural_think_tokens = 0
+
+    def record(self, tracker: ThinkTracker, outcome: str):
+        """
+        생성 하나의 결과를 기록합니다.
+        outcome: natural(제한 없이 완료) | cutoff(예산 초과로 중단) | disabled(think 비활성화) | retry(중단 후 재생성)
+        절약한 토큰 수는 제한 없이 완료된 think 단계의 평균 길이를 기준으로 추정합니다.
+        """
+        with self._lock:
+            if outcome != "retry":
+                self.generations += 1
+            self.think_tokens += tracker.think_tokens
+            self.answer_tokens += tracker.answer_tokens
+
+            if outcome == "natural" and tracker.think_tokens:
+                self._natural_thinks += 1
+                self._natural_think_tokens += tracker.think_tokens
+            elif outcome in ("cutoff", "disabled"):
+                if outcome == "cutoff":
+                    self.budget_cutoffs += 1
+                else:
+                    self.think_disabled += 1
+                self.tokens_saved_estimate += max(self._average_think() - tracker.think_tokens, 0.0)
+
+    def _average_think(self) -> float:
+        if not self._natural_thinks:
+            return 0.0
+        return self._natural_think_tokens / self._natural_thinks
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "generations": self.generations,
+                "think_tokens": self.think_tokens,
+                "answer_tokens": self.answer_tokens,
+                "avg_think_tokens": round(self._average_think(), 1),
+                "budget_cutoffs": self.budget_cutoffs,
+                "think_disabled": self.think_disabled,
+                "tokens_saved_estimate": round(self.tokens_saved_estimate)
+            }
@@ -0,0 +1,272 @@
+"""
+Ollama 응답 스트림 정규화 모듈
+
+rag-fastapi-simple/app/response_normalizer.py 와 동일한 내용을 유지합니다.
+- NDJSON(또는 연결된 JSON) 청크를 raw_decode 기반으로 증분 파싱
+- <think> 블록 제거, '[' 헤더 제거, 번호 항목 포맷 정리를 한 번의 순회로 처리
+- 전체 응답을 모아 반환(buffered)하거나 완성된 줄 단위로 바로 출력(streaming)
+"""
+import re
+import json
+import codecs
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, Iterator, List, Union
+
+THINK_OPEN = "<think>"
+THINK_CLOSE = "</think>"
+
+_WHITESPACE = re.compile(r"\s*")
+
+
+class JSONStreamParser:
+    """
+    청크 단위로 들어오는 JSON 객체 스트림을 증분 파싱합니다.
+    - 줄바꿈 구분(NDJSON)과 '}{' 형태로 연결된 객체를 모두 처리
+    - 아직 완성되지 않은 객체만 버퍼에 남기므로 전체 처리 시간은 입력 길이에 선형
+    - bytes 청크는 UTF-8 증분 디코딩 (멀티바이트 문자가 청크 경계에 걸쳐도 안전)
+    """
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._utf8 = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._buffer = ""
+
+    def feed(self, chunk: Union[str, bytes]) -> List[Dict[str, Any]]:
+        """청크를 추가하고 새로 완성된 JSON 객체 목록을 반환합니다."""
+        if isinstance(chunk, bytes):
+            chunk = self._utf8.decode(chunk)
+        if not chunk:
+            return []
+        self._buffer += chunk
+        return self._drain(final=False)
+
+    def close(self) -> List[Dict[str, Any]]:
+        """남은 버퍼를 처리하고 파서를 종료합니다."""
+        self._buffer += self._utf8.decode(b"", final=True)
+        return self._drain(final=True)
+
+    def _drain(self, final: bool) -> List[Dict[str, Any]]:
+        objects = []
+        buffer = self._buffer
+        pos = 0
+        while True:
+            pos = _WHITESPACE.match(buffer, pos).end()
+            if pos >= len(buffer):
+                break
+            try:
+                obj, pos = self._decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # JSON 문자열에는 개행이 포함될 수 없으므로 개행이 있으면 깨진 줄로 보고 건너뜀
+                newline = buffer.find("\n", pos)
+                if newline != -1:
+                    pos = newline + 1
+                    continue
+                if final:
+                    pos = len(buffer)
+                break  # 불완전한 객체: 다음 청크 대기
+            if isinstance(obj, dict):
+                objects.append(obj)
+        self._buffer = buffer[pos:]
+        return objects
+
+
+def iter_json_objects(chunks: Iterable[Union[str, bytes]]) -> Iterator[Dict[str, Any]]:
+    """청크 이터러블에서 JSON 객체를 순서대로 반환합니다."""
+    parser = JSONStreamParser()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    yield from parser.close()
+
+
+def iter_response_text(chunks: Iterable[Union[str, bytes]]) -> Iterator[str]:
+    """Ollama /api/generate 스트림에서 'response' 필드만 추출합니다."""
+    for obj in iter_json_objects(chunks):
+        if obj.get("response"):
+            yield obj["response"]
+
+
+async def aiter_json_objects(chunks: AsyncIterable[Union[str, bytes]]) -> AsyncIterator[Dict[str, Any]]:
+    """iter_json_objects의 비동기 버전"""
+    parser = JSONStreamParser()
+    async for chunk in chunks:
+        for obj in parser.feed(chunk):
+            yield obj
+    for obj in parser.close():
+        yield obj
+
+
+async def aiter_response_text(chunks: AsyncIterable[Union[str, bytes]]) -> AsyncIterator[str]:
+    """iter_response_text의 비동기 버전"""
+    async for obj in aiter_json_objects(chunks):
+        if obj.get("response"):
+            yield obj["response"]
+
+
+def _is_numbered(line: str) -> bool:
+    """번호 항목(1. 2. 또는 1) 2) 형식)으로 시작하는 줄인지 확인합니다."""
+    if len(line) < 2 or not line[0].isdigit():
+        return False
+    return line[1] == "." or (line[1] == ")" and line[0] != "0")
+
+
+class ResponseNormalizer:
+    """
+    LLM 응답 텍스트 조각을 한 번의 순회로 정리합니다.
+    - <think>...</think> 블록 제거 (닫히지 않은 블록은 본문으로 유지)
+    - 응답에 '[' 가 있으면 마지막 ']' 이후 텍스트만 유지 (답변 형식 헤더 제거)
+    - 빈 줄 제거, 번호 항목 앞에는 빈 줄 추가
+
+    streaming=True 이면 feed()가 완성된 줄을 바로 반환합니다.
+    이미 반환한 줄은 되돌릴 수 없으므로 헤더 제거는 아직 반환하지 않은 줄에만 적용됩니다.
+    """
+
+    def __init__(self, streaming: bool = False):
+        self.streaming = streaming
+        self._carry = ""          # 청크 경계에 걸친 태그 조각
+        self._in_think = False
+        self._think: List[str] = []
+        self._lines: List[str] = []    # 아직 출력하지 않은 완성된 줄
+        self._partial: List[str] = []  # 진행 중인 줄
+        self._partial_len = 0
+        self._seen_open = False
+        self._cut = None          # 마지막 ']' 위치 (줄 인덱스, 열)
+        self._started = False
+
+    def feed(self, text: str) -> str:
+        """텍스트 조각을 추가하고, streaming 모드이면 새로 완성된 출력을 반환합니다."""
+        data = self._carry + text
+        self._carry = ""
+        pos = 0
+        while pos < len(data):
+            idx, tag = self._find_tag(data, pos)
+            if idx == -1:
+                keep = self._partial_tag_length(data, pos)
+                self._consume(data[pos:len(data) - keep])
+                self._carry = data[len(data) - keep:]
+                break
+            self._consume(data[pos:idx])
+            if tag == THINK_OPEN:
+                if self._in_think:
+                    # 닫히지 않은 think 블록은 본문으로 취급
+                    self._push_text("".join(self._think))
+                self._in_think = True
+            else:
+                self._in_think = False
+            self._think = []
+            pos = idx + len(tag)
+        return self._flush(final=False) if self.streaming else ""
+
+    def finish(self) -> str:
+        """입력을 종료하고 남은 출력을 반환합니다. (buffered 모드에서는 전체 응답)"""
+        self._consume(self._carry)
+        self._carry = ""
+        if self._in_think:
+            self._in_think = False
+            self._push_text("".join(self._think))
+            self._think = []
+        return self._flush(final=True)
+
+    def _find_tag(self, data: str, pos: int):
+        open_idx = data.find(THINK_OPEN, pos)
+        if not self._in_think:
+            return open_idx, THINK_OPEN
+        close_idx = data.find(THINK_CLOSE, pos)
+        if close_idx != -1 and (open_idx == -1 or close_idx < open_idx):
+            return close_idx, THINK_CLOSE
+        return open_idx, THINK_OPEN
+
+    def _partial_tag_length(self, data: str, pos: int) -> int:
+        tags = (THINK_OPEN, THINK_CLOSE) if self._in_think else (THINK_OPEN,)
+        for length in range(min(len(THINK_CLOSE) - 1, len(data) - pos), 0, -1):
+            suffix = data[len(data) - length:]
+            if any(tag.startswith(suffix) for tag in tags):
+                return length
+        return 0
+
+    def _consume(self, text: str):
+        if not text:
+            return
+        if self._in_think:
+            self._think.append(text)
+        else:
+            self._push_text(text)
+
+    def _push_text(self, text: str):
+        if not self._seen_open and "[" in text:
+            self._seen_open = True
+        start = 0
+        while True:
+            newline = text.find("\n", start)
+            segment = text[start:] if newline == -1 else text[start:newline]
+            close = segment.rfind("]")
+            if close != -1:
+                self._cut = (len(self._lines), self._partial_len + close + 1)
+            self._partial.append(segment)
+            self._partial_len += len(segment)
+            if newline == -1:
+                break
+            self._lines.append("".join(self._partial))
+            self._partial = []
+            self._partial_len = 0
+            start = newline + 1
+
+    def _flush(self, final: bool) -> str:
+        lines = self._lines
+        self._lines = []
+        if final:
+            lines.append("".join(self._partial))
+            self._partial = []
+            self._partial_len = 0
+
+        if self._cut is not None:
+            line_idx, col = self._cut
+            if line_idx < len(lines):
+                if self._seen_open:
+                    lines = [lines[line_idx][col:]] + lines[line_idx + 1:]
+                self._cut = None
+            else:
+                # 헤더가 진행 중인 줄에 있으면 그 이전 줄은 모두 헤더 영역
+                if self._seen_open:
+                    lines = []
+                self._cut = (0, col)
+
+        out = []
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            if self._started:
+                out.append("\n\n" if _is_numbered(line) else "\n")
+            self._started = True
+            out.append(line)
+        return "".join(out)
+
+
+def normalize_response(text: str) -> str:
+    """전체 응답 텍스트를 정리합니다."""
+    normalizer = ResponseNormalizer()
+    normalizer.feed(text)
+    return normalizer.finish()
+
+
+def normalize_stream(tokens: Iterable[str]) -> Iterator[str]:
+    """응답 텍스트 조각을 받아 정리된 출력을 완성된 줄 단위로 반환합니다."""
+    normalizer = ResponseNormalizer(streaming=True)
+    for token in tokens:
+        piece = normalizer.feed(token)
+        if piece:
+            yield piece
+    piece = normalizer.finish()
+    if piece:
+        yield piece
+
+
+async def anormalize_stream(tokens: AsyncIterable[str]) -> AsyncIterator[str]:
+    """normalize_stream의 비동기 버전"""
+    normalizer = ResponseNormalizer(streaming=True)
+    async for token in tokens:
+        piece = normalizer.feed(token)
+        if piece:
+            yield piece
+    piece = normalizer.finish()
+    if piece:
+        yield piece
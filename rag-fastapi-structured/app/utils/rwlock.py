@@ -0,0 +1,44 @@
+import threading
+from contextlib import contextmanager
+
+
+class ReadWriteLock:
+    """
+    여러 읽기 작업은 동시에 허용하고, 쓰기 작업은 단독으로 실행되도록 보장합니다.
+    쓰기 대기 중에는 새 읽기를 막아 쓰기가 굶지 않도록 합니다.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writer or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            self._waiting_writers += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._waiting_writers -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
@@ -0,0 +1,376 @@
+"""
+여러 Chroma 저장소에 콜렉션을 나누어 저장하는 샤딩 계층
+
+CHROMA_SHARDS 에 저장소(로컬 경로 또는 http://host:port Chroma 서버)를 나열하면
+ShardedClient 가 chromadb 클라이언트와 같은 인터페이스로 VectorStore 아래에서 동작합니다.
+- 일반 콜렉션: 콜렉션 이름으로 한 샤드에 통째로 배치 (콜렉션 단위 분산)
+- CHROMA_PARTITIONED_COLLECTIONS 의 대형 콜렉션: 청크 ID 해시로 모든 샤드에 나누어 저장하고,
+  검색은 모든 샤드에 병렬로 요청한 뒤 거리순으로 top-k 를 합침
+배치는 rendezvous 해싱(샤드별 점수가 가장 높은 샤드 선택)으로 정하므로 샤드를 추가/제거해도
+해당 샤드의 몫만 이동하며, 이동은 rebalance()(scripts.rebalance_shards)로 수행합니다.
+교체용 임시 콜렉션(이름에 STAGING_MARKER 포함)은 원래 콜렉션과 같은 위치에 배치되어 이름 변경 후에도 위치가 유지됩니다.
+"""
+import hashlib
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional
+
+# vector_store.STAGING_MARKER 와 동일 (순환 import 방지)
+_STAGING_MARKER = "__staging_"
+
+# get/query 결과에서 항목별 목록으로 합칠 키
+_RESULT_KEYS = ("ids", "embeddings", "documents", "metadatas", "distances")
+
+
+def create_store_client(spec: str):
+    """샤드 설정 한 항목으로 Chroma 클라이언트를 만듭니다. (http(s)://host:port 또는 로컬 경로)"""
+    import chromadb
+    from chromadb.config import Settings as ChromaSettings
+
+    if spec.startswith(("http://", "https://")):
+        url = urlparse(spec)
+        return chromadb.HttpClient(
+            host=url.hostname,
+            port=url.port or (443 if url.scheme == "https" else 8000),
+            ssl=url.scheme == "https",
+            settings=ChromaSettings(anonymized_telemetry=False)
+        )
+    return chromadb.PersistentClient(path=spec)
+
+
+def _score(spec: str, key: str) -> int:
+    digest = hashlib.blake2b(f"{spec}\x00{key}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def _base_name(collection_name: str) -> str:
+    return collection_name.split(_STAGING_MARKER, 1)[0]
+
+
+def _merge_get_results(results: List[Dict[str, Any]], limit: Optional[int] = None) -> Dict[str, Any]:
+    """샤드별 get 결과를 이어 붙입니다. (재배치 중 두 샤드에 있는 ID는 한 번만 포함)"""
+    rows, seen = [], set()
+    for result in results:
+        for position, doc_id in enumerate(result["ids"]):
+            if doc_id not in seen:
+                seen.add(doc_id)
+                rows.append((result, position))
+    if limit is not None:
+        rows = rows[:limit]
+
+    merged: Dict[str, Any] = {}
+    for key in _RESULT_KEYS:
+        if any(result.get(key) is None for result in results) or not results:
+            merged[key] = [] if key == "ids" else None
+            continue
+        merged[key] = [result[key][position] for result, position in rows]
+    return merged
+
+
+class ShardedCollection:
+    """청크 ID 해시로 여러 샤드에 나누어 저장된 콜렉션 (chromadb Collection 과 같은 메서드 제공)"""
+
+    def __init__(self, client: "ShardedClient", name: str, collections: Dict[int, Any],
+                 metadata: Optional[Dict[str, Any]] = None, embedding_function=None):
+        self._client = client
+        self.name = name
+        self._collections = collections  # 샤드 번호 -> 해당 샤드의 Collection (없는 샤드는 쓰기 시 생성)
+        self.metadata = metadata
+        self._embedding_function = embedding_function
+
+    def _on(self, shard: int):
+        if shard not in self._collections:
+            kwargs = {"name": self.name}
+            if self.metadata:
+                kwargs["metadata"] = self.metadata
+            if self._embedding_function is not None:
+                kwargs["embedding_function"] = self._embedding_function
+            self._collections[shard] = self._client.stores[shard].get_or_create_collection(**kwargs)
+        return self._collections[shard]
+
+    def _fan_out(self, fn) -> List[Any]:
+        """콜렉션이 있는 모든 샤드에서 fn(collection)을 병렬 실행합니다. (샤드 번호 순서로 결과 반환)"""
+        shards = sorted(self._collections)
+        return list(self._client.executor.map(lambda shard: fn(self._collections[shard]), shards))
+
+    def _write(self, method: str, ids: List[str], **columns):
+        """ID 별 샤드로 나누어 add/upsert/update 를 실행합니다."""
+        groups: Dict[int, List[int]] = {}
+        for i, doc_id in enumerate(ids):
+            groups.setdefault(self._client.shard_for_record(doc_id), []).append(i)
+
+        def run(shard: int):
+            positions = groups[shard]
+            batch = {
+                key: [value[i] for i in positions]
+                for key, value in columns.items() if value is not None
+            }
+            getattr(self._on(shard), method)(ids=[ids[i] for i in positions], **batch)
+
+        list(self._client.executor.map(run, sorted(groups)))
+
+    def add(self, ids, embeddings=None, metadatas=None, documents=None, **kwargs):
+        self._write("add", list(ids), embeddings=embeddings, metadatas=metadatas, documents=documents)
+
+    def upsert(self, ids, embeddings=None, metadatas=None, documents=None, **kwargs):
+        self._write("upsert", list(ids), embeddings=embeddings, metadatas=metadatas, documents=documents)
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None, **kwargs):
+        ids = list(ids) if ids is not None else None
+        self._fan_out(lambda collection: collection.delete(ids=ids, where=where, **kwargs))
+
+    def count(self) -> int:
+        return sum(self._fan_out(lambda collection: collection.count()))
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None,
+            limit: Optional[int] = None, offset: Optional[int] = None,
+            include: Optional[List[str]] = None, **kwargs) -> Dict[str, Any]:
+        options = dict(where=where, **kwargs)
+        if include is not None:
+            options["include"] = include
+
+        if not offset:
+            # 재배치 전에는 청크가 배치 규칙과 다른 샤드에 있을 수 있으므로 ID 조회도 모든 샤드에 요청
+            ids = list(ids) if ids is not None else None
+            results = self._fan_out(lambda collection: collection.get(ids=ids, limit=limit, **options))
+            return _merge_get_results(results, limit)
+
+        # offset 페이지 조회: 샤드 번호 순서로 이어 붙인 순서 기준 (스냅샷 내보내기 등)
+        results, remaining = [], limit
+        for shard in sorted(self._collections):
+            collection = self._collections[shard]
+            size = collection.count() if where is None else len(collection.get(where=where, include=[])["ids"])
+            if offset >= size:
+                offset -= size
+                continue
+            page = collection.get(ids=ids, limit=remaining, offset=offset, **options)
+            results.append(page)
+            offset = 0
+            if remaining is not None:
+                remaining -= len(page["ids"])
+                if remaining <= 0:
+                    break
+        return _merge_get_results(results, limit)
+
+    def query(self, query_embeddings, n_results: int = 10, where: Optional[Dict[str, Any]] = None,
+              include: Optional[List[str]] = None, **kwargs) -> Dict[str, Any]:
+        """모든 샤드에서 질의별 top-n 을 병렬로 구한 뒤 거리순으로 합쳐 top-n 을 반환합니다."""
+        include = list(include) if include is not None else ["metadatas", "documents", "distances"]
+        requested = set(include)
+        if "distances" not in requested:
+            include.append("distances")  # 병합 기준
+
+        def query_shard(collection):
+            # 빈 샤드는 건너뛰고, 작은 샤드에는 가진 청크 수 이상을 요청하지 않음 (Chroma 버전에 따라 경고/오류)
+            size = collection.count()
+            if size == 0:
+                return None
+            return collection.query(
+                query_embeddings=query_embeddings, n_results=min(n_results, size), where=where,
+                include=include, **kwargs
+            )
+
+        results = [result for result in self._fan_out(query_shard) if result is not None]
+
+        merged: Dict[str, Any] = {key: [] for key in _RESULT_KEYS}
+        for query_index in range(len(query_embeddings)):
+            candidates = []
+            for result in results:
+                ids = result["ids"][query_index] if query_index < len(result["ids"]) else []
+                for position, doc_id in enumerate(ids):
+                    candidates.append((result["distances"][query_index][position], doc_id, result, position))
+            candidates.sort(key=lambda item: item[0])
+
+            # 재배치 중에는 같은 ID가 두 샤드에 있을 수 있으므로 한 번만 사용
+            seen, chosen = set(), []
+            for candidate in candidates:
+                if candidate[1] not in seen:
+                    seen.add(candidate[1])
+                    chosen.append(candidate)
+                if len(chosen) == n_results:
+                    break
+
+            for key in _RESULT_KEYS:
+                if key == "ids":
+                    merged[key].append([doc_id for _, doc_id, _, _ in chosen])
+                elif key in requested:
+                    merged[key].append([result[key][query_index][position] for _, _, result, position in chosen])
+
+        return {key: (value if key == "ids" or key in requested else None) for key, value in merged.items()}
+
+    def modify(self, name: Optional[str] = None, metadata: Optional[Dict[str, Any]] = None, **kwargs):
+        self._fan_out(lambda collection: collection.modify(name=name, metadata=metadata, **kwargs))
+        if name:
+            self.name = name
+        if metadata:
+            self.metadata = metadata
+
+
+class ShardedClient:
+    """여러 Chroma 저장소를 하나의 클라이언트처럼 사용합니다. (VectorStore, 스냅샷, 카탈로그 적재에서 사용하는 메서드 제공)"""
+
+    def __init__(self, shards: List[str], partitioned: Iterable[str] = ()):
+        if not shards:
+            raise ValueError("At least one shard is required")
+        self.shards = list(dict.fromkeys(shards))
+        self.stores = [create_store_client(spec) for spec in self.shards]
+        self.partitioned = set(partitioned)
+        # 동시에 들어온 검색 요청들의 샤드 요청이 서로 기다리지 않도록 샤드 수보다 넉넉하게
+        self.executor = ThreadPoolExecutor(max_workers=len(self.stores) * 4, thread_name_prefix="chroma-shard")
+
+    # 배치 규칙
+    def is_partitioned(self, collection_name: str) -> bool:
+        return _base_name(collection_name) in self.partitioned
+
+    def shard_for_collection(self, collection_name: str) -> int:
+        key = _base_name(collection_name)
+        return max(range(len(self.shards)), key=lambda i: _score(self.shards[i], key))
+
+    def shard_for_record(self, record_id: str) -> int:
+        return max(range(len(self.shards)), key=lambda i: _score(self.shards[i], record_id))
+
+    def _find(self, collection_name: str) -> Dict[int, Any]:
+        """콜렉션이 있는 샤드를 찾습니다. (배치가 바뀐 뒤 재배치 전이면 원래 샤드가 아닐 수 있음)"""
+        def lookup(store):
+            try:
+                return store.get_collection(collection_name)
+            except Exception:
+                return None
+        found = self.executor.map(lookup, self.stores)
+        return {shard: collection for shard, collection in enumerate(found) if collection is not None}
+
+    def _find_single(self, collection_name: str) -> Optional[Any]:
+        """
+        분할하지 않는 콜렉션을 배치 규칙상의 샤드에서 먼저 찾고, 없을 때만 모든 샤드를 조회합니다.
+        (검색마다 호출되므로 재배치 전 상태가 아니면 샤드 한 곳에만 요청)
+        """
+        try:
+            return self.stores[self.shard_for_collection(collection_name)].get_collection(collection_name)
+        except Exception:
+            pass
+        found = self._find(collection_name)
+        return next(iter(found.values())) if found else None
+
+    # chromadb 클라이언트 인터페이스
+    def get_collection(self, name: str, embedding_function=None, **kwargs):
+        if self.is_partitioned(name):
+            found = self._find(name)
+            if not found:
+                raise ValueError(f"Collection {name} does not exist.")
+            first = next(iter(found.values()))
+            return ShardedCollection(self, name, found, first.metadata, embedding_function)
+        collection = self._find_single(name)
+        if collection is None:
+            raise ValueError(f"Collection {name} does not exist.")
+        return collection
+
+    def create_collection(self, name: str, metadata: Optional[Dict[str, Any]] = None,
+                          embedding_function=None, **kwargs):
+        if self._find(name):
+            raise ValueError(f"Collection {name} already exists.")
+        return self.get_or_create_collection(name, metadata=metadata, embedding_function=embedding_function, **kwargs)
+
+    def get_or_create_collection(self, name: str, metadata: Optional[Dict[str, Any]] = None,
+                                 embedding_function=None, **kwargs):
+        if not self.is_partitioned(name):
+            collection = self._find_single(name)
+            if collection is not None:
+                return collection
+            if metadata:
+                kwargs["metadata"] = metadata
+            if embedding_function is not None:
+                kwargs["embedding_function"] = embedding_function
+            return self.stores[self.shard_for_collection(name)].create_collection(name=name, **kwargs)
+
+        found = self._find(name)
+        if found and not metadata:
+            metadata = next(iter(found.values())).metadata
+        collection = ShardedCollection(self, name, found, metadata, embedding_function)
+        # 모든 샤드에 같은 설정으로 생성해 두어 검색이 항상 전체 샤드를 대상으로 함
+        for shard in range(len(self.stores)):
+            collection._on(shard)
+        return collection
+
+    def delete_collection(self, name: str):
+        found = self._find(name)
+        if not found:
+            raise ValueError(f"Collection {name} does not exist.")
+        for shard in found:
+            self.stores[shard].delete_collection(name)
+
+    def list_collections(self) -> List[str]:
+        names = self.executor.map(lambda store: list(store.list_collections()), self.stores)
+        return list(dict.fromkeys(name for shard_names in names for name in shard_names))
+
+    def get_max_batch_size(self) -> int:
+        return min(store.get_max_batch_size() if hasattr(store, "get_max_batch_size") else 5000 for store in self.stores)
+
+    def stats(self) -> Dict[str, Any]:
+        """샤드별 콜렉션 수와 청크 수"""
+        def shard_stats(index: int) -> Dict[str, Any]:
+            store = self.stores[index]
+            names = list(store.list_collections())
+            return {
+                "shard": self.shards[index],
+                "collections": len(names),
+                "records": sum(store.get_collection(name).count() for name in names)
+            }
+        return {
+            "partitioned": sorted(self.partitioned),
+            "shards": list(self.executor.map(shard_stats, range(len(self.stores))))
+        }
+
+    # 재배치
+    def rebalance(self, retired: Iterable[str] = (), batch_size: int = 1000, dry_run: bool = False) -> Dict[str, Any]:
+        """
+        모든 샤드(와 제거할 retired 저장소)의 청크를 현재 배치 규칙에 맞는 샤드로 옮깁니다.
+        대상 샤드에 upsert 한 뒤 원래 샤드에서 삭제하므로 중간에 중단되어도 다시 실행하면 이어서 처리됩니다.
+        옮긴 뒤 비게 된, 배치 대상이 아닌 콜렉션은 삭제합니다.
+        """
+        sources = list(enumerate(self.stores)) + [(None, create_store_client(spec)) for spec in retired]
+        report: Dict[str, Dict[str, int]] = {}
+
+        for source_index, store in sources:
+            for name in list(store.list_collections()):
+                collection = store.get_collection(name)
+                partitioned = self.is_partitioned(name)
+                home = self.shard_for_collection(name)
+
+                # 옮겨야 할 청크를 대상 샤드별로 모음 (ID만 조회)
+                moves: Dict[int, List[str]] = {}
+                for doc_id in collection.get(include=[])["ids"]:
+                    target = self.shard_for_record(doc_id) if partitioned else home
+                    if target != source_index:
+                        moves.setdefault(target, []).append(doc_id)
+
+                moved = sum(len(ids) for ids in moves.values())
+                if moved:
+                    entry = report.setdefault(name, {"moved": 0})
+                    entry["moved"] += moved
+                if dry_run:
+                    continue
+
+                for target, ids in moves.items():
+                    kwargs = {"name": name}
+                    if collection.metadata:
+                        kwargs["metadata"] = collection.metadata
+                    destination = self.stores[target].get_or_create_collection(**kwargs)
+                    for start in range(0, len(ids), batch_size):
+                        batch = collection.get(
+                            ids=ids[start:start + batch_size],
+                            include=["embeddings", "documents", "metadatas"]
+                        )
+                        destination.upsert(
+                            ids=batch["ids"],
+                            embeddings=batch["embeddings"],
+                            documents=batch["documents"],
+                            metadatas=batch["metadatas"]
+                        )
+                        collection.delete(ids=batch["ids"])
+                    print(f"🔀 Moved {len(ids)} chunks of '{name}' to {self.shards[target]}")
+
+                keeps_collection = source_index is not None and (partitioned or source_index == home)
+                if not keeps_collection and collection.count() == 0:
+                    store.delete_collection(name)
+
+        return {"dry_run": dry_run, "collections": report}
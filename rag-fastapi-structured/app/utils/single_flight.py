@@ -0,0 +1,124 @@
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List
+
+
+class _Broadcast:
+    """하나의 비동기 스트림을 여러 구독자에게 처음부터 재생하며 전달합니다."""
+
+    def __init__(self, source: AsyncIterator[Any]):
+        self.items: List[Any] = []
+        self.subscribers = 0
+        self.done = False
+        self.error = None
+        self._changed = asyncio.Event()
+        self.task = asyncio.ensure_future(self._pump(source))
+
+    async def _pump(self, source: AsyncIterator[Any]):
+        try:
+            async for item in source:
+                self.items.append(item)
+                self._notify()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._notify()
+
+    def _notify(self):
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def subscribe(self) -> AsyncIterator[Any]:
+        index = 0
+        while True:
+            changed = self._changed
+            while index < len(self.items):
+                yield self.items[index]
+                index += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await changed.wait()
+
+
+class SingleFlight:
+    """
+    동일한 키의 동시 실행 요청을 하나로 합칩니다. (single-flight)
+    - 먼저 들어온 요청만 실제로 실행하고, 실행 중에 들어온 요청은 같은 결과(또는 스트림)를 공유
+    - 실행이 끝나면 키를 제거하므로 결과를 캐싱하지는 않음
+    - 기다리는 요청이 모두 취소되면 공유 작업도 취소 (참조 카운트)
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self._waiters: Dict[asyncio.Future, int] = {}
+        self._streams: Dict[Hashable, _Broadcast] = {}
+        self.executions = 0
+        self.deduplicated = 0
+        self.cancelled = 0
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """key에 대해 실행 중인 작업이 있으면 그 결과를 기다리고, 없으면 func를 실행합니다."""
+        future = self._calls.get(key)
+        if future is None:
+            future = asyncio.ensure_future(func())
+            self._calls[key] = future
+            future.add_done_callback(lambda f: self._forget(self._calls, key, f))
+            self.executions += 1
+        else:
+            self.deduplicated += 1
+
+        self._waiters[future] = self._waiters.get(future, 0) + 1
+        try:
+            # 한 요청이 취소되어도 같은 작업을 기다리는 다른 요청에는 영향을 주지 않음
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            if self._waiters[future] == 1 and not future.done():
+                # 마지막 대기자가 취소되면 공유 작업도 취소
+                self._forget(self._calls, key, future)
+                future.cancel()
+                self.cancelled += 1
+            raise
+        finally:
+            self._waiters[future] -= 1
+            if not self._waiters[future]:
+                del self._waiters[future]
+
+    async def stream(self, key: Hashable, func: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        """key에 대해 진행 중인 스트림이 있으면 구독하고, 없으면 func로 새 스트림을 시작합니다."""
+        broadcast = self._streams.get(key)
+        if broadcast is None:
+            broadcast = _Broadcast(func())
+            self._streams[key] = broadcast
+            broadcast.task.add_done_callback(lambda _: self._forget(self._streams, key, broadcast))
+            self.executions += 1
+        else:
+            self.deduplicated += 1
+
+        broadcast.subscribers += 1
+        try:
+            async for item in broadcast.subscribe():
+                yield item
+        finally:
+            broadcast.subscribers -= 1
+            if not broadcast.subscribers and not broadcast.done:
+                # 마지막 구독자가 떠나면 스트림 생성도 중단
+                self._forget(self._streams, key, broadcast)
+                broadcast.task.cancel()
+                self.cancelled += 1
+
+    @staticmethod
+    def _forget(registry: Dict[Hashable, Any], key: Hashable, value: Any):
+        if registry.get(key) is value:
+            del registry[key]
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.executions + self.deduplicated
+        return {
+            "in_flight": len(self._calls) + len(self._streams),
+            "executions": self.executions,
+            "deduplicated": self.deduplicated,
+            "cancelled": self.cancelled,
+            "dedup_ratio": round(self.deduplicated / total, 4) if total else 0.0
+        }
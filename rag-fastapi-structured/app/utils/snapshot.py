@@ -0,0 +1,176 @@
+"""
+콜렉션 스냅샷 내보내기/가져오기
+
+스냅샷은 열(column) 단위 파일로 구성된 디렉토리입니다.
+    manifest.json           콜렉션 이름, 개수, 차원, 임베딩 모델
+    embeddings.npy          float32 (count, dim) 행렬
+    ids.bin / ids.idx.npy   UTF-8 문자열 blob + int64 오프셋
+    documents.bin / ...     (동일 형식)
+    metadatas.bin / ...     (JSON 문자열, 동일 형식)
+가져오기는 모든 파일을 memory-map으로 열어 배치 단위로 읽으므로
+임베딩을 다시 계산하지 않고 디스크 속도로 복원합니다.
+"""
+import os
+import json
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+FORMAT_VERSION = 1
+STRING_COLUMNS = ("ids", "documents", "metadatas")
+
+
+class _StringColumnWriter:
+    """문자열 열을 blob 파일에 이어 쓰고 오프셋을 기록합니다."""
+
+    def __init__(self, path: str, name: str):
+        self._blob = open(os.path.join(path, f"{name}.bin"), "wb")
+        self._index_path = os.path.join(path, f"{name}.idx.npy")
+        self._offsets = [0]
+
+    def write(self, values: List[str]):
+        for value in values:
+            data = value.encode("utf-8")
+            self._blob.write(data)
+            self._offsets.append(self._offsets[-1] + len(data))
+
+    def close(self):
+        self._blob.close()
+        np.save(self._index_path, np.asarray(self._offsets, dtype=np.int64))
+
+
+class _StringColumnReader:
+    """memory-map으로 연 문자열 열에서 구간 단위로 값을 읽습니다."""
+
+    def __init__(self, path: str, name: str):
+        blob_path = os.path.join(path, f"{name}.bin")
+        self._offsets = np.load(os.path.join(path, f"{name}.idx.npy"), mmap_mode="r")
+        size = int(self._offsets[-1])
+        self._blob = np.memmap(blob_path, dtype=np.uint8, mode="r") if size else np.zeros(0, dtype=np.uint8)
+
+    def read(self, start: int, stop: int) -> List[str]:
+        offsets = self._offsets[start:stop + 1]
+        data = self._blob[int(offsets[0]):int(offsets[-1])].tobytes()
+        base = int(offsets[0])
+        return [
+            data[int(a) - base:int(b) - base].decode("utf-8")
+            for a, b in zip(offsets[:-1], offsets[1:])
+        ]
+
+
+def _iter_collection(collection, batch_size: int) -> Iterator[Dict[str, Any]]:
+    offset = 0
+    while True:
+        page = collection.get(
+            include=["documents", "metadatas", "embeddings"],
+            limit=batch_size,
+            offset=offset
+        )
+        if not page["ids"]:
+            return
+        yield page
+        offset += len(page["ids"])
+
+
+def export_collection(client, collection_name: str, path: str,
+                      embedding_model: Optional[str] = None, batch_size: int = 1000) -> Dict[str, Any]:
+    """콜렉션의 ID, 문서, 메타데이터, 임베딩을 스냅샷 디렉토리로 내보냅니다."""
+    start = time.perf_counter()
+    collection = client.get_collection(collection_name)
+    count = collection.count()
+    if count == 0:
+        # 열 파일을 만들기 전에 확인하여 빈 스냅샷 디렉토리를 남기지 않음
+        raise ValueError(f"Collection '{collection_name}' is empty")
+    os.makedirs(path, exist_ok=True)
+
+    writers = {name: _StringColumnWriter(path, name) for name in STRING_COLUMNS}
+    embeddings = None
+    written = 0
+    try:
+        for page in _iter_collection(collection, batch_size):
+            # 내보내는 중에 추가된 레코드는 제외 (임베딩 파일은 시작 시점의 count 행으로 미리 할당됨)
+            page = {key: values[:count - written] for key, values in page.items()
+                    if key in ("ids", "documents", "metadatas", "embeddings")}
+            vectors = np.asarray(page["embeddings"], dtype=np.float32)
+            if embeddings is None:
+                embeddings = np.lib.format.open_memmap(
+                    os.path.join(path, "embeddings.npy"),
+                    mode="w+",
+                    dtype=np.float32,
+                    shape=(count, vectors.shape[1])
+                )
+            embeddings[written:written + len(vectors)] = vectors
+            written += len(vectors)
+
+            writers["ids"].write(page["ids"])
+            writers["documents"].write([doc or "" for doc in page["documents"]])
+            writers["metadatas"].write([json.dumps(meta, ensure_ascii=False) for meta in page["metadatas"]])
+            if written >= count:
+                break
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    if embeddings is None:
+        raise ValueError(f"Collection '{collection_name}' was emptied during export")
+    embeddings.flush()
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "collection_name": collection_name,
+        "collection_metadata": collection.metadata,
+        "embedding_model": embedding_model,
+        "count": written,
+        "dim": int(embeddings.shape[1])
+    }
+    with open(os.path.join(path, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    print(f"📦 Exported {written} records from '{collection_name}' in {time.perf_counter() - start:.2f}s")
+    return manifest
+
+
+def read_manifest(path: str) -> Dict[str, Any]:
+    with open(os.path.join(path, "manifest.json"), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot format: {manifest.get('format_version')}")
+    return manifest
+
+
+def import_collection(client, path: str, collection_name: Optional[str] = None,
+                      replace: bool = False, batch_size: int = 5000) -> Dict[str, Any]:
+    """스냅샷을 memory-map으로 열어 임베딩 재계산 없이 콜렉션으로 일괄 적재합니다."""
+    start = time.perf_counter()
+    manifest = read_manifest(path)
+    collection_name = collection_name or manifest["collection_name"]
+
+    embeddings = np.load(os.path.join(path, "embeddings.npy"), mmap_mode="r")
+    readers = {name: _StringColumnReader(path, name) for name in STRING_COLUMNS}
+    count = manifest["count"]
+
+    if replace and collection_name in client.list_collections():
+        client.delete_collection(collection_name)
+    collection = client.get_or_create_collection(
+        name=collection_name,
+        metadata=manifest.get("collection_metadata")
+    )
+
+    # Chroma 서버가 허용하는 최대 배치 크기를 넘지 않도록 조정
+    if hasattr(client, "get_max_batch_size"):
+        batch_size = min(batch_size, client.get_max_batch_size())
+
+    for batch_start in range(0, count, batch_size):
+        batch_stop = min(batch_start + batch_size, count)
+        # 메타데이터가 없는 레코드는 None 그대로 적재 (Chroma는 빈 dict 메타데이터를 거부)
+        metadatas = [json.loads(meta) or None for meta in readers["metadatas"].read(batch_start, batch_stop)]
+        collection.add(
+            ids=readers["ids"].read(batch_start, batch_stop),
+            embeddings=np.ascontiguousarray(embeddings[batch_start:batch_stop]),
+            documents=readers["documents"].read(batch_start, batch_stop),
+            metadatas=metadatas if any(metadatas) else None
+        )
+
+    print(f"📥 Imported {count} records into '{collection_name}' in {time.perf_counter() - start:.2f}s")
+    return {**manifest, "collection_name": collection_name}
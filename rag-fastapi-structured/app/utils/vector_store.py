@@ -1,14 +1,49 @@
 import os
-from typing import List
+import uuid
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
 from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
 from config import settings
+from utils.embeddings import get_embedding_model, get_ingest_embedding_model
+from utils.rwlock import ReadWriteLock
+from utils.near_dedup import DedupStats, NearDuplicateFilter
+from utils.sharded_store import ShardedClient
 
 import logging
 
 # ChromaDB 로깅 레벨 설정
 logging.getLogger('chromadb').setLevel(logging.ERROR)
 
+# 원자적 교체를 위해 임시로 만드는 콜렉션 이름 표식
+STAGING_MARKER = "__staging_"
+
+@lru_cache(maxsize=None)
+def get_chroma_client():
+    """
+    설정(CHROMA_MODE)에 맞는 ChromaDB 클라이언트를 생성합니다.
+    - persistent: 로컬 `PERSIST_DIR`을 직접 여는 내장 모드 (단일 프로세스용)
+    - http: Chroma 서버에 접속하는 클라이언트 모드 (여러 uvicorn 워커/레플리카가 하나의 인덱스 공유)
+    CHROMA_SHARDS 가 있으면 CHROMA_MODE 대신 여러 저장소에 나누어 저장하는 샤딩 클라이언트를 사용합니다.
+    프로세스당 하나의 클라이언트를 재사용하여 연결을 유지합니다.
+    """
+    import chromadb
+    from chromadb.config import Settings as ChromaSettings
+
+    if settings.CHROMA_SHARDS:
+        return ShardedClient(settings.CHROMA_SHARDS, partitioned=settings.CHROMA_PARTITIONED_COLLECTIONS)
+
+    mode = settings.CHROMA_MODE.lower()
+    if mode == "http":
+        return chromadb.HttpClient(
+            host=settings.CHROMA_HOST,
+            port=settings.CHROMA_PORT,
+            ssl=settings.CHROMA_SSL,
+            settings=ChromaSettings(anonymized_telemetry=False)
+        )
+    if mode == "persistent":
+        return chromadb.PersistentClient(path=settings.PERSIST_DIR)
+    raise ValueError(f"Unsupported CHROMA_MODE: {settings.CHROMA_MODE}")
+
 class VectorStore:
     class EmbeddingFunction:
         def __init__(self, model):
@@ -21,20 +56,26 @@ class VectorStore:
         self.document_path = settings.DOCUMENT_PATH
         self.persist_dir = settings.PERSIST_DIR
         
-        # ChromaDB 데이터 디렉토리 정리
-        self._cleanup_chroma_data()
+        # ChromaDB 데이터 디렉토리 정리 (내장 모드에서만)
+        if settings.CHROMA_MODE.lower() == "persistent":
+            self._cleanup_chroma_data()
             
-        # 임베딩 모델 초기화
-        self.embedding_model = HuggingFaceEmbeddings(
-            model_name=settings.EMBEDDING_MODEL
-        )
+        # 임베딩 모델 초기화 (EMBEDDING_BACKEND 설정에 따라 torch 또는 onnx)
+        self.embedding_model = get_embedding_model()
+        # 문서 적재용 임베딩 (반복되는 청크는 임베딩 캐시에서 재사용)
+        self.ingest_embedding_model = get_ingest_embedding_model()
         
         # 임베딩 함수 초기화
         self.embed_function = self.EmbeddingFunction(self.embedding_model)
         
         # ChromaDB 초기화
-        import chromadb
-        self.client = chromadb.PersistentClient(path=self.persist_dir)
+        self.client = get_chroma_client()
+        
+        # 콜렉션 교체 중에는 검색이 교체 전/후 중 하나만 보도록 보호
+        self._swap_lock = ReadWriteLock()
+        
+        # 적재 시 유사 중복 청크 제거 결과 누적
+        self.dedup_stats = DedupStats()
         
     def _cleanup_chroma_data(self):
         """ChromaDB 데이터 디렉토리 정리"""
@@ -55,52 +96,142 @@ class VectorStore:
                 shutil.rmtree(item_path)
 
     
-    def add_texts(self, texts: List[str], collection_name: str):
-        """텍스트를 벡터 스토어에 추가합니다."""
-        if not texts:
-            return
-            
+    def add_texts(self, texts: List[str], collection_name: str,
+                  metadatas: Optional[List[Dict[str, Any]]] = None,
+                  ids: Optional[List[str]] = None):
+        """텍스트를 벡터 스토어에 추가합니다. (이미 있는 ID는 건너뜀)"""
         try:
-            # 콜렉션 존재 여부 확인
-            try:
-                collection = self.client.get_collection(collection_name)
-            except:
-                # 콜렉션이 없는 경우 생성
-                collection = self.client.create_collection(
-                    name=collection_name,
-                    embedding_function=self.embed_function
-                )
-                print(f"Created new collection: {collection_name}")
-                
-            # 현재 콜렉션의 문서 ID 확인
-            current_docs = collection.get()
-            current_ids = set(current_docs.get('ids', []))
-            
-            # 새로 추가할 문서 ID 생성
-            new_docs = []
-            new_ids = []
-            new_metadatas = []
-            
-            for i, text in enumerate(texts):
-                doc_id = f"{collection_name}_{i}"
-                if doc_id not in current_ids:
-                    new_docs.append(text)
-                    new_ids.append(doc_id)
-                    new_metadatas.append({"source": collection_name})
-                    print(f"Adding new document: {doc_id}")
-            
-            # 새로운 문서가 있는 경우에만 추가
-            if new_docs:
-                collection.add(
-                    documents=new_docs,
-                    ids=new_ids,
-                    metadatas=new_metadatas
-                )
-            
+            self.add_chunks(collection_name, texts, metadatas, ids)
         except Exception as e:
             import traceback
             print(f"Error adding documents: {e}")
             print(f"Traceback: {traceback.format_exc()}")
+
+    def new_dedup_filter(self) -> Optional[NearDuplicateFilter]:
+        """적재 한 번에 사용할 유사 중복 필터를 만듭니다. (DEDUP_THRESHOLD=0 이면 None)"""
+        if not settings.DEDUP_THRESHOLD:
+            return None
+        return NearDuplicateFilter(
+            threshold=settings.DEDUP_THRESHOLD,
+            num_perm=settings.DEDUP_NUM_PERM,
+            shingle_size=settings.DEDUP_SHINGLE_SIZE
+        )
+
+    def add_chunks(self, collection_name: str, texts: List[str],
+                   metadatas: Optional[List[Dict[str, Any]]] = None,
+                   ids: Optional[List[str]] = None,
+                   dedup: Optional[NearDuplicateFilter] = None) -> int:
+        """
+        add_texts와 동일하지만 오류를 그대로 발생시키고 새로 추가한 청크 수를 반환합니다.
+        (업로드 작업처럼 실패를 호출 측에서 기록해야 하는 경우 사용)
+        여러 번 나누어 추가하는 경우 같은 dedup 필터를 넘기면 배치 간 유사 중복도 제거되며,
+        이때 결과 집계(dedup_stats.record)는 호출 측에서 합니다.
+        """
+        if not texts:
+            return 0
+            
+        # 콜렉션 존재 여부 확인
+        try:
+            collection = self.client.get_collection(collection_name)
+        except:
+            # 콜렉션이 없는 경우 생성
+            collection = self.client.create_collection(
+                name=collection_name,
+                embedding_function=self.embed_function
+            )
+            print(f"Created new collection: {collection_name}")
+            
+        ids = ids or [f"{collection_name}_{i}" for i in range(len(texts))]
+        metadatas = metadatas or [{"source": collection_name} for _ in texts]
+        
+        # 추가하려는 ID 중 이미 저장된 ID만 조회
+        current_ids = set(collection.get(ids=ids, include=[]).get('ids', []))
+        
+        # 새로 추가할 문서 선택
+        new_docs = []
+        new_ids = []
+        new_metadatas = []
+        
+        for doc_id, text, metadata in zip(ids, texts, metadatas):
+            if doc_id not in current_ids:
+                new_docs.append(text)
+                new_ids.append(doc_id)
+                new_metadatas.append(metadata)
+        
+        # 유사 중복 청크 제거 (이미 저장된 청크와의 비교는 하지 않음)
+        owns_filter = dedup is None
+        dedup = self.new_dedup_filter() if owns_filter else dedup
+        if dedup is not None:
+            new_docs, new_metadatas, new_ids = dedup.filter(new_docs, new_metadatas, new_ids)
+            if owns_filter:
+                self.dedup_stats.record(dedup, f"from {collection_name}")
+        
+        # 새로운 문서가 있는 경우에만 추가
+        if new_docs:
+            print(f"Adding {len(new_docs)} new documents to {collection_name}")
+            self._add_batches(collection, new_docs, new_metadatas, new_ids)
+        return len(new_docs)
+
+    def _add_batches(self, collection, texts: List[str], metadatas: List[Dict[str, Any]], ids: List[str]):
+        """임베딩을 직접 계산하여 Chroma 최대 배치 크기 단위로 저장합니다."""
+        batch_size = self.client.get_max_batch_size() if hasattr(self.client, "get_max_batch_size") else 5000
+        for start in range(0, len(texts), batch_size):
+            batch = texts[start:start + batch_size]
+            collection.add(
+                documents=batch,
+                embeddings=self.ingest_embedding_model.embed_documents(batch),
+                ids=ids[start:start + batch_size],
+                metadatas=metadatas[start:start + batch_size]
+            )
+    
+    def replace_collection(self, collection_name: str, texts: List[str],
+                           metadatas: Optional[List[Dict[str, Any]]] = None,
+                           ids: Optional[List[str]] = None, dedup: bool = True):
+        """
+        콜렉션 내용을 원자적으로 교체합니다.
+        - 임시 콜렉션에 새 문서를 모두 임베딩/저장한 뒤
+        - 쓰기 잠금 안에서 기존 콜렉션 삭제와 이름 변경만 수행
+        검색은 교체 전 또는 교체 후의 완성된 콜렉션만 보게 됩니다. (프로세스 내 기준)
+        dedup=False이면 유사 중복 제거를 하지 않습니다. (컬럼별 고정 ID를 쓰는 카탈로그 등)
+        """
+        metadatas = metadatas or [{"source": collection_name} for _ in texts]
+        ids = ids or [f"{collection_name}_{i}" for i in range(len(texts))]
+        dedup = self.new_dedup_filter() if dedup else None
+        if dedup is not None:
+            texts, metadatas, ids = dedup.filter(texts, metadatas, ids)
+            self.dedup_stats.record(dedup, f"from {collection_name}")
+
+        staging_name = self.create_staging_collection(collection_name)
+        try:
+            if texts:
+                self._add_batches(
+                    self.client.get_collection(staging_name),
+                    texts,
+                    metadatas,
+                    ids
+                )
+            self.swap_in_staging(collection_name, staging_name)
+            print(f"Replaced collection: {collection_name} ({len(texts)} documents)")
+        except Exception:
+            self.client.delete_collection(staging_name)
+            raise
+
+    def create_staging_collection(self, collection_name: str) -> str:
+        """교체용 임시 콜렉션을 만들고 이름을 반환합니다. (콜렉션 목록에는 표시되지 않음)"""
+        staging_name = f"{collection_name}{STAGING_MARKER}{uuid.uuid4().hex[:8]}"
+        self.client.create_collection(
+            name=staging_name,
+            embedding_function=self.embed_function
+        )
+        return staging_name
+
+    def swap_in_staging(self, collection_name: str, staging_name: str):
+        """쓰기 잠금 안에서 기존 콜렉션을 삭제하고 임시 콜렉션의 이름을 바꿉니다."""
+        staging = self.client.get_collection(staging_name)
+        with self._swap_lock.write():
+            if collection_name in self.client.list_collections():
+                self.client.delete_collection(collection_name)
+            staging.modify(name=collection_name)
     
     def clear(self):
         """모든 문서와 임베딩을 삭제합니다."""
@@ -108,51 +239,157 @@ class VectorStore:
         for collection_name in collections:
             self.client.delete_collection(collection_name)
     
-    def similarity_search(self, collection_name: str, query: str, top_k: int = 3) -> List[str]:
+    def similarity_search(self, collection_name: str, query: str, top_k: int = 3,
+                          where: Optional[Dict[str, Any]] = None) -> List[str]:
         """
         쿼리와 가장 유사한 문서를 찾아 반환합니다.
         """
         try:
+            results = self.similarity_search_with_scores(collection_name, query, top_k, where=where)
+            return [result["document"] for result in results if result["document"]]
+            
+        except Exception as e:
+            import traceback
+            print(f"Error in similarity search: {e}")
+            print(f"Traceback: {traceback.format_exc()}")
+            return []
+
+    def similarity_search_with_scores(self, collection_name: str, query: str, top_k: int = 3,
+                                      where: Optional[Dict[str, Any]] = None,
+                                      score_threshold: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        쿼리와 가장 유사한 청크를 거리(distance)와 메타데이터와 함께 반환합니다.
+        - where: Chroma 메타데이터 필터 (예: {"source": "companyinfo"})
+        - score_threshold: 이 값보다 거리가 먼 결과는 제외 (거리가 작을수록 유사)
+        """
+        # 쿼리 임베딩 생성
+        query_embedding = self.embedding_model.embed_query(query)
+
+        with self._swap_lock.read():
             # 콜렉션 가져오기
             collection = self.client.get_collection(collection_name)
 
-            # 쿼리 임베딩 생성
-            query_embedding = self.embedding_model.embed_documents([query])[0]
+            # 필터 조건이 충분히 좁으면 해당 후보만 직접 거리 계산
+            if where:
+                results = self._filtered_exact_search(collection, query_embedding, top_k, where)
+                if results is not None:
+                    return self._to_matches(results, score_threshold)
 
-            # 콜렉션 크기 확인
-            collection_data = collection.get()
-            doc_count = len(collection_data.get('documents', []))
-            
-            # 최대 결과 수 조정
-            adjusted_top_k = min(top_k, doc_count)
+            # 최대 결과 수 조정 (전체 문서를 조회하지 않고 개수만 확인)
+            adjusted_top_k = min(top_k, collection.count())
+            if adjusted_top_k == 0:
+                return []
 
             results = collection.query(
                 query_embeddings=[query_embedding],
-                n_results=adjusted_top_k
+                n_results=adjusted_top_k,
+                where=where or None,
+                include=["documents", "metadatas", "distances"]
             )
 
-            # 결과 검사
-            if not results or 'documents' not in results or not results['documents']:
-                return []
-                
-            if not results['documents'][0]:
-                return []
-                
-            return results['documents'][0]
-            
-        except Exception as e:
-            import traceback
-            print(f"Error in similarity search: {e}")
-            print(f"Traceback: {traceback.format_exc()}")
-            return "문서가 없습니다."
+        return self._to_matches(results, score_threshold)
+
+    def _filtered_exact_search(self, collection, query_embedding: List[float], top_k: int,
+                               where: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        메타데이터 필터(Chroma 메타데이터 인덱스)로 후보를 먼저 좁히고,
+        후보가 FILTER_EXACT_SEARCH_MAX 이하이면 HNSW 대신 후보만 정확히 거리 계산합니다.
+        후보가 많으면 None을 반환하여 HNSW 필터 검색을 사용하게 합니다.
+        """
+        import numpy as np
+
+        # 후보 수만 먼저 확인 (ID만 조회)
+        limit = settings.FILTER_EXACT_SEARCH_MAX
+        candidate_ids = collection.get(where=where, limit=limit + 1, include=[])['ids']
+        if len(candidate_ids) > limit:
+            return None
+        if not candidate_ids:
+            return {'ids': [[]]}
+
+        candidates = collection.get(
+            ids=candidate_ids,
+            include=["documents", "metadatas", "embeddings"]
+        )
+
+        vectors = np.asarray(candidates['embeddings'], dtype=np.float32)
+        query = np.asarray(query_embedding, dtype=np.float32)
+
+        # 콜렉션의 거리 함수와 동일하게 계산 (기본값: 제곱 L2)
+        space = (collection.metadata or {}).get("hnsw:space", "l2")
+        if space == "cosine":
+            norms = np.linalg.norm(vectors, axis=1) * np.linalg.norm(query)
+            distances = 1.0 - (vectors @ query) / np.clip(norms, 1e-12, None)
+        elif space == "ip":
+            distances = 1.0 - vectors @ query
+        else:
+            distances = ((vectors - query) ** 2).sum(axis=1)
+
+        order = np.argsort(distances)[:top_k]
+        return {
+            'ids': [[candidates['ids'][i] for i in order]],
+            'documents': [[candidates['documents'][i] for i in order]],
+            'metadatas': [[candidates['metadatas'][i] for i in order]],
+            'distances': [[float(distances[i]) for i in order]]
+        }
+
+    @staticmethod
+    def _to_matches(results: Dict[str, Any], score_threshold: Optional[float]) -> List[Dict[str, Any]]:
+        # 결과 검사
+        if not results or not results.get('ids') or not results['ids'][0]:
+            return []
+
+        matches = []
+        for doc_id, document, metadata, distance in zip(
+            results['ids'][0],
+            results['documents'][0],
+            results['metadatas'][0],
+            results['distances'][0]
+        ):
+            if score_threshold is not None and distance > score_threshold:
+                continue
+            matches.append({
+                "id": doc_id,
+                "document": document,
+                "distance": distance,
+                "metadata": metadata or {}
+            })
+        return matches
+    
+    def similarity_search_batch(self, collection_name: str, queries: List[str], top_k: int = 3,
+                                where: Optional[Dict[str, Any]] = None) -> List[List[str]]:
+        """
+        여러 쿼리를 한 번에 임베딩하고 한 번의 collection.query로 검색합니다.
+        쿼리 순서대로 유사 문서 목록을 반환합니다.
+        """
+        if not queries:
+            return []
+
+        # 모든 쿼리를 한 번의 모델 호출로 임베딩
+        query_embeddings = self.embedding_model.embed_documents(queries)
+
+        with self._swap_lock.read():
+            collection = self.client.get_collection(collection_name)
+
+            adjusted_top_k = min(top_k, collection.count())
+            if adjusted_top_k == 0:
+                return [[] for _ in queries]
+
+            results = collection.query(
+                query_embeddings=query_embeddings,
+                n_results=adjusted_top_k,
+                where=where or None
+            )
+        documents = results.get('documents') or []
+        return [docs or [] for docs in documents] + [[] for _ in range(len(queries) - len(documents))]
     
     def list_collections(self) -> List[str]:
-        """모든 콜렉션 목록을 반환합니다."""
-        return self.client.list_collections()
+        """모든 콜렉션 목록을 반환합니다. (교체 중인 임시 콜렉션 제외)"""
+        return [name for name in self.client.list_collections() if STAGING_MARKER not in name]
     
     def delete_collection(self, collection_name: str):
         """지정된 콜렉션을 삭제합니다."""
-        self.client.delete_collection(collection_name)
+        with self._swap_lock.write():
+            self.client.delete_collection(collection_name)
         
     def delete_all_collections(self) -> List[str]:
         """모든 콜렉션을 삭제하고 삭제된 콜렉션 목록을 반환합니다."""
@@ -163,6 +400,7 @@ class VectorStore:
         
     def get_collection_documents(self, collection_name: str) -> List[str]:
         """지정된 콜렉션의 모든 문서를 반환합니다."""
-        collection = self.client.get_collection(collection_name)
-        results = collection.get()
+        with self._swap_lock.read():
+            collection = self.client.get_collection(collection_name)
+            results = collection.get()
         return results['documents'] if results['documents'] else []